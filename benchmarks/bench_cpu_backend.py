@@ -0,0 +1,84 @@
+"""
+CPU 백엔드 벤치마크: fp32(기본 경로) vs int8 동적 양자화 vs int8 + torch.compile
+
+    python -m benchmarks.bench_cpu_backend --model meta-llama/Meta-Llama-3.1-8B-Instruct --tokens 64
+
+변형마다 새 프로세스에서 모델을 올려 RSS를 깨끗하게 잰다.
+출력: 변형별 로드 시간, 생성 tokens/s, 프로세스 RSS(MB)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+VARIANTS = {
+    "fp32": {"LLM_BACKEND": "cpu", "LLM_CPU_INT8": "false", "LLM_CPU_COMPILE": "false"},
+    "int8": {"LLM_BACKEND": "cpu", "LLM_CPU_INT8": "true", "LLM_CPU_COMPILE": "false"},
+    "int8+compile": {"LLM_BACKEND": "cpu", "LLM_CPU_INT8": "true", "LLM_CPU_COMPILE": "true"},
+}
+
+PROMPTS = [
+    [{"role": "user", "content": "박주연의 어제 스트레스가 가장 높았던 시각을 알려줘."}],
+    [{"role": "user", "content": "Return JSON only: {\"intent\": \"db_query\"} or {\"intent\": \"other\"}. Q: 안녕?"}],
+]
+
+
+def run_variant(model_id: str, tokens: int, repeats: int) -> dict:
+    import psutil
+    from llm_server.engine import load_engine
+
+    proc = psutil.Process()
+    t0 = time.perf_counter()
+    engine = load_engine("bench", model_id, "cpu")
+    load_s = time.perf_counter() - t0
+
+    # 첫 호출(컴파일/캐시 워밍)은 측정에서 제외
+    engine.chat(PROMPTS[0], max_new_tokens=4)
+
+    generated = 0
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        for msgs in PROMPTS:
+            text = engine.chat(msgs, max_new_tokens=tokens)
+            generated += len(engine.tokenizer(text, add_special_tokens=False)["input_ids"])
+    gen_s = time.perf_counter() - t0
+    return {
+        "load_s": round(load_s, 1),
+        "tokens": generated,
+        "tokens_per_s": round(generated / gen_s, 2) if gen_s else None,
+        "rss_mb": round(proc.memory_info().rss / 2**20),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default="meta-llama/Meta-Llama-3.1-8B-Instruct")
+    ap.add_argument("--tokens", type=int, default=64)
+    ap.add_argument("--repeats", type=int, default=2)
+    ap.add_argument("--variants", default=",".join(VARIANTS))
+    ap.add_argument("--_child", default="", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args._child:
+        print(json.dumps(run_variant(args.model, args.tokens, args.repeats)))
+        return
+
+    print(f"{'variant':<14} {'load_s':>7} {'tok/s':>8} {'rss_mb':>8}")
+    for name in args.variants.split(","):
+        env = {**os.environ, **VARIANTS[name], "LLM_PREFIX_CACHE_MB": "0"}
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_cpu_backend", "--model", args.model,
+             "--tokens", str(args.tokens), "--repeats", str(args.repeats), "--_child", name],
+            env=env, capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            print(f"{name:<14} failed: {out.stderr.strip().splitlines()[-1:]}")
+            continue
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{name:<14} {r['load_s']:>7} {r['tokens_per_s']:>8} {r['rss_mb']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+DB 규모 벤치마크: 합성 데이터셋(benchmarks.synth_data)에서 리포트 쿼리, 대표 챗 SQL, 이름 자동완성 시간을 잰다.
+
+    python -m benchmarks.synth_data --out /tmp/p1m.db --events 1000000
+    python -m benchmarks.synth_data --out /tmp/p10m.db --users 1000 --events 10000000 --indexes
+    python -m benchmarks.bench_db_scale --db /tmp/p1m.db /tmp/p10m.db --tool
+
+- report_daily: report.db_service의 일일 리포트 CTE (SQL 그대로, --db 파일에 대해)
+- chat_*: planner/query_gen이 만드는 모양 (dbchat.app.core.indexes.chat_probes)
+  --tool이면 db_query_tool과 같은 경로(dbchat.app.core.tools.run_query + JSON 직렬화)도 잰다
+- autocomplete: report.views.autocomplete_name처럼 공유 읽기 전용 풀(llm_web.protectee_db)로 LIKE '%q%' 조회
+  (autocomplete_connect는 예전 방식인 키 입력마다 새 연결, 비교용)
+출력: 데이터셋별 행 수/파일 크기/적용된 인덱스와 쿼리별 first/p50/p95 ms, 결과 행 수
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+
+def _timed(fn, repeats: int) -> dict:
+    runs, out = [], None
+    for _ in range(max(1, repeats)):
+        t0 = time.perf_counter()
+        out = fn()
+        runs.append((time.perf_counter() - t0) * 1000.0)
+    first, rest = runs[0], sorted(runs[1:] or runs)
+    return {
+        "first_ms": round(first, 2),
+        "p50_ms": round(rest[len(rest) // 2], 2),
+        "p95_ms": round(rest[min(len(rest) - 1, int(len(rest) * 0.95))], 2),
+        "_out": out,
+    }
+
+
+_AUTOCOMPLETE = "SELECT name FROM users WHERE name LIKE ? ORDER BY name LIMIT 10"
+
+
+def _autocomplete_connect(path: str, q: str):
+    # 풀 도입 전 autocomplete_name 방식 (요청마다 새 연결)
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(_AUTOCOMPLETE, (f"%{q}%",)).fetchall()
+    finally:
+        conn.close()
+
+
+def bench_dataset(path: str, repeats: int, tool: bool) -> dict:
+    from dbchat.app.core import indexes
+    from llm_web import protectee_db
+    from report.db_service import query_template
+
+    conn = sqlite3.connect(path)
+    params = indexes.probe_params(conn)
+    probes = indexes.chat_probes(params) + [
+        ("report_daily", query_template.text, {"name": params["name"], "date": params["date"]}),
+    ]
+    info = {
+        "db": path,
+        "size_mb": round(os.path.getsize(path) / 2**20, 1),
+        "users": conn.execute("SELECT COUNT(*) FROM users").fetchone()[0],
+        "events": conn.execute("SELECT COUNT(*) FROM event").fetchone()[0],
+        "indexes": sorted(n for n in indexes.existing(conn) if n in {i[0] for i in indexes.INDEXES}),
+        "params": params,
+        "queries": {},
+    }
+
+    for name, sql, p in probes:
+        r = _timed(lambda: conn.execute(sql, p).fetchall(), repeats)
+        r["rows"] = len(r.pop("_out"))
+        info["queries"][name] = r
+
+    if tool:
+        from dbchat.app.core.tools import run_query
+        eng = protectee_db.engine(path)  # db_query_tool과 같은 읽기 전용 풀
+        for name, sql, p in probes:
+            if not name.startswith("chat_"):
+                continue
+            r = _timed(lambda: json.dumps(run_query(sql, p, engine=eng), ensure_ascii=False, default=str), repeats)
+            r["result_chars"] = len(r.pop("_out"))
+            info["queries"][f"{name}[tool]"] = r
+
+    name = params["name"]
+    for n in (1, 2):
+        r = _timed(lambda: protectee_db.fetchall(_AUTOCOMPLETE, (f"%{name[:n]}%",), path=path), repeats * 4)
+        r["rows"] = len(r.pop("_out"))
+        info["queries"][f"autocomplete[{n}]"] = r
+        r = _timed(lambda: _autocomplete_connect(path, name[:n]), repeats * 4)
+        r.pop("_out")
+        info["queries"][f"autocomplete_connect[{n}]"] = r
+    conn.close()
+    return info
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", nargs="+", required=True, help="합성 데이터셋 파일들 (작은 것부터)")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--tool", action="store_true", help="db_query_tool 경로(run_query)도 측정")
+    args = ap.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "llm_web.settings")
+    results = [bench_dataset(path, args.repeats, args.tool) for path in args.db]
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
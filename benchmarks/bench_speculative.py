@@ -0,0 +1,61 @@
+"""
+리포트 생성 assisted(speculative) decoding 벤치마크: 같은 프롬프트를 초안 모델 on/off로 번갈아 생성
+
+    python -m benchmarks.bench_speculative --draft <small-model-with-same-tokenizer> --tokens 512
+
+출력: 모드별 tokens/s, 초안 토큰 수락률, speedup (엔진의 SpeculativeStats 기준)
+"""
+import argparse
+import json
+import os
+import time
+
+PROMPT = (
+    "다음 데이터를 기반으로 보호대상자의 주간 건강 리포트를 작성하시오.\n"
+    "- 평균 심박수: 82 bpm (전주 대비 +5)\n- 평균 스트레스: 61 (전주 대비 +12)\n"
+    "- 수면 시간: 5.2시간 (전주 대비 -0.8)\n- 낙상 이벤트: 1회\n\nAnswer:\n"
+)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=None, help="타깃 모델 (기본: report MODEL_PATH)")
+    ap.add_argument("--draft", required=True)
+    ap.add_argument("--tokens", type=int, default=512)
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--temperature", type=float, default=0.7)
+    args = ap.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "llm_web.settings")
+    os.environ["LLM_PREFIX_CACHE_MB"] = "0"
+    os.environ["LLM_REPORT_DRAFT_MODEL"] = args.draft
+    os.environ["LLM_REPORT_MAX_NEW_TOKENS"] = str(args.tokens)
+    os.environ["LLM_REPORT_TEMPERATURE"] = str(args.temperature)
+    import django
+    django.setup()
+    from report import ai_service
+    if args.model:
+        ai_service.MODEL_PATH = args.model
+
+    engine = ai_service.load_report_engine()
+    engine.complete([PROMPT], max_new_tokens=8)  # 워밍업
+
+    elapsed = {True: 0.0, False: 0.0}
+    for _ in range(args.repeats):
+        for assisted in (False, True):
+            t0 = time.perf_counter()
+            engine.complete([PROMPT], assisted=assisted)
+            elapsed[assisted] += time.perf_counter() - t0
+
+    stats = engine.spec_stats
+    print(json.dumps({
+        "plain_tokens_per_s": stats.plain_tps.snapshot()["avg"],
+        "assisted_tokens_per_s": stats.spec_tps.snapshot()["avg"],
+        "plain_s": round(elapsed[False], 2),
+        "assisted_s": round(elapsed[True], 2),
+        **stats.snapshot(),
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+합성 protectee 데이터 생성기: db/protectee.db와 같은 스키마로 users/event 행을 만든다.
+
+    python -m benchmarks.synth_data --out /tmp/protectee_1m.db --users 200 --events 1000000
+    python -m benchmarks.synth_data --out /tmp/protectee_20m.db --users 2000 --events 20000000 --indexes
+
+- 스트레스/HRV는 하루 주기(오후에 높고 새벽에 낮은 스트레스, HRV는 반대)에 잡음과 드문 급등을 얹는다
+- 구역(safe/unfamiliar)과 워치 연결은 마르코프 전이로 구간(run)을 이룬다 (끊긴 구간은 센서 값이 NULL)
+- ppg_json은 원본처럼 정규화된 PPG 샘플 3개 배열, 위치는 대상자별 집 주변 랜덤 워크
+같은 --seed면 같은 데이터가 나온다. 행은 날짜 순으로 대상자들 사이에 섞여 들어간다 (실제 적재 순서).
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE event (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    protectee_id INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    ppg_json TEXT,
+    ppg_threat_detected INTEGER,
+    hrv INTEGER,
+    stress INTEGER,
+    imu_danger_level INTEGER,
+    latitude REAL,
+    longitude REAL,
+    zone_type TEXT,
+    is_watch_connected INTEGER,
+    FOREIGN KEY (protectee_id) REFERENCES users(id)
+);
+"""
+
+_INSERT = (
+    "INSERT INTO event (protectee_id, timestamp, ppg_json, ppg_threat_detected, hrv, stress, imu_danger_level,"
+    " latitude, longitude, zone_type, is_watch_connected) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+_SURNAMES = "김이박최정강조윤장임한오서신권황안송류전홍고문양손배백허유남심노하곽성차주우구민진지엄채원천방공현함변염여추도소석선설마길연위표명기반왕금옥육인맹제모탁국어은편용예경봉사부황보"
+_SYLLABLES = "가나다라마바사아자차카타파하서연지윤민준현우주영수정희은혜진선미경동성호승재해름랑윤빈율온솔하린채원도"
+
+# 전이 확률 (이벤트 한 건마다)
+_P_UNFAMILIAR = 0.02   # safe → unfamiliar
+_P_HOME = 0.08         # unfamiliar → safe
+_P_WATCH_OFF = 0.01    # 연결 → 끊김
+_P_WATCH_ON = 0.15     # 끊김 → 연결
+
+
+def _names(n: int, rng: random.Random) -> list:
+    seen, out = set(), []
+    while len(out) < n:
+        name = rng.choice(_SURNAMES) + rng.choice(_SYLLABLES) + rng.choice(_SYLLABLES)
+        if len(seen) >= len(_SURNAMES) * len(_SYLLABLES) ** 2 // 2:
+            name += str(len(out))  # 조합이 모자라면 번호를 붙인다
+        if name not in seen:
+            seen.add(name)
+            out.append(name)
+    return out
+
+
+class _Person:
+    """대상자 한 명의 지속 상태 (구역/워치 구간, 위치, 개인별 기준값)."""
+
+    def __init__(self, pid: int, rng: random.Random):
+        self.pid = pid
+        self.rng = rng
+        self.stress_base = rng.uniform(35, 65)
+        self.hrv_base = rng.uniform(35, 60)
+        self.home = (37.45 + rng.uniform(0, 0.2), 126.85 + rng.uniform(0, 0.3))
+        self.pos = list(self.home)
+        self.zone = "safe"
+        self.watch = 1
+
+    def event(self, ts: datetime) -> tuple:
+        rng = self.rng
+        if self.watch and rng.random() < _P_WATCH_OFF:
+            self.watch = 0
+        elif not self.watch and rng.random() < _P_WATCH_ON:
+            self.watch = 1
+        if self.zone == "safe" and rng.random() < _P_UNFAMILIAR:
+            self.zone = "unfamiliar"
+        elif self.zone == "unfamiliar" and rng.random() < _P_HOME:
+            self.zone = "safe"
+            self.pos = list(self.home)
+        stamp = ts.strftime("%Y-%m-%d %H:%M:%S")
+        if not self.watch:
+            return (self.pid, stamp, None, None, None, None, None, None, None, None, 0)
+
+        # 하루 주기: 15시 전후 최고, 3시 전후 최저
+        hour = ts.hour + ts.minute / 60.0
+        diurnal = math.sin((hour - 9.0) / 24.0 * 2 * math.pi)
+        spike = rng.random() < 0.03
+        stress = self.stress_base + 18 * diurnal + rng.gauss(0, 8) + (rng.uniform(25, 40) if spike else 0)
+        if self.zone == "unfamiliar":
+            stress += 8
+        stress = int(min(100, max(10, stress)))
+        hrv = int(min(100, max(0, self.hrv_base - 0.4 * (stress - 50) + rng.gauss(0, 7))))
+        if spike and stress >= 85 and rng.random() < 0.5:
+            threat = int(rng.uniform(80, 100))   # 급등 구간의 위협 감지
+        else:
+            threat = int(max(0, rng.gauss(5, 10))) if rng.random() < 0.3 else 0
+        imu = 5 if rng.random() < 0.002 else 4 if rng.random() < 0.01 else rng.choice((1, 1, 1, 2, 2, 3))
+        ppg = json.dumps([round(rng.gauss(1.0, 0.05), 2) for _ in range(3)])
+        step = 0.002 if self.zone == "unfamiliar" else 0.0003
+        self.pos[0] += rng.gauss(0, step)
+        self.pos[1] += rng.gauss(0, step)
+        return (self.pid, stamp, ppg, threat, hrv, stress, imu, round(self.pos[0], 6), round(self.pos[1], 6), self.zone, 1)
+
+
+def generate(out: str, users: int, events: int, days: int, seed: int, start: datetime, batch: int = 50000) -> dict:
+    if os.path.exists(out):
+        os.remove(out)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(out)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO users (id, name) VALUES (?, ?)", enumerate(_names(users, rng), start=1))
+
+    people = [_Person(pid, random.Random(rng.random())) for pid in range(1, users + 1)]
+    per_day = max(1, math.ceil(events / (users * days)))
+    gap = 86400.0 / per_day
+    t0 = time.perf_counter()
+    written, rows = 0, []
+    for d in range(days):
+        day = start + timedelta(days=d)
+        for p in people:
+            for k in range(per_day):
+                if written + len(rows) >= events:
+                    break
+                offset = k * gap + p.rng.uniform(0, gap * 0.9)
+                rows.append(p.event(day + timedelta(seconds=offset)))
+            if len(rows) >= batch:
+                conn.executemany(_INSERT, rows)
+                written += len(rows)
+                rows = []
+    if rows:
+        conn.executemany(_INSERT, rows)
+        written += len(rows)
+    conn.commit()
+    elapsed = time.perf_counter() - t0
+    conn.close()
+    return {
+        "out": out,
+        "users": users,
+        "events": written,
+        "days": days,
+        "gen_s": round(elapsed, 1),
+        "rows_per_s": round(written / elapsed) if elapsed else None,
+        "size_mb": round(os.path.getsize(out) / 2**20, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--events", type=int, default=1_000_000)
+    ap.add_argument("--days", type=int, default=None, help="기간 (기본: 대상자당 하루 144건(10분 간격)이 되도록)")
+    ap.add_argument("--start", default="2025-01-01")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--indexes", action="store_true", help="생성 후 dbchat 관리 인덱스 적용 (protectee_indexes와 같은 세트)")
+    args = ap.parse_args()
+
+    days = args.days or max(1, math.ceil(args.events / (args.users * 144)))
+    info = generate(args.out, args.users, args.events, days, args.seed, datetime.strptime(args.start, "%Y-%m-%d"))
+    if args.indexes:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "llm_web.settings")
+        from dbchat.app.core import indexes
+        conn = sqlite3.connect(args.out)
+        t0 = time.perf_counter()
+        info["indexes"] = indexes.apply(conn)
+        info["index_s"] = round(time.perf_counter() - t0, 1)
+        conn.close()
+        info["size_mb"] = round(os.path.getsize(args.out) / 2**20, 1)
+    print(json.dumps(info, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+benchmarks 테스트 (python -m pytest benchmarks/tests.py).
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+from benchmarks.synth_data import generate
+
+_START = datetime(2025, 8, 1)
+
+
+def _dump(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT * FROM users ORDER BY id").fetchall(), conn.execute("SELECT * FROM event ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+class SynthDataTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _generate(self, name, seed=1, **kw):
+        path = os.path.join(self.tmp.name, name)
+        info = generate(path, **{"users": 4, "events": 1000, "days": 2, "seed": seed, "start": _START, "batch": 300, **kw})
+        return path, info
+
+    def test_same_seed_same_data(self):
+        a, _ = self._generate("a.db")
+        b, _ = self._generate("b.db")
+        c, _ = self._generate("c.db", seed=2)
+        self.assertEqual(_dump(a), _dump(b))
+        self.assertNotEqual(_dump(a), _dump(c))
+
+    def test_counts_window_and_disconnected_rows(self):
+        path, info = self._generate("x.db", events=999)
+        users, events = _dump(path)
+        self.assertEqual((info["users"], info["events"]), (4, 999))
+        self.assertEqual(len(events), 999)
+        self.assertEqual(len({name for _, name in users}), 4)
+        stamps = [e[2] for e in events]
+        self.assertTrue(all("2025-08-01 00:00:00" <= ts < "2025-08-03 00:00:00" for ts in stamps))
+        for e in events:
+            watch, stress, zone = e[11], e[6], e[10]
+            if watch:
+                self.assertTrue(10 <= stress <= 100)
+                self.assertIn(zone, ("safe", "unfamiliar"))
+            else:
+                self.assertEqual((stress, zone), (None, None))
+
+    def test_regenerating_replaces_the_file(self):
+        path, _ = self._generate("x.db")
+        _, info = self._generate("x.db", events=10)
+        self.assertEqual(len(_dump(path)[1]), 10)
+        self.assertEqual(info["events"], 10)
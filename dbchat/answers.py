@@ -0,0 +1,58 @@
+"""
+dbchat 답변 문자열 다듬기 (뷰와 dbchat.utils.arun_dbchat_pipeline이 같이 쓴다).
+"""
+from __future__ import annotations
+import re
+from asgiref.sync import sync_to_async
+from dbchat.app.utils.intent import list_known_names
+
+def guide() -> str:
+    names = list_known_names(limit=3)
+    hint = f" (예: {', '.join(names)})" if names else ""
+    return "이 화면에서는 보호대상자의 데이터 조건 검색만 가능합니다. \n누구의 어떤 정보를 알고싶으신가요? 😊" + hint
+
+# 이름 목록 조회가 DB를 읽으므로 이벤트 루프 밖에서
+aguide = sync_to_async(guide, thread_sensitive=False)
+
+def strip_tag(text: str) -> str:
+    """
+    Final:/Answer: 태그 제거 + 첫 유의미 라인만 반환
+    (여러 줄 Final 방지)
+    """
+    if not isinstance(text, str):
+        return ""
+    # 줄 단위에서 Final:/Answer: 태그 제거
+    cleaned = re.sub(r'(?m)^\s*(Final:|Answer:)\s*', '', text).strip()
+    # 첫 유의미 라인만
+    for ln in cleaned.splitlines():
+        s = ln.strip()
+        if s:
+            return s
+    return ""
+
+async def stream_strip_tag(pieces):
+    """
+    strip_tag의 스트리밍 버전: 앞의 Final:/Answer: 태그를 떼고
+    첫 유의미 라인만 조각 단위로 흘려보낸다.
+    """
+    head = ""
+    started = False
+    async for piece in pieces:
+        if not started:
+            head += piece
+            s = head.lstrip()
+            # 태그가 완성될 때까지(또는 태그가 아님이 확실할 때까지) 모은다
+            if not s or any(t.startswith(s) for t in ("Final:", "Answer:")):
+                continue
+            piece = re.sub(r'^\s*(Final:|Answer:)\s*', '', head).lstrip()
+            if not piece:
+                continue
+            started = True
+        line, nl, _ = piece.partition("\n")
+        if line:
+            yield line
+        if nl:
+            return
+    rest = "" if started else strip_tag(head)
+    if rest:
+        yield rest
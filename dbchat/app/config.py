@@ -7,9 +7,36 @@ class Settings(BaseSettings):
     device_map: str = Field(default="cuda:0", description="transformers device_map value (e.g., 'cuda:0' or 'auto')")
     max_new_tokens: int = 256
     temperature: float = 0.0
+    # async 뷰(ainvoke/astream)에서 LLM 호출을 돌리는 스레드 수 (app.core.llm._llm_executor)
+    llm_executor_workers: int = 16
+    # JSON을 돌려받는 노드(라우팅/의도/상태/쿼리 체크)에 스키마 제약 디코딩 적용
+    constrained_json: bool = True
+    # 인텐트 분류를 그래프 밖에서 동시에 돌리고, 그래프는 결과를 기다리지 않고 바로 SQL 경로를 시작
+    # ("other"면 진행 중인 그래프/생성을 취소). 꺼져 있으면 그래프 안 fan-out에서 분류가 끝나길 기다린다.
+    speculative_intent: bool = False
+    # SQL 오류 시 수리 시도 예산 (요청당). 다 쓰면 안내 문구로 끝낸다 (app.graph.repair)
+    sql_repair_attempts: int = 2
+
+    # Graph checkpointer: none | memory (LRU/TTL) | sqlite (app.graph.checkpoint)
+    checkpointer: str = "memory"
+    checkpoint_max_threads: int = 256
+    checkpoint_ttl_s: float = 1800.0
+    checkpoint_path: str = "./db/checkpoints.sqlite"
+
+    # Tracing (app.core.tracing): 요청별 노드/LLM 토큰/SQL 시간 레코드
+    trace_enabled: bool = True
+    trace_buffer: int = 200          # 메모리 링 버퍼 크기
+    trace_path: str = ""             # 비어 있지 않으면 JSONL로 비동기 기록
+    trace_console: bool = False      # 노드별 콘솔 출력 (디버그용)
 
     # Database 
     sqlite_uri: str = "sqlite:///./db/protectee.db"
+    # 대상자 이름 캐시 (app.graph.planner._known_names). 질문의 이름이 캐시에 없으면 refresh_s 간격으로 다시 읽는다
+    known_names_ttl_s: float = 300.0
+    known_names_refresh_s: float = 10.0
+    # db_query_tool 결과 상한 (행 수, 문자열 값 길이). 넘는 행은 버리고 truncated로 표시
+    tool_max_rows: int = 200
+    tool_max_string: int = 300
 
     # Server
     api_prefix: str = "/api"
@@ -1,10 +1,18 @@
 from langchain_community.utilities import SQLDatabase
+from sqlalchemy.engine import Engine
 from app.config import settings
+from app.core.indexes import sqlite_path
+from llm_web import protectee_db
 
 _db_singleton: SQLDatabase | None = None
 
+def get_engine() -> Engine:
+    """protectee.db 읽기 전용 공유 엔진 (db_query_tool이 행을 구조화된 그대로 받을 때 쓴다)."""
+    return protectee_db.engine(sqlite_path(settings.sqlite_uri))
+
 def get_db() -> SQLDatabase:
+    """읽기 전용 공유 풀(llm_web.protectee_db) 위의 SQLDatabase. LLM이 만든 SQL은 쓰기를 할 수 없다."""
     global _db_singleton
     if _db_singleton is None:
-        _db_singleton = SQLDatabase.from_uri(settings.sqlite_uri)
-    return _db_singleton
\ No newline at end of file
+        _db_singleton = SQLDatabase(get_engine())
+    return _db_singleton
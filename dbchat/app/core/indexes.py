@@ -0,0 +1,163 @@
+"""
+protectee.db(event/users) 보조 인덱스 관리.
+
+Django가 관리하지 않는 DB라 마이그레이션 대신 `python manage.py protectee_indexes`로 적용한다.
+- (protectee_id, timestamp): 대상자 + 날짜/주간 창 필터 (챗 SQL, 리포트 CTE의 하루 이벤트)
+- (protectee_id, <metric>, timestamp): 메트릭 최고/최저 ORDER BY ... LIMIT 1을 정렬 없이 인덱스 끝에서 읽는 커버링 인덱스
+- users(name): 이름 → id 조회
+compare()는 인덱스를 지웠다가 다시 만들므로 운영 DB(settings.sqlite_uri / PROTECTEE_DB_PATH)에는 쓰지 않는다.
+"""
+from __future__ import annotations
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.config import settings
+from llm_web import protectee_db
+
+# (인덱스 이름, 테이블, 컬럼)
+INDEXES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("ix_event_protectee_ts", "event", ("protectee_id", "timestamp")),
+    ("ix_event_protectee_stress_ts", "event", ("protectee_id", "stress", "timestamp")),
+    ("ix_event_protectee_hrv_ts", "event", ("protectee_id", "hrv", "timestamp")),
+    ("ix_event_protectee_ppg_ts", "event", ("protectee_id", "ppg_threat_detected", "timestamp")),
+    ("ix_event_protectee_imu_ts", "event", ("protectee_id", "imu_danger_level", "timestamp")),
+    ("ix_users_name", "users", ("name",)),
+]
+
+
+def sqlite_path(uri: Optional[str] = None) -> str:
+    """sqlite:///./db/protectee.db → ./db/protectee.db"""
+    uri = uri or settings.sqlite_uri
+    return uri.split("sqlite:///", 1)[1] if uri.startswith("sqlite:///") else uri
+
+
+def is_live_db(path: str) -> bool:
+    """path가 서비스가 읽는 protectee.db인지 (dbchat settings.sqlite_uri 또는 PROTECTEE_DB_PATH)."""
+    for live in (sqlite_path(), protectee_db.resolve_path()):
+        try:
+            if os.path.samefile(path, live):
+                return True
+        except OSError:
+            if os.path.abspath(path) == os.path.abspath(live):
+                return True
+    return False
+
+
+def existing(conn: sqlite3.Connection) -> Dict[str, str]:
+    rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall()
+    return {name: sql for name, sql in rows}
+
+
+def apply(conn: sqlite3.Connection, analyze: bool = True) -> List[str]:
+    """없는 인덱스만 만든다 → 새로 만든 이름. ANALYZE로 플래너 통계도 갱신."""
+    have = existing(conn)
+    created = []
+    for name, table, cols in INDEXES:
+        if name in have:
+            continue
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(cols)})")
+        created.append(name)
+    if analyze:
+        conn.execute("ANALYZE")
+    conn.commit()
+    return created
+
+
+def drop(conn: sqlite3.Connection) -> List[str]:
+    have = existing(conn)
+    dropped = [name for name, _, _ in INDEXES if name in have]
+    for name in dropped:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+    return dropped
+
+
+# 챗 SQL 대표 모양 (planner/query_gen이 만드는 형태). 인덱스 비교와 benchmarks.bench_db_scale이 같이 쓴다
+_EXTREME_DAY = (
+    "SELECT e.timestamp, e.stress FROM event e JOIN users u ON u.id = e.protectee_id "
+    "WHERE e.timestamp IS NOT NULL AND e.timestamp <> '' AND u.name = :name AND e.stress IS NOT NULL "
+    "AND e.timestamp >= :ts_from AND e.timestamp < :ts_to ORDER BY e.stress DESC, e.timestamp DESC LIMIT 1"
+)
+_AVG_WEEK = (
+    "SELECT ROUND(AVG(e.hrv), 1) FROM event e JOIN users u ON u.id = e.protectee_id "
+    "WHERE u.name = :name AND e.hrv IS NOT NULL AND e.timestamp >= :week_from AND e.timestamp < :ts_to"
+)
+_COUNT_ZONE_DAY = (
+    "SELECT COUNT(*) FROM event e JOIN users u ON u.id = e.protectee_id "
+    "WHERE u.name = :name AND e.timestamp >= :ts_from AND e.timestamp < :ts_to AND e.zone_type = 'unfamiliar'"
+)
+_ALL_TIME_MAX = (
+    "SELECT e.timestamp, e.imu_danger_level FROM event e JOIN users u ON u.id = e.protectee_id "
+    "WHERE u.name = :name AND e.imu_danger_level IS NOT NULL ORDER BY e.imu_danger_level DESC, e.timestamp DESC LIMIT 1"
+)
+_LIST_WEEK = (
+    "SELECT e.timestamp, e.stress FROM event e JOIN users u ON u.id = e.protectee_id "
+    "WHERE u.name = :name AND e.stress >= 80 AND e.timestamp >= :week_from AND e.timestamp < :ts_to ORDER BY e.timestamp"
+)
+
+
+def probe_params(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """이벤트가 가장 많은 대상자의 마지막 날(과 그 전 7일)을 기준으로 파라미터를 잡는다."""
+    row = conn.execute(
+        "SELECT u.name, MAX(e.timestamp) FROM users u JOIN event e ON e.protectee_id = u.id "
+        "WHERE u.id = (SELECT protectee_id FROM event GROUP BY protectee_id ORDER BY COUNT(*) DESC LIMIT 1)"
+    ).fetchone()
+    if not row or row[1] is None:
+        raise ValueError("event 테이블이 비어 있습니다")
+    name, last_ts = row
+    day = last_ts[:10]
+    ts_to, week_from = conn.execute("SELECT date(?, '+1 day') || ' 00:00:00', date(?, '-6 day') || ' 00:00:00'", (day, day)).fetchone()
+    return {"name": name, "date": day, "ts_from": f"{day} 00:00:00", "ts_to": ts_to, "week_from": week_from}
+
+
+def chat_probes(params: Dict[str, Any]) -> List[Tuple[str, str, Dict[str, Any]]]:
+    pick = lambda *keys: {k: params[k] for k in keys}
+    return [
+        ("chat_extreme_day", _EXTREME_DAY, pick("name", "ts_from", "ts_to")),
+        ("chat_avg_week", _AVG_WEEK, pick("name", "week_from", "ts_to")),
+        ("chat_count_zone_day", _COUNT_ZONE_DAY, pick("name", "ts_from", "ts_to")),
+        ("chat_all_time_max", _ALL_TIME_MAX, pick("name")),
+        ("chat_list_week", _LIST_WEEK, pick("name", "week_from", "ts_to")),
+    ]
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: Dict[str, Any]) -> List[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def time_query(conn: sqlite3.Connection, sql: str, params: Dict[str, Any], repeats: int = 3) -> Dict[str, float]:
+    """반복 실행 ms (첫 실행은 페이지 캐시 워밍으로 따로 본다)."""
+    runs: List[float] = []
+    for _ in range(max(1, repeats)):
+        t0 = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        runs.append((time.perf_counter() - t0) * 1000.0)
+    return {"first_ms": round(runs[0], 2), "best_ms": round(min(runs), 2)}
+
+
+def profile(conn: sqlite3.Connection, probes: Sequence[Tuple[str, str, Dict[str, Any]]], repeats: int = 3) -> List[Dict[str, Any]]:
+    """(이름, SQL, 파라미터) 목록 → 쿼리별 EXPLAIN QUERY PLAN + 시간."""
+    return [
+        {"name": name, "plan": explain(conn, sql, params), **time_query(conn, sql, params, repeats)}
+        for name, sql, params in probes
+    ]
+
+
+def compare(path: str, probes: Sequence[Tuple[str, str, Dict[str, Any]]], repeats: int = 3) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    관리 인덱스 없이/있이 profile → (before, after). 끝나면 인덱스가 적용된 상태.
+    중간에 끊기면 인덱스 없이 남고 도는 동안 읽기도 느려지므로 운영 DB에는 거부한다 (복사본에 쓸 것).
+    """
+    if is_live_db(path):
+        raise ValueError(f"운영 DB에는 compare를 쓸 수 없습니다 (복사본을 지정하세요): {path}")
+    conn = sqlite3.connect(path)
+    try:
+        drop(conn)
+        conn.execute("ANALYZE")
+        before = profile(conn, probes, repeats)
+        apply(conn)
+        after = profile(conn, probes, repeats)
+    finally:
+        conn.close()
+    return before, after
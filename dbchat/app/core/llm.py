@@ -1,8 +1,243 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-from langchain_huggingface import ChatHuggingFace, HuggingFacePipeline
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
 from app.config import settings
+from llm_server import cancel
+from llm_server.config import settings as server_settings
+from llm_web import readiness
 
 _llm_singleton = None
+_streaming_llm_singleton = None
+# 동시에 들어온 첫 요청들이 모델을 각자 올리지 않도록 초기화를 한 번만 수행
+_init_lock = threading.Lock()
+
+# async 경로(ainvoke/astream)의 LLM 호출을 받는 전용 스레드 풀: 이벤트 루프는 막지 않고,
+# 동시에 걸린 질문 수와 무관하게 엔진으로 가는 호출 수만 제한한다 (엔진/배치 스케줄러가 그 뒤를 직렬화)
+_llm_executor = ThreadPoolExecutor(max_workers=max(1, settings.llm_executor_workers), thread_name_prefix="llm")
+
+
+def _run_in_llm_executor(fn, *args, **kwargs):
+    """컨텍스트(취소 토큰 등)를 복사해 LLM 스레드 풀에서 실행."""
+    ctx = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(_llm_executor, partial(ctx.run, fn, *args, **kwargs))
+
+# 접두부 KV 캐시 대상인 정적 system 프롬프트 원문 (각 모듈이 import 시점에 등록)
+_STATIC_PREFIXES: set[str] = set()
+
+_ROLE_MAP = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+def _to_chat_messages(messages: List[BaseMessage]) -> List[Dict[str, str]]:
+    return [{"role": _ROLE_MAP.get(m.type, "user"), "content": m.content} for m in messages]
+
+
+def register_static_prefix(*texts: str) -> None:
+    """
+    매 요청 똑같이 들어가는 system 메시지를 등록한다. 요청의 앞쪽 system 메시지들이
+    모두 등록된 원문이면, 엔진은 그 구간의 past_key_values를 재사용한다.
+    (ChatPromptTemplate에 넣는 원문이면 '{{ }}' 이스케이프를 푼 문자열을 넘길 것)
+    """
+    _STATIC_PREFIXES.update(texts)
+
+
+def _static_prefix_len(messages: List[BaseMessage]) -> int:
+    n = 0
+    for m in messages:
+        if m.type != "system" or m.content not in _STATIC_PREFIXES:
+            break
+        n += 1
+    return n
+
+
+class ServedChatModel(BaseChatModel):
+    """
+    GenerationEngine(로컬) 또는 RemoteEngine(모델 서버) 위에 얹는 LangChain 챗 모델.
+    그래프 노드들은 기존처럼 `prompt | llm | parser` 로 사용한다.
+
+    disable_streaming=True(기본)면 graph의 messages 스트림 모드에서도 배치 경로(_generate)를 쓰고,
+    False인 인스턴스(get_streaming_chat_llm)만 토큰 스트리밍(_stream)을 한다.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    engine: Any
+    # llm_server.response_cache.ResponseCache (None이면 캐시 안 함)
+    cache: Any = None
+    model_name: str = settings.model_id
+    max_new_tokens: int = settings.max_new_tokens
+    temperature: float = settings.temperature
+
+    @property
+    def _llm_type(self) -> str:
+        return "served-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "max_new_tokens": self.max_new_tokens, "temperature": self.temperature}
+
+    def _params(self, stop: Optional[List[str]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        params = {
+            "max_new_tokens": self.max_new_tokens,
+            "do_sample": self.temperature > 0,
+            "temperature": self.temperature,
+            "stop": list(stop or []),
+        }
+        params.update({k: v for k, v in kwargs.items() if v is not None})
+        if params.get("profile") and "max_new_tokens" not in kwargs:
+            # 프로필을 고른 호출은 프로필의 토큰 예산을 쓴다 (엔진에서 합침)
+            params.pop("max_new_tokens")
+        token = cancel.current()
+        if token is not None:
+            # 취소된 요청이면 엔진에 보내지 않고, 진행 중이면 엔진이 스텝마다 확인해 끊는다
+            token.raise_if_cancelled()
+            params["cancel"] = token
+        return params
+
+    def _cache_key(self, chat_messages: List[Dict[str, str]], params: Dict[str, Any]) -> Optional[str]:
+        """
+        (모델 id, 프롬프트, 생성 파라미터) 키. 챗 템플릿은 모델마다 고정이므로 렌더링 전 메시지로
+        키를 만든다 (원격 엔진은 렌더러가 없음). 샘플링 호출이면 None → 캐시 우회.
+        """
+        from llm_server.response_cache import cacheable, make_key
+        if self.cache is None or not cacheable(params):
+            return None
+        return make_key(self.model_name, chat_messages, params)
+
+    @staticmethod
+    def _usage(rows: List[Dict[str, int]]) -> Optional[Dict[str, Any]]:
+        """
+        엔진이 생성하면서 센 토큰 수 (챗 템플릿 포함 프롬프트 길이, 새 토큰 수).
+        캐시 적중이나 원격 스트림처럼 엔진이 세지 않은 호출은 None.
+        """
+        if not rows:
+            return None
+        prompt_n, completion_n = rows[0]["prompt_tokens"], rows[0]["completion_tokens"]
+        return {"input_tokens": prompt_n, "output_tokens": completion_n, "total_tokens": prompt_n + completion_n}
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        params = self._params(stop, kwargs)
+        params.setdefault("prefix_messages", _static_prefix_len(messages))
+        chat_messages = _to_chat_messages(messages)
+        key = self._cache_key(chat_messages, params)
+        text = self.cache.get(key) if key else None
+        cached = text is not None
+        rows: List[Dict[str, int]] = []
+        if text is None:
+            text = self.engine.chat(chat_messages, **params, usage=rows)
+            if key:
+                self.cache.put(key, text)
+        usage = self._usage(rows)
+        llm_output = {"cached": cached}
+        if usage:
+            llm_output["token_usage"] = {
+                "prompt_tokens": usage["input_tokens"], "completion_tokens": usage["output_tokens"],
+            }
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))],
+            llm_output=llm_output,
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        params = self._params(stop, kwargs)
+        params.setdefault("prefix_messages", _static_prefix_len(messages))
+        chat_messages = _to_chat_messages(messages)
+        key = self._cache_key(chat_messages, params)
+        cached = self.cache.get(key) if key else None
+        rows: List[Dict[str, int]] = []
+        pieces = [cached] if cached is not None else self.engine.stream_chat(chat_messages, **params, usage=rows)
+        out = []
+        for piece in pieces:
+            out.append(piece)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        usage = self._usage(rows)
+        if usage:
+            # 토큰 수는 마지막 빈 청크에 실어 on_llm_end(usage_metadata 합산)로 보낸다
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+        if key and cached is None:
+            self.cache.put(key, "".join(out))
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await _run_in_llm_executor(self._generate, messages, stop, None, **kwargs)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """동기 _stream을 LLM 스레드 풀에서 돌리고 청크를 큐로 받아 이벤트 루프 쪽에서 내보낸다."""
+        loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def _pump():
+            try:
+                for chunk in self._stream(messages, stop, None, **kwargs):
+                    loop.call_soon_threadsafe(q.put_nowait, chunk)
+            except BaseException as e:
+                loop.call_soon_threadsafe(q.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(q.put_nowait, done)
+
+        worker = _run_in_llm_executor(_pump)
+        while True:
+            item = await q.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            if run_manager and item.message.content:
+                await run_manager.on_llm_new_token(item.message.content, chunk=item)
+            yield item
+        await worker
+
+
+def load_chat_engine():
+    """dbchat용 Llama 엔진을 현재 프로세스에 올린다 (모델 서버 또는 로컬 모드)."""
+    from llm_server.engine import load_engine
+    return load_engine("chat", settings.model_id, settings.device_map)
+
+
+def _response_cache():
+    if server_settings.response_cache_entries <= 0 and not server_settings.response_cache_path:
+        return None
+    from llm_server.response_cache import ResponseCache
+    return ResponseCache(
+        "chat",
+        server_settings.response_cache_entries,
+        path=server_settings.response_cache_path,
+        ttl_s=server_settings.response_cache_ttl_s,
+        max_bytes=int(server_settings.response_cache_max_mb * 1024 * 1024),
+    )
 
 
 def get_chat_llm():
@@ -10,26 +245,36 @@ def get_chat_llm():
     if _llm_singleton is not None:
         return _llm_singleton
 
-    tok = AutoTokenizer.from_pretrained(settings.model_id, use_fast=True)
-    if tok.pad_token_id is None:
-        tok.pad_token_id = tok.eos_token_id
+    with _init_lock:
+        if _llm_singleton is None:
+            with readiness.track_load("chat"):
+                if server_settings.server_url:
+                    from llm_server.client import RemoteEngine
+                    engine = RemoteEngine("chat")
+                else:
+                    from llm_server.batching import with_batching
+                    engine = with_batching(
+                        load_chat_engine(), server_settings.batch_max_size, server_settings.batch_max_wait_ms
+                    )
+                _llm_singleton = ServedChatModel(engine=engine, cache=_response_cache(), disable_streaming=True)
+    return _llm_singleton
 
-    mdl = AutoModelForCausalLM.from_pretrained(
-        settings.model_id,
-        torch_dtype="auto",
-        device_map={"": settings.device_map},  # "auto" or specific device
-    )
 
-    gen = pipeline(
-        "text-generation",
-        model=mdl,
-        tokenizer=tok,
-        max_new_tokens=settings.max_new_tokens,
-        do_sample=False,
-        temperature=settings.temperature,
-        top_p=1.0,
-        return_full_text=False,
-    )
-    base_llm = HuggingFacePipeline(pipeline=gen)
-    _llm_singleton = ChatHuggingFace(llm=base_llm)
-    return _llm_singleton
\ No newline at end of file
+def get_json_llm(schema: Dict[str, Any], profile: Optional[str] = None):
+    """
+    JSON만 돌려받는 노드용 LLM. settings.constrained_json이면 엔진이 스키마 제약 디코딩을 해서
+    출력이 항상 파싱 가능하고 닫는 '}'에서 생성이 끝난다. profile은 llm_server.profiles 이름.
+    """
+    llm = get_chat_llm()
+    return llm.bind(json_schema=schema if settings.constrained_json else None, profile=profile)
+
+
+def get_streaming_chat_llm():
+    """같은 엔진을 쓰되 토큰 스트리밍을 하는 인스턴스 (사용자에게 바로 보여줄 노드용)."""
+    global _streaming_llm_singleton
+    if _streaming_llm_singleton is None:
+        llm = get_chat_llm()
+        with _init_lock:
+            if _streaming_llm_singleton is None:
+                _streaming_llm_singleton = llm.model_copy(update={"disable_streaming": False})
+    return _streaming_llm_singleton
@@ -0,0 +1,64 @@
+"""
+DB 스키마 스냅샷. 시작 시 한 번 sqlite_master/PRAGMA table_info로 만들고,
+SQLite `PRAGMA schema_version`이 바뀌면(DDL 발생) 다시 만든다.
+스냅샷이 유효하면 그래프는 list_tables/get_schema 툴 왕복(샘플 행 SELECT 포함)을 건너뛴다.
+"""
+from __future__ import annotations
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from app.core.database import get_engine
+
+_lock = threading.Lock()
+_snapshot: Optional["SchemaSnapshot"] = None
+
+
+@dataclass(frozen=True)
+class SchemaSnapshot:
+    version: int
+    columns: Dict[str, List[str]]   # table -> column names
+    ddl: str                        # CREATE TABLE 문 (샘플 행 없음)
+
+
+def _exec(sql: str):
+    with get_engine().connect() as conn:
+        return conn.exec_driver_sql(sql).fetchall()
+
+
+def current_schema_version() -> int:
+    return int(_exec("PRAGMA schema_version")[0][0])
+
+
+def build_snapshot() -> SchemaSnapshot:
+    version = current_schema_version()
+    tables = _exec(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )
+    columns = {name: [r[1] for r in _exec(f'PRAGMA table_info("{name}")')] for name, _ in tables}
+    ddl = "\n\n".join((sql or "").strip() for _, sql in tables)
+    return SchemaSnapshot(version=version, columns=columns, ddl=ddl)
+
+
+def get_snapshot() -> SchemaSnapshot:
+    """현재 스키마 버전과 맞는 스냅샷 (버전이 바뀌었으면 다시 만든다)."""
+    global _snapshot
+    version = current_schema_version()
+    snap = _snapshot
+    if snap is not None and snap.version == version:
+        return snap
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = build_snapshot()
+        return _snapshot
+
+
+def snapshot_is_valid(required: Dict[str, List[str]]) -> bool:
+    """
+    스냅샷이 최신이고 required(프롬프트에 하드코딩된 테이블/컬럼)를 모두 담고 있으면 True.
+    DB 오류나 스키마 불일치면 False → 그래프는 기존 툴 경로로 스키마를 조회한다.
+    """
+    try:
+        snap = get_snapshot()
+    except Exception:
+        return False
+    return all(set(cols) <= set(snap.columns.get(t, [])) for t, cols in required.items())
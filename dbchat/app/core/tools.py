@@ -1,14 +1,66 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
 from langchain_core.tools import tool
-from app.core.database import get_db
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from app.config import settings
+from app.core.database import get_engine
+from llm_web import protectee_db
 
-@tool
-def db_query_tool(query: str) -> str:
+# 한도 초과 시 repair_sql이 그대로 받는 힌트 (app.graph.repair._last_error)
+_BUDGET_HINT = (
+    "The query was too expensive and was aborted. Join users only on u.id = e.protectee_id, "
+    "filter by u.name and a timestamp window, and aggregate (COUNT/AVG/MAX) or LIMIT instead of "
+    "listing or GROUP_CONCAT-ing every row."
+)
+
+
+class QueryResult(TypedDict):
+    """db_query_tool의 ToolMessage.artifact. format_answer/narrate_answer가 다시 파싱하지 않고 그대로 쓴다."""
+    columns: List[str]
+    rows: List[List[Any]]   # SQLite 타입 그대로 (int/float/str/None)
+    row_count: int          # rows 길이
+    truncated: bool         # tool_max_rows를 넘는 행이 더 있었음
+
+
+def _cell(v: Any) -> Any:
+    if isinstance(v, str) and len(v) > settings.tool_max_string:
+        return v[: settings.tool_max_string] + "..."
+    if isinstance(v, (bytes, memoryview)):
+        return f"<{len(v)} bytes>"
+    return v
+
+
+def run_query(query: str, parameters: Optional[Dict[str, Any]] = None, engine: Optional[Engine] = None) -> QueryResult:
+    """행은 tool_max_rows개까지만 가져온다 (하나 더 읽어 truncated를 판단)."""
+    limit = max(1, settings.tool_max_rows)
+    with (engine or get_engine()).connect() as conn:
+        cursor = conn.execute(text(query), parameters or {})
+        if not cursor.returns_rows:
+            return QueryResult(columns=[], rows=[], row_count=0, truncated=False)
+        columns = list(cursor.keys())
+        fetched = cursor.fetchmany(limit + 1)
+    rows = [[_cell(v) for v in r] for r in fetched[:limit]]
+    return QueryResult(columns=columns, rows=rows, row_count=len(rows), truncated=len(fetched) > limit)
+
+
+@tool(response_format="content_and_artifact")
+def db_query_tool(query: str, parameters: Optional[Dict[str, Any]] = None) -> Tuple[str, Optional[QueryResult]]:
     """
     Run SQL queries against the SQLite database and return results.
-    Returns an error string if the query failed.
+    `parameters` binds :name placeholders (used by the deterministic planner).
+    Returns {"columns", "rows", "row_count", "truncated"} as JSON,
+    or an error string if the query failed or exceeded its execution budget.
     """
-    db = get_db()
-    result = db.run_no_throw(query)
-    if not result:
-        return "Error: Query failed. Please rewrite your query and try again."
-    return result
\ No newline at end of file
+    # VM 스텝/시간 한도 (llm_web.protectee_db.query_budget) — 넘으면 SQLite가 쿼리를 중단한다
+    with protectee_db.query_budget() as budget:
+        try:
+            result = run_query(query, parameters)
+        except SQLAlchemyError as e:
+            if budget.exceeded:
+                return f"Error: {budget.describe()}. {_BUDGET_HINT}", None
+            return f"Error: {e}", None
+    if not result["rows"]:
+        return "Error: Query failed. Please rewrite your query and try again.", None
+    return json.dumps(result, ensure_ascii=False, default=str, separators=(",", ":")), result
@@ -0,0 +1,206 @@
+"""
+요청 단위 그래프 트레이싱 (콘솔 pretty-print 대체).
+
+GraphTracer를 그래프 실행 config의 callbacks에 넣으면 노드별 시작/끝, LLM 호출별 프롬프트/생성 토큰 수,
+db_query_tool 실행 시간, SQL 수리 시도 수를 모아 finish()에서 한 건의 레코드로 만든다.
+레코드는 메모리 링 버퍼(최근 settings.trace_buffer건, recent())에 들어가고, settings.trace_path가 있으면
+백그라운드 스레드가 JSONL로 덧붙여 쓴다 (요청 스레드는 파일 I/O를 하지 않음).
+노드 소요 시간은 dbchat.node.<name>.ms 요약 메트릭에도 남는다.
+"""
+from __future__ import annotations
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+from app.config import settings
+from llm_web import metrics
+
+log = logging.getLogger("dbchat.tracing")
+
+_buffer: deque = deque(maxlen=max(1, settings.trace_buffer))
+_buffer_lock = threading.Lock()
+_flush_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=10000)
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+_dropped = metrics.counter("dbchat.trace.dropped")
+
+_SQL_TOOL = "db_query_tool"
+
+
+def _write_loop(path: str) -> None:
+    while True:
+        batch = [_flush_queue.get()]
+        while True:  # 쌓인 것을 한 번에 쓴다
+            try:
+                batch.append(_flush_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                for rec in batch:
+                    f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            log.warning("trace flush failed: %s", e)
+
+
+def _ensure_writer() -> None:
+    global _writer
+    if _writer is not None or not settings.trace_path:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, args=(settings.trace_path,), name="trace-writer", daemon=True)
+            _writer.start()
+
+
+def record(trace: Dict[str, Any]) -> None:
+    with _buffer_lock:
+        _buffer.append(trace)
+    if settings.trace_path:
+        _ensure_writer()
+        try:
+            _flush_queue.put_nowait(trace)
+        except queue.Full:
+            _dropped.inc()
+
+
+def recent(n: int = 50) -> List[Dict[str, Any]]:
+    with _buffer_lock:
+        return list(_buffer)[-n:]
+
+
+class GraphTracer(BaseCallbackHandler):
+    """요청 하나에 하나. 병렬 노드의 콜백이 여러 스레드에서 오므로 락으로 보호한다."""
+
+    raise_error = False
+
+    def __init__(self, question: str = ""):
+        self.trace_id = uuid.uuid4().hex
+        self.question = question
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._open: Dict[Any, tuple] = {}  # run_id → (kind, name, node, start_ms)
+        self.nodes: List[Dict[str, Any]] = []
+        self.llm_calls: List[Dict[str, Any]] = []
+        self.sql: List[Dict[str, Any]] = []
+
+    def _now_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000.0
+
+    def _start(self, run_id, kind: str, name: str, node: Optional[str]) -> None:
+        with self._lock:
+            self._open[run_id] = (kind, name, node, self._now_ms())
+
+    def _end(self, run_id, error: Optional[BaseException] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            opened = self._open.pop(run_id, None)
+        if opened is None:
+            return None
+        kind, name, node, start = opened
+        end = self._now_ms()
+        span = {"name": name, "node": node, "start_ms": round(start, 2), "ms": round(end - start, 2)}
+        if error is not None:
+            span["error"] = repr(error)[:300]
+        return span
+
+    # ---- 노드 ----
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        # 노드 자체의 run만 (노드 안의 prompt | llm 체인도 같은 메타데이터를 가진다)
+        if node and kwargs.get("name") == node:
+            self._start(run_id, "node", node, node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs) -> None:
+        span = self._end(run_id)
+        if span is not None:
+            metrics.summary(f"dbchat.node.{span['name']}.ms").observe(span["ms"])
+            with self._lock:
+                self.nodes.append(span)
+
+    def on_chain_error(self, error, *, run_id, **kwargs) -> None:
+        span = self._end(run_id, error)
+        if span is not None:
+            with self._lock:
+                self.nodes.append(span)
+
+    # ---- LLM ----
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs) -> None:
+        self._start(run_id, "llm", (metadata or {}).get("ls_model_name") or "llm", (metadata or {}).get("langgraph_node"))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs) -> None:
+        self._start(run_id, "llm", "llm", (metadata or {}).get("langgraph_node"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        span = self._end(run_id)
+        if span is None:
+            return
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if not usage:
+            for gens in response.generations:
+                for g in gens:
+                    um = getattr(getattr(g, "message", None), "usage_metadata", None) or {}
+                    usage = {"prompt_tokens": um.get("input_tokens"), "completion_tokens": um.get("output_tokens")}
+        span["prompt_tokens"] = usage.get("prompt_tokens")
+        span["completion_tokens"] = usage.get("completion_tokens")
+        with self._lock:
+            self.llm_calls.append(span)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        span = self._end(run_id, error)
+        if span is not None:
+            with self._lock:
+                self.llm_calls.append(span)
+
+    # ---- SQL 툴 ----
+    def on_tool_start(self, serialized, input_str, *, run_id, metadata=None, **kwargs) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        if name == _SQL_TOOL:
+            self._start(run_id, "sql", name, (metadata or {}).get("langgraph_node"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        span = self._end(run_id)
+        if span is not None:
+            metrics.summary("dbchat.sql.exec_ms").observe(span["ms"])
+            span["ok"] = not str(getattr(output, "content", output)).lstrip().lower().startswith("error:")
+            artifact = getattr(output, "artifact", None)
+            if isinstance(artifact, dict) and "row_count" in artifact:
+                span.update(rows=artifact["row_count"], truncated=artifact.get("truncated", False))
+            with self._lock:
+                self.sql.append(span)
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        span = self._end(run_id, error)
+        if span is not None:
+            with self._lock:
+                self.sql.append(span)
+
+    # ---- 마무리 ----
+    def finish(self, state: Optional[Dict[str, Any]] = None, error: Optional[BaseException] = None) -> Dict[str, Any]:
+        state = state or {}
+        with self._lock:
+            trace = {
+                "trace_id": self.trace_id,
+                "ts": self.started,
+                "question": self.question,
+                "total_ms": round(self._now_ms(), 2),
+                "intent": state.get("intent"),
+                "planned": state.get("planned"),
+                "followup": state.get("followup", False),
+                "repair_attempts": state.get("repair_attempts", 0),
+                "nodes": list(self.nodes),
+                "llm": list(self.llm_calls),
+                "sql": list(self.sql),
+                "prompt_tokens": sum(c.get("prompt_tokens") or 0 for c in self.llm_calls),
+                "completion_tokens": sum(c.get("completion_tokens") or 0 for c in self.llm_calls),
+                "sql_ms": round(sum(s["ms"] for s in self.sql), 2),
+            }
+        if error is not None:
+            trace["error"] = repr(error)[:300]
+        record(trace)
+        return trace
@@ -1,8 +1,21 @@
 from __future__ import annotations
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import asyncio
 import re
-from dbchat.app.graph.workflow import run_graph  # LangGraph 실행기
-# intent가 필요하면: from dbchat.app.utils.intent import classify_intent_llm, list_known_names
+from concurrent.futures import Future, ThreadPoolExecutor
+from langchain_core.messages import AIMessage, AIMessageChunk
+from llm_server import cancel
+from llm_server.cancel import Cancelled, CancelToken
+from llm_web import metrics
+from dbchat.app.config import settings
+from dbchat.app.graph.workflow import run_graph, arun_graph, get_graph_app, prepare_run  # LangGraph 실행기
+from dbchat.app.utils.intent import classify_intent_llm
+
+# speculative_intent 모드의 인텐트 게이트 (그래프와 동시에 실행)
+_gate_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="intent-gate")
+_gate_cancelled = metrics.counter("dbchat.intent_gate.cancelled")
+# 요청당 SQL 수리 시도 수 (app.graph.repair)
+_repair_attempts = metrics.summary("dbchat.sql_repair.attempts")
 
 def _extract_final(messages: List[Any]) -> str:
     last = None
@@ -17,6 +30,255 @@ def _extract_final(messages: List[Any]) -> str:
             last = re.sub(r"^Answer:\s*", "", c, flags=re.S).strip()
     return last or "응답 없음"
 
-def ask_once(question: str, recursive_limit: int = 30) -> Dict[str, Any]:
-    state = run_graph(question, recursive_limit=recursive_limit)
-    return {"ok": True, "answer": _extract_final(state.get("messages", []))}
+def _start_intent_gate(question: str, token: CancelToken) -> Future:
+    """그래프와 동시에 인텐트를 분류하고, db_query가 아니면 (또는 분류가 실패하면) 그래프를 취소한다."""
+    def _gate() -> str:
+        try:
+            intent = classify_intent_llm(question)
+        except BaseException:
+            token.cancel()
+            raise
+        if intent != "db_query":
+            _gate_cancelled.inc()
+            token.cancel()
+        return intent
+    return _gate_pool.submit(_gate)
+
+def _speculative(speculative: Optional[bool]) -> bool:
+    return settings.speculative_intent if speculative is None else speculative
+
+def ask_once(
+    question: str,
+    recursive_limit: int = 30,
+    speculative: Optional[bool] = None,
+    thread_id: Optional[str] = None,
+    trace_out: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    speculative(기본: settings.speculative_intent)면 인텐트 분류를 기다리지 않고 그래프를 바로 시작하고,
+    분류가 "other"로 끝나면 진행 중인 그래프/생성을 취소한다.
+    thread_id(ChatThread id)를 주면 대화 context를 이어 써 후속 질문을 재계획한다.
+    """
+    run = dict(recursive_limit=recursive_limit, thread_id=thread_id, trace_out=trace_out)
+    if not _speculative(speculative):
+        state = run_graph(question, **run)
+        intent = state.get("intent", "db_query")
+    else:
+        token = CancelToken()
+        gate = _start_intent_gate(question, token)
+        state, error = {}, None
+        try:
+            state = run_graph(question, cancel_token=token, speculative_intent=True, **run)
+        except Cancelled:
+            pass
+        except Exception as e:  # 인텐트가 "other"면 그래프 오류는 의미가 없으므로 게이트 결과를 먼저 본다
+            error = e
+        intent = gate.result()
+        if intent == "db_query" and error is not None:
+            raise error
+    return _once_result(state, intent)
+
+async def aask_once(
+    question: str,
+    recursive_limit: int = 30,
+    speculative: Optional[bool] = None,
+    thread_id: Optional[str] = None,
+    trace_out: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """ask_once의 async 버전. 인텐트 게이트는 게이트 스레드 풀에서 돌고 이벤트 루프는 결과만 기다린다."""
+    run = dict(recursive_limit=recursive_limit, thread_id=thread_id, trace_out=trace_out)
+    if not _speculative(speculative):
+        state = await arun_graph(question, **run)
+        intent = state.get("intent", "db_query")
+    else:
+        token = CancelToken()
+        gate = asyncio.wrap_future(_start_intent_gate(question, token))
+        state, error = {}, None
+        try:
+            state = await arun_graph(question, cancel_token=token, speculative_intent=True, **run)
+        except Cancelled:
+            pass
+        except Exception as e:
+            error = e
+        intent = await gate
+        if intent == "db_query" and error is not None:
+            raise error
+    return _once_result(state, intent)
+
+def _once_result(state: Dict[str, Any], intent: str) -> Dict[str, Any]:
+    if intent == "db_query":
+        _repair_attempts.observe(state.get("repair_attempts", 0))
+    return {
+        "ok": True,
+        "intent": intent,
+        "answer": _extract_final(state.get("messages", [])) if intent == "db_query" else "",
+        "repair_attempts": state.get("repair_attempts", 0),
+        "planned": bool(state.get("planned")),
+        "followup": bool(state.get("followup")),
+    }
+
+def _narrate_piece(item, streamed: bool) -> Tuple[Optional[str], bool]:
+    """messages 스트림 항목에서 narrate_answer가 낸 텍스트만 꺼낸다 → (텍스트 또는 None, streamed)."""
+    chunk, meta = item
+    if meta.get("langgraph_node") != "narrate_answer":
+        return None, streamed
+    if isinstance(chunk, AIMessageChunk):
+        streamed = True
+    elif streamed or not isinstance(chunk, AIMessage):
+        return None, streamed  # 이미 토큰으로 보낸 최종 메시지는 건너뜀
+    if isinstance(chunk.content, str) and chunk.content:
+        return chunk.content, streamed
+    return None, streamed
+
+class _NarrateStream:
+    """
+    ask_stream/aask_stream 공통 상태: messages/values 이벤트 해석, 인텐트 게이트 확인, 마무리.
+    finish()는 한 번만 돈다 — 소비자가 첫 줄에서 스트림을 닫아도(GeneratorExit) finally에서 불러
+    트레이스/state_out/수리 시도 메트릭이 빠지지 않게 한다.
+    """
+
+    def __init__(self, question: str, recursive_limit: int, speculative: Optional[bool], state_out: Optional[Dict[str, Any]]):
+        self.app = get_graph_app()
+        speculative = _speculative(speculative)
+        self.tracer, self.config, self.inputs = prepare_run(question, recursive_limit, speculative)
+        self.token = CancelToken() if speculative else None
+        self.gate: Optional[Future] = _start_intent_gate(question, self.token) if speculative else None
+        self.state_out = state_out
+        self.values: Dict[str, Any] = {}
+        self.intent: Optional[str] = None
+        self.emitted = self.streamed = False
+        self._finished = False
+
+    def text(self, mode: str, item) -> Optional[str]:
+        """이벤트 하나 → 내보낼 narrate 텍스트 (없으면 None)."""
+        if self.token is not None:
+            self.token.raise_if_cancelled()
+        if mode == "values":
+            self.values = item
+            return None
+        text, self.streamed = _narrate_piece(item, self.streamed)
+        return text
+
+    @property
+    def gate_pending(self) -> bool:
+        return self.gate is not None and self.intent is None
+
+    def admit(self, intent: str) -> bool:
+        """첫 토큰 전 게이트 결과를 반영 → 내보내도 되면 True."""
+        self.intent = intent
+        return intent == "db_query"
+
+    def reraise(self, intent: Optional[str]) -> bool:
+        # 인텐트가 "other"면 그래프 오류는 의미가 없으므로 삼킨다
+        return intent is None or intent == "db_query"
+
+    def finish(self, intent: Optional[str], error: Optional[BaseException] = None) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        values = dict(self.values)
+        if intent is not None:
+            values["intent"] = intent
+        self.values = values
+        if self.tracer:
+            self.tracer.finish(values, error=error)
+        if error is not None:
+            return
+        if self.state_out is not None:
+            self.state_out.update(values)
+        if values.get("intent", "db_query") == "db_query":
+            _repair_attempts.observe(values.get("repair_attempts", 0))
+
+    def fallback(self) -> Optional[str]:
+        """LLM 토큰 없이 끝난 경로면 최종 상태에서 꺼낸 답."""
+        if self.emitted or self.values.get("intent", "db_query") != "db_query":
+            return None
+        return _extract_final(self.values.get("messages", []))
+
+def ask_stream(
+    question: str,
+    recursive_limit: int = 30,
+    state_out: Optional[Dict[str, Any]] = None,
+    speculative: Optional[bool] = None,
+) -> Iterator[str]:
+    """
+    그래프를 messages 스트림 모드로 돌려 narrate_answer의 토큰을 생성되는 대로 내보낸다.
+    (LLM 없이 끝나는 경로면 최종 상태에서 답을 꺼내 한 번에 내보냄)
+    state_out을 주면 끝난 뒤 최종 상태 값(intent 등)을 채워 준다.
+    speculative 모드에서는 첫 토큰을 내보내기 전에 인텐트 게이트 결과를 확인한다.
+    """
+    run = _NarrateStream(question, recursive_limit, speculative, state_out)
+    gate_result = lambda: run.gate.result() if run.gate is not None else None
+    # values 모드로 최종 상태도 같이 받는다 (checkpointer=none이면 get_state를 쓸 수 없음)
+    events = run.app.stream(run.inputs, run.config, stream_mode=["messages", "values"])
+    try:
+        while True:
+            # 취소 토큰은 next() 동안만 건다 (그 안에서 도는 노드/병렬 워커가 컨텍스트를 물려받음)
+            with cancel.scope(run.token):
+                try:
+                    mode, item = next(events)
+                except StopIteration:
+                    break
+            text = run.text(mode, item)
+            if text is None:
+                continue
+            if run.gate_pending and not run.admit(gate_result()):
+                break
+            run.emitted = True
+            yield text
+    except Cancelled:
+        pass
+    except Exception as e:
+        intent = gate_result()
+        if run.reraise(intent):
+            run.finish(intent, error=e)
+            raise
+    finally:
+        events.close()
+        run.finish(gate_result())
+
+    answer = run.fallback()
+    if answer is not None:
+        yield answer
+
+async def aask_stream(
+    question: str,
+    recursive_limit: int = 30,
+    state_out: Optional[Dict[str, Any]] = None,
+    speculative: Optional[bool] = None,
+) -> AsyncIterator[str]:
+    """ask_stream의 async 버전 (graph.astream). 요청 하나가 워커 스레드를 잡고 있지 않는다."""
+    run = _NarrateStream(question, recursive_limit, speculative, state_out)
+
+    async def gate_result() -> Optional[str]:
+        return await asyncio.wrap_future(run.gate) if run.gate is not None else None
+
+    events = run.app.astream(run.inputs, run.config, stream_mode=["messages", "values"])
+    try:
+        while True:
+            with cancel.scope(run.token):
+                try:
+                    mode, item = await events.__anext__()
+                except StopAsyncIteration:
+                    break
+            text = run.text(mode, item)
+            if text is None:
+                continue
+            if run.gate_pending and not run.admit(await gate_result()):
+                break
+            run.emitted = True
+            yield text
+    except Cancelled:
+        pass
+    except Exception as e:
+        intent = await gate_result()
+        if run.reraise(intent):
+            run.finish(intent, error=e)
+            raise
+    finally:
+        await events.aclose()
+        run.finish(await gate_result())
+
+    answer = run.fallback()
+    if answer is not None:
+        yield answer
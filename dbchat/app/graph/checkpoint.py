@@ -0,0 +1,332 @@
+"""
+그래프 체크포인터 선택 (settings.checkpointer).
+
+  none    체크포인터 없음. 1회성 질문용 — 스텝마다 상태를 직렬화하지 않고, 최종 상태는 스트림에서 받는다.
+  memory  스레드 단위 LRU + TTL로 비우는 InMemorySaver (기본). 대화 스레드 문맥을 프로세스 안에 둔다.
+  sqlite  SQLite 파일에 저장 (serde.dumps_typed → ormsgpack 바이너리). 워커 재시작/여러 워커 간 공유.
+
+저장소 크기/스레드 수/축출 수는 dbchat.checkpoint 메트릭으로 남는다.
+"""
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP, BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from app.config import settings
+from llm_web import metrics
+
+
+def _size(x: Any) -> int:
+    if isinstance(x, (bytes, bytearray, str)):
+        return len(x)
+    if isinstance(x, (tuple, list)):
+        return sum(_size(v) for v in x)
+    return 0
+
+
+class _ThreadLRU:
+    """스레드 id → 마지막 접근 시각. put 때 용량/TTL을 넘은 스레드를 돌려준다."""
+
+    def __init__(self, max_threads: int, ttl_s: float):
+        self.max_threads = max(1, int(max_threads))
+        self.ttl_s = float(ttl_s)
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def touch(self, thread_id: str) -> list[str]:
+        now = time.monotonic()
+        with self._lock:
+            self._seen[thread_id] = now
+            self._seen.move_to_end(thread_id)
+            victims = []
+            while len(self._seen) > self.max_threads:
+                victims.append(self._seen.popitem(last=False)[0])
+            while self.ttl_s > 0 and self._seen:
+                tid, seen = next(iter(self._seen.items()))
+                if now - seen <= self.ttl_s:
+                    break
+                self._seen.popitem(last=False)
+                victims.append(tid)
+            self.evictions += len(victims)
+            return victims
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """InMemorySaver + 스레드 단위 LRU/TTL 축출. 요청마다 새 thread_id를 써도 메모리가 한도 안에 머문다."""
+
+    mode = "memory"
+
+    def __init__(self, max_threads: int, ttl_s: float):
+        super().__init__()
+        self._lru = _ThreadLRU(max_threads, ttl_s)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        for tid in self._lru.touch(config["configurable"]["thread_id"]):
+            self.delete_thread(tid)
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def threads(self) -> int:
+        return len(self._lru)
+
+    def evictions(self) -> int:
+        return self._lru.evictions
+
+    def approx_bytes(self) -> int:
+        """직렬화된 체크포인트/채널 값/쓰기 바이트 합 (근사)."""
+        n = 0
+        for by_ns in list(self.storage.values()):
+            for by_id in list(by_ns.values()):
+                n += sum(_size(v) for v in list(by_id.values()))
+        n += sum(_size(v) for v in list(self.blobs.values()))
+        for w in list(self.writes.values()):
+            n += sum(_size(v) for v in list(w.values()))
+        return n
+
+
+class SqliteSaver(BaseCheckpointSaver):
+    """
+    체크포인트(채널 값 포함)와 pending write를 serde.dumps_typed 바이너리로 SQLite에 저장한다.
+    스레드 접근 시각을 같이 남겨 TTL/최대 스레드 수를 넘은 스레드를 지운다.
+    """
+
+    mode = "sqlite"
+    _PRUNE_EVERY = 64
+
+    def __init__(self, path: str, max_threads: int, ttl_s: float):
+        super().__init__()
+        self.max_threads = max(1, int(max_threads))
+        self.ttl_s = float(ttl_s)
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._evictions = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,"
+            " parent_checkpoint_id TEXT, type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB,"
+            " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id));"
+            "CREATE TABLE IF NOT EXISTS writes ("
+            " thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,"
+            " task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, type TEXT, value BLOB,"
+            " task_path TEXT NOT NULL DEFAULT '',"
+            " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx));"
+            "CREATE TABLE IF NOT EXISTS threads (thread_id TEXT PRIMARY KEY, accessed REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS threads_accessed ON threads (accessed);"
+        )
+        self._conn.commit()
+
+    # ---- 내부 ----
+    def _touch(self, thread_id: str) -> None:
+        self._conn.execute(
+            "INSERT INTO threads (thread_id, accessed) VALUES (?, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET accessed = excluded.accessed",
+            (thread_id, time.time()),
+        )
+
+    def _prune(self) -> None:
+        cur = self._conn.execute(
+            "SELECT thread_id FROM threads WHERE accessed < ? OR thread_id NOT IN "
+            "(SELECT thread_id FROM threads ORDER BY accessed DESC LIMIT ?)",
+            (time.time() - self.ttl_s if self.ttl_s > 0 else 0, self.max_threads),
+        )
+        victims = [r[0] for r in cur.fetchall()]
+        for tid in victims:
+            self._delete(tid)
+        self._evictions += len(victims)
+
+    def _delete(self, thread_id: str) -> None:
+        for table in ("checkpoints", "writes", "threads"):
+            self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def _tuple(self, row, thread_id: str, checkpoint_ns: str) -> CheckpointTuple:
+        checkpoint_id, parent_id, ctype, cblob, mtype, mblob = row
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes"
+            " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=self.serde.loads_typed((ctype, cblob)),
+            metadata=self.serde.loads_typed((mtype, mblob)),
+            parent_config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id,
+            }} if parent_id else None,
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in writes],
+        )
+
+    # ---- BaseCheckpointSaver ----
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        sql = ("SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+               " WHERE thread_id = ? AND checkpoint_ns = ?")
+        with self._lock:
+            if checkpoint_id:
+                row = self._conn.execute(sql + " AND checkpoint_id = ?", (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            else:
+                row = self._conn.execute(sql + " ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns)).fetchone()
+            return self._tuple(row, thread_id, checkpoint_ns) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        where, args = [], []
+        if config is not None:
+            where.append("thread_id = ?")
+            args.append(config["configurable"]["thread_id"])
+            ns = config["configurable"].get("checkpoint_ns")
+            if ns is not None:
+                where.append("checkpoint_ns = ?")
+                args.append(ns)
+            if get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                args.append(get_checkpoint_id(config))
+        if before is not None and get_checkpoint_id(before):
+            where.append("checkpoint_id < ?")
+            args.append(get_checkpoint_id(before))
+        sql = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint,"
+               " metadata_type, metadata FROM checkpoints")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+            out = []
+            for thread_id, ns, *rest in rows:
+                tup = self._tuple(rest, thread_id, ns)
+                if filter and not all(tup.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                out.append(tup)
+                if limit is not None and len(out) >= limit:
+                    break
+        yield from out
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        ctype, cblob = self.serde.dumps_typed(checkpoint)
+        mtype, mblob = self.serde.dumps_typed(dict(metadata))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 ctype, cblob, mtype, mblob),
+            )
+            self._touch(thread_id)
+            self._puts += 1
+            if self._puts % self._PRUNE_EVERY == 0:
+                self._prune()
+            self._conn.commit()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        c = config["configurable"]
+        # 특수 채널(에러/인터럽트 등)은 같은 자리를 덮어쓰고, 일반 쓰기는 처음 것만 남긴다
+        verb = "INSERT OR REPLACE" if all(w[0] in WRITES_IDX_MAP for w in writes) else "INSERT OR IGNORE"
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            t, blob = self.serde.dumps_typed(value)
+            rows.append((c["thread_id"], c.get("checkpoint_ns", ""), c["checkpoint_id"], task_id,
+                         WRITES_IDX_MAP.get(channel, idx), channel, t, blob, task_path))
+        with self._lock:
+            self._conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._delete(thread_id)
+            self._conn.commit()
+
+    # async 경로(ainvoke/astream)는 동기 구현을 그대로 쓴다 (InMemorySaver와 같은 방식)
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = "") -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    # ---- 메트릭 ----
+    def threads(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+
+    def evictions(self) -> int:
+        return self._evictions
+
+    def approx_bytes(self) -> int:
+        with self._lock:
+            pages = self._conn.execute("PRAGMA page_count").fetchone()[0]
+            size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        return pages * size
+
+
+class _CheckpointStats:
+    """/metrics에서 읽을 때 계산 (dbchat.checkpoint)."""
+
+    def __init__(self, saver):
+        self.saver = saver
+
+    def snapshot(self) -> Dict[str, Any]:
+        s = self.saver
+        if s is None:
+            return {"mode": "none", "threads": 0, "bytes": 0, "evictions": 0}
+        return {"mode": s.mode, "threads": s.threads(), "bytes": s.approx_bytes(), "evictions": s.evictions()}
+
+
+def make_checkpointer():
+    """settings.checkpointer에 맞는 체크포인터 (none이면 None)를 만들고 메트릭에 등록한다."""
+    mode = (settings.checkpointer or "none").lower()
+    if mode == "none":
+        saver = None
+    elif mode == "memory":
+        saver = BoundedMemorySaver(settings.checkpoint_max_threads, settings.checkpoint_ttl_s)
+    elif mode == "sqlite":
+        saver = SqliteSaver(settings.checkpoint_path, settings.checkpoint_max_threads, settings.checkpoint_ttl_s)
+    else:
+        raise ValueError(f"unknown checkpointer: {settings.checkpointer}")
+    metrics.register("dbchat.checkpoint", _CheckpointStats(saver))
+    return saver
@@ -0,0 +1,172 @@
+"""
+대화(ChatThread) 단위 문맥 재사용.
+
+AskAPI는 ChatThread id로 그래프를 돌리므로(thread_id "chat:<id>") 체크포인터에 지난 턴의 해석 결과가
+context로 남는다 (대상자, 메트릭, 질문 모양, 날짜/주간/시각 창, 상태 필터, 실행한 SQL).
+"그럼 어제는?"처럼 대상자/메트릭 없이 슬롯 하나만 바꾸는 후속 질문은 분류 fan-out과
+스키마/메트릭/query_gen 경로를 건너뛰고, context에 바뀐 슬롯만 덮어써 플래너로 바로 보낸다.
+(플래너가 확신하지 못하면 합친 슬롯으로 기존 LLM 경로를 탄다)
+"""
+from __future__ import annotations
+import re
+from typing import Any, Dict, List, Optional
+from langchain_core.messages import HumanMessage, RemoveMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from app.graph.nodes import _extract_latest_question
+from app.graph.planner import _METRIC_WORDS, _names_in, _shape
+from app.utils.dates import extract_date_yyyy_mm_dd, extract_time_filter, resolve_week_window_kst, to_yyyy_mm_dd_hh_mm_ss_strings
+from app.utils.intent import asks_when, detect_extreme_direction, detect_zone_and_watch_filters
+from llm_web import metrics
+
+_replanned = metrics.counter("dbchat.followup.replanned")
+
+CHAT_THREAD_PREFIX = "chat:"
+CLASSIFY_NODES = ["classify_intent", "route_metric", "extract_status"]
+
+# 턴 사이에 넘기는 해석 슬롯 (QuestionAnalysis의 부분집합 + name/shape)
+_SLOTS = (
+    "name", "shape", "metric_col", "direction", "want_when", "resolved_date", "resolved_from", "resolved_to",
+    "time_op", "time_hhmmss", "zone", "watch",
+)
+
+_CUE_RE = re.compile(r"^\s*(그럼|그러면|그렇다면|그때|그날|그리고|또|and\b|then\b|what about|how about)", re.I)
+# "어제는?", "안전구역에서도?" 같은 짧은 생략형
+_ELLIPTIC_RE = re.compile(r"(은|는|엔|에는|도|요)\s*[?？]?\s*$")
+_MAX_ELLIPTIC_LEN = 20
+# 슬롯을 바꾸는 말(날짜/주간/시각, 상태, 질문 모양). 이것과 조사/어미를 빼고 남는 말이 있으면 후속 질문이 아니다
+# ("오늘 날씨는요?"는 "오늘"이 날짜 슬롯이어도 "날씨"가 남는다)
+_SLOT_WORD_RE = re.compile(
+    r"(오늘|어제|내일|\d+\s*일\s*[전후]|\d+\s*월|\d+\s*일|\d+\s*시|\d+\s*분|(?:이번|지난|다음)\s*주|오전|오후|저녁|밤|새벽"
+    r"|이후|이전|부터|까지|안전\s*구역|안전|낯선|낯설|초행|곳|장소|워치|watch|시계|블루투스|연결|끊김|끊긴|끊겼|해제"
+    r"|최고|최저|최대|최소|가장|높|낮|평균|횟수|몇\s*번|몇\s*회|언제|시각|시간|때|값|수치|기록|데이터)",
+    re.I,
+)
+_PARTICLES_RE = re.compile(r"^(?:은|는|이|가|을|를|에|에서|엔|도|요|의|로|으로|만|과|와|던|았|었|였|어|아|나|죠|야|인|한|했)+$")
+
+
+def conversation_thread_id(chat_thread_id: str) -> str:
+    return f"{CHAT_THREAD_PREFIX}{chat_thread_id}"
+
+
+def turn_inputs(message: str) -> Dict[str, Any]:
+    """
+    한 턴의 그래프 입력. 대화 스레드에서는 지난 턴 상태가 이어지므로 메시지와 턴 단위 필드를 비우고 시작한다
+    (context만 다음 턴으로 넘어감).
+    """
+    return {
+        "messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), HumanMessage(content=message)],
+        "intent": "db_query",
+        "name": "",
+        "shape": "",
+        "planned": False,
+        "followup": False,
+    }
+
+
+def _changed_slots(question: str) -> Dict[str, Any]:
+    """질문에 명시된 슬롯만 돌려준다 (언급 없는 슬롯은 키가 없음)."""
+    out: Dict[str, Any] = {}
+    date = extract_date_yyyy_mm_dd(question)
+    week = resolve_week_window_kst(question)
+    if date:
+        out.update(resolved_date=date, resolved_from="", resolved_to="")
+    elif week:
+        ts_from, ts_to = to_yyyy_mm_dd_hh_mm_ss_strings(week)
+        out.update(resolved_date="", resolved_from=ts_from, resolved_to=ts_to)
+    tf = extract_time_filter(question)
+    if tf:
+        out.update(time_op=tf[0], time_hhmmss=tf[1])
+    status = detect_zone_and_watch_filters(question)
+    for key in ("zone", "watch"):
+        if status[key] is not None:
+            out[key] = status[key]
+    direction = detect_extreme_direction(question)
+    shape = _shape(question, direction)
+    if shape:
+        out.update(shape=shape, direction=direction)
+    words = [m for m, pat in _METRIC_WORDS.items() if pat.search(question)]
+    if len(words) == 1:
+        out["metric_col"] = words[0]
+    if asks_when(question):
+        out["want_when"] = True
+    return out
+
+
+def _has_other_content(question: str) -> bool:
+    """신호어, 슬롯 말, 조사/어미를 빼고도 남는 말이 있는지."""
+    rest = _SLOT_WORD_RE.sub(" ", _CUE_RE.sub(" ", question))
+    for pat in _METRIC_WORDS.values():
+        rest = pat.sub(" ", rest)
+    words = re.findall(r"\w+", rest)
+    return any(not _PARTICLES_RE.match(w) for w in words)
+
+
+def detect_followup(state) -> Optional[Dict[str, Any]]:
+    """지난 context의 슬롯만 바꾸는 후속 질문이면 바뀐 슬롯, 아니면 None."""
+    ctx = state.get("context") or {}
+    question = _extract_latest_question(state).strip()
+    if not ctx.get("name") or not question:
+        return None
+    if not (_CUE_RE.search(question) or (len(question) <= _MAX_ELLIPTIC_LEN and _ELLIPTIC_RE.search(question))):
+        return None
+    if _has_other_content(question):
+        return None  # "오늘 날씨는요?"처럼 슬롯 밖의 내용이 있으면 분류부터 다시 한다
+    try:
+        if _names_in(question):
+            return None  # 다른(또는 같은) 대상자를 다시 말하면 새 질문으로 처리
+    except Exception:
+        return None
+    return _changed_slots(question) or None
+
+
+def route_entry(state) -> List[str]:
+    return ["replan_followup"] if detect_followup(state) else CLASSIFY_NODES
+
+
+def replan_followup_node(state) -> Dict[str, Any]:
+    ctx = state["context"]
+    question = _extract_latest_question(state)
+    slots = {k: ctx.get(k) for k in _SLOTS}
+    slots.update(detect_followup(state) or {})
+    _replanned.inc()
+    return {
+        **slots,
+        # query_gen/narrate가 보는 질문은 지난 질문 + 후속 질문
+        "question": f"{ctx.get('question', '')} (후속 질문: {question})",
+        "intent": "db_query",
+        "followup": True,
+        "last_sql": "",
+        "repair_attempts": 0,
+        "repair_failed": False,
+    }
+
+
+def _executed_sql(state) -> str:
+    for m in reversed(state["messages"]):
+        for tc in getattr(m, "tool_calls", None) or []:
+            if tc.get("name") == "db_query_tool":
+                return tc["args"].get("query", "")
+    return ""
+
+
+def remember_context(state, config: RunnableConfig) -> Dict[str, Any]:
+    """답을 낸 턴의 해석 결과를 context로 남긴다 (대화 스레드에서만)."""
+    thread_id = str((config.get("configurable") or {}).get("thread_id", ""))
+    question = state.get("question") or ""
+    if not thread_id.startswith(CHAT_THREAD_PREFIX) or not question:
+        return {}
+    ctx = {k: state.get(k) for k in _SLOTS}
+    if not ctx["name"]:
+        try:
+            names = _names_in(question)
+        except Exception:
+            names = []
+        ctx["name"] = names[0] if len(names) == 1 else ""
+    if not ctx["shape"] and state.get("planned"):
+        # 플래너가 처리한 질문만 모양을 넘긴다 (아니면 후속 질문도 LLM 경로로)
+        ctx["shape"] = _shape(question, state.get("direction")) or ""
+    if state.get("followup"):
+        question = (state.get("context") or {}).get("question") or question  # 후속 질문이 겹겹이 붙지 않도록 원 질문 유지
+    ctx.update(question=question, sql=_executed_sql(state))
+    return {"context": ctx}
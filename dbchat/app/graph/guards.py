@@ -1,4 +1,4 @@
-import re, ast
+import re
 from typing import Tuple
 
 SQL_HEAD   = re.compile(r"(?is)^\s*(select|with|pragma|explain)\b")
@@ -60,12 +60,15 @@ def extract_sql(text: str) -> str:
     return sql
 
 
-def parse_tool_result(text: str):
-    text = str(text).strip()
+def parse_tool_result(message):
+    """
+    db_query_tool의 ToolMessage → (ok, rows | 텍스트).
+    행은 artifact(app.core.tools.QueryResult)에서 그대로 꺼낸다. 오류 문자열은 (False, 오류).
+    """
+    text = str(getattr(message, "content", message) or "").strip()
     if text.lower().startswith("error:"):
         return False, text
-    try:
-        rows = ast.literal_eval(text)
-        return True, rows
-    except Exception:
-        return True, text 
\ No newline at end of file
+    artifact = getattr(message, "artifact", None)
+    if isinstance(artifact, dict) and "rows" in artifact:
+        return True, artifact["rows"]
+    return True, text
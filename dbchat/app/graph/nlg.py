@@ -1,7 +1,7 @@
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from app.core.llm import get_chat_llm
+from app.core.llm import get_streaming_chat_llm, register_static_prefix
 from app.graph.guards import parse_tool_result  
 import re as _re
 
@@ -27,6 +27,7 @@ PROMPT = ChatPromptTemplate.from_messages([
      "숫자값_존재: {has_val}\n\n"
      "위 정보를 바탕으로 Final: 로 시작하는 두세 문장을 작성하세요.")
 ])
+register_static_prefix(SYSTEM)
 
 TS_RE = _re.compile(r"^\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}$")
 
@@ -47,7 +48,7 @@ def _last_answer_line(state) -> str | None:
 def _last_tool_rows(state):
     for m in reversed(state["messages"]):
         if hasattr(m, "name") and m.name == "db_query_tool":
-            ok, payload = parse_tool_result(m.content or "")
+            ok, payload = parse_tool_result(m)  # artifact의 행을 그대로
             if ok:
                 return payload
     return None
@@ -78,7 +79,7 @@ def _scan_has_ts_val(rows):
     return has_ts, has_val
 
 def narrate_answer(state):
-    question = _last_user_question(state)
+    question = state.get("question") or _last_user_question(state)  # 후속 질문이면 지난 질문과 합친 문장
     answer = _last_answer_line(state)
     if not answer:
         return {"messages": [AIMessage(content="Final: 조건에 맞는 결과가 없습니다.")]}
@@ -87,8 +88,9 @@ def narrate_answer(state):
     rows_summary = _summarize_rows(rows) if rows is not None else "(없음)"
     has_ts, has_val = _scan_has_ts_val(rows) if rows is not None else (False, False)
 
-    llm = get_chat_llm()
-    text = (PROMPT | llm | StrOutputParser()).invoke({
+    # messages 스트림 모드로 실행되면 토큰이 생성되는 대로 /dbchat/api/ask_stream 으로 흘러간다
+    llm = get_streaming_chat_llm()
+    text = (PROMPT | llm.bind(profile="narrate") | StrOutputParser()).invoke({
         "question": question,
         "answer": answer,
         "rows_summary": rows_summary,
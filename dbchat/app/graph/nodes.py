@@ -3,18 +3,22 @@ import uuid, re
 from typing import Any, Dict, List
 from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
-from langchain_core.runnables import RunnableLambda, RunnableWithFallbacks
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableConfig, RunnableLambda, RunnableWithFallbacks
 from langgraph.prebuilt import ToolNode
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
-from app.core.llm import get_chat_llm
+from app.core.llm import get_chat_llm, get_json_llm, register_static_prefix
 from app.core.tools import db_query_tool
 from app.core.database import get_db
 from app.graph.schema_facts import JOIN_RULE
-from app.graph.guards import SQL_HEAD, ANSWER_SQL, validate_sql_against_schema, extract_sql, parse_tool_result
+from app.graph.guards import (
+    SQL_HEAD, ANSWER_SQL, ALLOWED_SCHEMA, validate_sql_against_schema, extract_sql, parse_tool_result,
+)
 from app.graph.routing import choose_metric
 from app.utils.dates import extract_date_yyyy_mm_dd, resolve_week_window_kst, to_yyyy_mm_dd_hh_mm_ss_strings, extract_time_filter
-from app.utils.intent import detect_extreme_direction, asks_when
+from app.utils.intent import (
+    detect_extreme_direction, asks_when, detect_zone_and_watch_filters, classify_intent_llm, resolve_status_filters,
+)
 from app.utils.formatting import is_ts, is_num, fmt_num, fmt_any, to_min_ts
 from app.utils.sql_fixes import (
     normalize_time_literal_filters,
@@ -29,15 +33,24 @@ from app.utils.sql_fixes import (
 )
 
 
+_sql_tools = None
+
 def get_sql_tools():
-    """SQLDatabaseToolkit에서 list/schema 툴 핸들을 가져온다."""
-    db = get_db()
-    llm = get_chat_llm()
-    toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-    tools = toolkit.get_tools()
-    list_tables_tool = next(t for t in tools if t.name == "sql_db_list_tables")
-    get_schema_tool  = next(t for t in tools if t.name == "sql_db_schema")
-    return list_tables_tool, get_schema_tool
+    """SQLDatabaseToolkit에서 list/schema 툴 핸들을 가져온다 (툴킷은 한 번만 만든다)."""
+    global _sql_tools
+    if _sql_tools is None:
+        toolkit = SQLDatabaseToolkit(db=get_db(), llm=get_chat_llm())
+        tools = toolkit.get_tools()
+        list_tables_tool = next(t for t in tools if t.name == "sql_db_list_tables")
+        get_schema_tool  = next(t for t in tools if t.name == "sql_db_schema")
+        _sql_tools = (list_tables_tool, get_schema_tool)
+    return _sql_tools
+
+def route_schema(state) -> str:
+    """스키마 스냅샷이 유효하면 list_tables/model_get_schema/get_schema 툴 왕복을 건너뛴다."""
+    from app.core.schema_snapshot import snapshot_is_valid
+    required = {t: spec["columns"] for t, spec in ALLOWED_SCHEMA.items()}
+    return "inject_schema" if snapshot_is_valid(required) else "first_tool_call"
 
 def handle_tool_error(state) -> dict:
     """ToolNode fallback: 툴 실행 오류를 LLM에게 피드백."""
@@ -76,6 +89,78 @@ def robust_json_parse(text: str) -> Dict[str, Any]:
 # Nodes
 # ---------------------------------------------------------------------
 
+# ---- 질문 이해 fan-out: 서로 독립인 LLM 분류 호출들을 START에서 병렬로 돌리고 analyze_question에서 합친다 ----
+# (동시에 들어온 세 호출은 엔진 BatchScheduler가 generate 한 번으로 묶는다)
+def classify_intent(state, config: RunnableConfig) -> Dict[str, Any]:
+    # speculative_intent 모드면 호출자(entrypoint)가 그래프 밖에서 따로 분류한다
+    if (config.get("configurable") or {}).get("speculative_intent"):
+        return {}
+    return {"intent": classify_intent_llm(_extract_latest_question(state))}
+
+def route_metric(state) -> Dict[str, Any]:
+    return {"metric_col": choose_metric(_extract_latest_question(state))}
+
+def extract_status(state) -> Dict[str, Any]:
+    status = resolve_status_filters(_extract_latest_question(state))
+    return {"zone": status["zone"], "watch": status["watch"]}
+
+def route_after_analysis(state) -> str:
+    """DB 조회 질문이 아니면 여기서 끝낸다 (안내 문구는 views가 intent를 보고 붙인다)."""
+    return "plan_sql" if state.get("intent", "db_query") == "db_query" else "__end__"
+
+def analyze_question(state) -> Dict[str, Any]:
+    """
+    질문 해석(메트릭 LLM 라우팅, 최대/최소, 시각 의도, 날짜/주간/시각 필터, 상태 필터)을
+    요청당 한 번만 수행해 State 필드로 싣는다. query_gen/correct_query와 재시도 루프는 읽기만 한다.
+    fan-out 노드가 이미 채운 metric_col/zone/watch는 그대로 쓰고, 없을 때만 여기서 계산한다.
+    """
+    question = _extract_latest_question(state)
+
+    # (A) 하루 날짜
+    resolved_date = extract_date_yyyy_mm_dd(question)
+
+    # (B) 이번주/지난주 등 주간 창
+    resolved_from = resolved_to = ""
+    week_win = resolve_week_window_kst(question)
+    if week_win:
+        resolved_from, resolved_to = to_yyyy_mm_dd_hh_mm_ss_strings(week_win)
+
+    # (C) "밤 9시 이후" 같은 시각 필터
+    time_op = time_hhmmss = ""
+    tf = extract_time_filter(question)
+    if tf:
+        time_op, time_hhmmss = tf  # ('>=', '21:00:00') 등
+
+    # (D) zone/watch 상태 필터 (extract_status 결과, 없으면 정규식)
+    if "zone" in state or "watch" in state:
+        status = {"zone": state.get("zone"), "watch": state.get("watch")}
+    else:
+        status = detect_zone_and_watch_filters(question)
+
+    return {
+        "question": question,
+        "metric_col": state.get("metric_col") or choose_metric(question),
+        "direction": detect_extreme_direction(question),
+        "want_when": asks_when(question),
+        "resolved_date": resolved_date or "",
+        "resolved_from": resolved_from,
+        "resolved_to": resolved_to,
+        "time_op": time_op,
+        "time_hhmmss": time_hhmmss,
+        "zone": status["zone"],
+        "watch": status["watch"],
+        # 요청마다 SQL 수리 루프 상태 초기화 (app.graph.repair)
+        "last_sql": "",
+        "repair_attempts": 0,
+        "repair_failed": False,
+    }
+
+def _analysis(state) -> Dict[str, Any]:
+    """State의 해석 필드 (그래프 밖에서 노드를 단독 호출한 경우엔 여기서 계산)."""
+    if state.get("metric_col"):
+        return state
+    return {**state, **analyze_question(state)}
+
 def first_tool_call(state) -> dict[str, List[AIMessage]]:
     return {
         "messages": [AIMessage(content="", tool_calls=[{
@@ -83,20 +168,18 @@ def first_tool_call(state) -> dict[str, List[AIMessage]]:
         }])]
     }
 
+SCHEMA_SELECT_SYSTEM = "You are an expert at choosing relevant tables. Given a user question and a list of available tables, decide which tables are relevant. Exclude internal SQLite tables like 'sqlite_sequence'. Return only a comma-separated list of table names with NO extra words."
+
 schema_prompt = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are an expert at choosing relevant tables. Given a user question and a list of available tables, decide which tables are relevant. Exclude internal SQLite tables like 'sqlite_sequence'. Return only a comma-separated list of table names with NO extra words."),
+    ("system", SCHEMA_SELECT_SYSTEM),
     ("human", "Question: {question}\nAvailable tables: {tables}")
 ])
+register_static_prefix(SCHEMA_SELECT_SYSTEM)
 
 def model_get_schema(state):
     llm = get_chat_llm()
-    # latest question
-    question = ""
-    for msg in reversed(state["messages"]):
-        if isinstance(msg, HumanMessage):
-            question = msg.content
-            break
+    # latest question (analyze_question이 State에 실어 둠)
+    question = state.get("question") or _extract_latest_question(state)
     # list_tables_tool result
     tables_raw = state["messages"][-1].content
     tables = [t.strip() for t in tables_raw.split(",") if t.strip()]
@@ -106,7 +189,7 @@ def model_get_schema(state):
     if need_event and ("event" in tables and "users" in tables):
         selected_str = "event, users"
     else:
-        selected = (schema_prompt | llm | StrOutputParser()).invoke({"question": question, "tables": ", ".join(tables)})
+        selected = (schema_prompt | llm.bind(profile="table_select") | StrOutputParser()).invoke({"question": question, "tables": ", ".join(tables)})
         raw_list = [t.strip() for t in selected.split(",") if t.strip()]
         dedup = []
         for t in raw_list:
@@ -137,46 +220,54 @@ YOU MUST follow these constraints strictly:
 - To filter by a user name, JOIN users u ON u.id = e.protectee_id and filter u.name = '<name>'.
 - e.timestamp is a TEXT datetime ('YYYY-MM-DD HH:MM:SS').
 
+<metric_col> below means the TARGET METRIC column given in the user message.
+
 Decide the SQL SHAPE from the user's wording (YOU choose the right form):
-- "평균/average" → use AVG(e.{metric_col})
-- "가장 높/최대/최고" → ORDER BY e.{metric_col} DESC, then e.timestamp DESC, LIMIT 1
-- "가장 낮/최소" → ORDER BY e.{metric_col} ASC, then e.timestamp DESC, LIMIT 1
+- "평균/average" → use AVG(e.<metric_col>)
+- "가장 높/최대/최고" → ORDER BY e.<metric_col> DESC, then e.timestamp DESC, LIMIT 1
+- "가장 낮/최소" → ORDER BY e.<metric_col> ASC, then e.timestamp DESC, LIMIT 1
 - "개수/횟수" → COUNT(*)
 - "최근/가장 최근/마지막 시각" → ORDER BY e.timestamp DESC, LIMIT 1
 - If the user asks explicitly for the time/when ("시간/시각/언제"), include e.timestamp in the SELECT; otherwise only select what is necessary for the answer.
-- If the query ranks by the TARGET METRIC (e.g., highest/lowest) AND the user asks "when/언제/날짜/시각", SELECT **both** e.timestamp AND e.{metric_col}.
+- If the query ranks by the TARGET METRIC (e.g., highest/lowest) AND the user asks "when/언제/날짜/시각", SELECT **both** e.timestamp AND e.<metric_col>.
 - NEVER select non-aggregated columns together with aggregates unless you also provide a proper GROUP BY. Prefer removing non-aggregated columns when not needed.
 
-If a resolved week/day time window is provided, you MUST add BOTH filters:
-- AND e.timestamp >= '{resolved_from}' (if provided and not empty)
-- AND e.timestamp <  '{resolved_to}'   (if provided and not empty)
+If a resolved week/day time window is provided in the user message, you MUST add BOTH filters:
+- AND e.timestamp >= '<from>' (if provided and not empty)
+- AND e.timestamp <  '<to>'   (if provided and not empty)
 
 If a resolved time-of-day filter is provided, compare using strftime:
-- AND strftime('%H:%M:%S', e.timestamp) {time_op} '{time_hhmmss}'
+- AND strftime('%H:%M:%S', e.timestamp) <op> '<HH:MM:SS>'
+
+If resolved status filters are provided (not empty), add them:
+- zone → AND e.zone_type = '<zone>'
+- watch → AND e.is_watch_connected = <watch>
 
 - Exclude NULL or blank timestamps: add "AND e.timestamp IS NOT NULL AND e.timestamp <> ''".
 - Prefer returning a single, valid SQLite SELECT (no backticks, no commentary). No DDL/DML statements.
+
+SCHEMA (STRICT):
+- tables: users, event
+- join: """ + JOIN_RULE + """
+- users columns: id INTEGER PRIMARY KEY, name TEXT NOT NULL
+- event columns: id INTEGER PRIMARY KEY, protectee_id INTEGER NOT NULL, timestamp TEXT NOT NULL, ppg_json TEXT, ppg_threat_detected INTEGER, hrv INTEGER, stress INTEGER, imu_danger_level INTEGER, latitude REAL, longitude REAL, zone_type TEXT, is_watch_connected INTEGER
 """
 
+# system 메시지는 요청마다 동일(정적) → 접두부 KV 캐시 대상. 질문별 값은 human 메시지로만 넘긴다.
 query_gen_prompt = ChatPromptTemplate.from_messages([
     ("system", QUERY_GEN_INSTRUCTION),
     (
         "human",
         "User question:\n{question}\n\n"
-        "SCHEMA (STRICT):\n"
-        "- tables: users, event\n"
-        f"- join: {JOIN_RULE}\n"
-        "- users columns: id INTEGER PRIMARY KEY, name TEXT NOT NULL\n"
-        "- event columns: id INTEGER PRIMARY KEY, protectee_id INTEGER NOT NULL, "
-        "timestamp TEXT NOT NULL, ppg_json TEXT, ppg_threat_detected INTEGER, "
-        "hrv INTEGER, stress INTEGER, imu_danger_level INTEGER, latitude REAL, "
-        "longitude REAL, zone_type TEXT, is_watch_connected INTEGER\n\n"
+        "Target metric column: e.{metric_col}\n"
         "Resolved date (if any): {resolved_date_yyyy_mm_dd}\n"
         "Resolved time window (if any): from {resolved_from} to {resolved_to}\n"
         "Resolved time-of-day filter (if any): op={time_op}, value={time_hhmmss}\n"
+        "Resolved status filters (if any): zone={zone}, watch={watch}\n"
         "Return ONLY one valid SQLite SELECT (no commentary)."
     ),
 ])
+register_static_prefix(QUERY_GEN_INSTRUCTION)
 
 def _extract_latest_question(state):
     q = ""
@@ -188,38 +279,22 @@ def _extract_latest_question(state):
 
 def query_gen_node(state):
     llm = get_chat_llm()
-    question = _extract_latest_question(state)
-    metric_col = choose_metric(question)
-
-    # (A) 하루 날짜
-    resolved_date = extract_date_yyyy_mm_dd(question)
-
-    # (B) 이번주/지난주 등 주간 창
-    resolved_from = resolved_to = ""
-    week_win = resolve_week_window_kst(question)
-    if week_win:
-        a, b = to_yyyy_mm_dd_hh_mm_ss_strings(week_win)
-        resolved_from, resolved_to = a, b
-
-    # (C) "밤 9시 이후" 같은 시각 필터
-    time_op = time_hhmmss = ""
-    tf = extract_time_filter(question)
-    if tf:
-        time_op, time_hhmmss = tf  # ('>=', '21:00:00') 등
+    a = _analysis(state)
 
     prompt = query_gen_prompt.partial(
-        question=question,
-        metric_col=metric_col,
-        resolved_date_yyyy_mm_dd=(resolved_date or ""),
-        resolved_from=resolved_from,
-        resolved_to=resolved_to,
-        time_op=time_op,
-        time_hhmmss=time_hhmmss,
+        question=a["question"],
+        metric_col=a["metric_col"],
+        resolved_date_yyyy_mm_dd=a["resolved_date"],
+        resolved_from=a["resolved_from"],
+        resolved_to=a["resolved_to"],
+        time_op=a["time_op"],
+        time_hhmmss=a["time_hhmmss"],
+        zone=a["zone"] or "",
+        watch="" if a["watch"] is None else a["watch"],
     )
 
-    raw = (prompt | llm.bind(
-        stop=["\n\n", "/*", "SCHEMA (STRICT):", "CREATE TABLE", "System:", "Human:", "AI:", "Tool:", "```"]
-    ) | StrOutputParser()).invoke({})
+    # stop 문자열/토큰 예산은 llm_server.profiles 의 sql_gen 프로필
+    raw = (prompt | llm.bind(profile="sql_gen") | StrOutputParser()).invoke({})
     text = extract_sql(raw)
     if not text:
         return {"messages": [AIMessage(content="Error: No valid SQL to check")]}
@@ -249,17 +324,17 @@ query_check_prompt = ChatPromptTemplate.from_messages([
     ("system", query_check_system_json),
     ("human", "SQL to check:\n{sql}"),
 ])
+register_static_prefix(query_check_system_json.format())
 
-json_parser = JsonOutputParser()
-from langchain_core.output_parsers import StrOutputParser as _StrOut
+_SQL_SCHEMA = {"type": "object", "properties": {"sql": {"type": "string", "maxLength": 2000}}}
 
 def model_check_query(state):
-    llm = get_chat_llm()
+    llm = get_json_llm(_SQL_SCHEMA, profile="sql_check")
     candidate_raw = (state["messages"][-1].content or "").strip()
     candidate_sql = extract_sql(candidate_raw)
 
     if not candidate_sql or not SQL_HEAD.search(candidate_sql):
-        return {"messages": [AIMessage(content="Error: No valid SQL to check")]}
+        return {"last_sql": "", "messages": [AIMessage(content="Error: No valid SQL to check")]}
 
     ok, why = validate_sql_against_schema(candidate_sql)
     if not ok:
@@ -267,31 +342,33 @@ def model_check_query(state):
             "Use only tables/columns from users(id, name); event(id, protectee_id, timestamp, ppg_json, ppg_threat_detected, hrv, stress, imu_danger_level, latitude, longitude, zone_type, is_watch_connected). "
             f"Join rule: {JOIN_RULE}. Use aliases e (event) and u (users)."
         )
-        return {"messages": [AIMessage(content=f"Error: {why}. {hint}")]}
+        return {"last_sql": candidate_sql, "messages": [AIMessage(content=f"Error: {why}. {hint}")]}
 
-    question = _extract_latest_question(state)
-    must_col = choose_metric(question)
-    direction = detect_extreme_direction(question)
-    want_when = asks_when(question)
+    a = _analysis(state)
+    must_col = a["metric_col"]
+    direction = a["direction"]
+    want_when = a["want_when"]
 
     import re as _re
     if not _re.search(rf"\b(?:e\.)?{must_col}\b", candidate_sql, _re.I):
-        return {"messages": [AIMessage(content=f"Error: Wrong metric. Use e.{must_col} for this question.")]}  # enforce metric
+        return {"last_sql": candidate_sql, "messages": [AIMessage(content=f"Error: Wrong metric. Use e.{must_col} for this question.")]}  # enforce metric
 
     # LLM self-check (returns {"sql": "..."} as JSON)
-    primary_check  = query_check_prompt | llm | json_parser
-    fallback_check = query_check_prompt | llm | (_StrOut() | RunnableLambda(robust_json_parse))
-    query_check_return_sql = primary_check.with_fallbacks([fallback_check])
-
-    checked = query_check_return_sql.invoke({"sql": candidate_sql})
+    # 제약 디코딩이면 항상 파싱된다. 아니어도 LLM을 다시 부르지 않고 후보 SQL을 그대로 쓴다.
+    try:
+        checked = (query_check_prompt | llm | StrOutputParser() | RunnableLambda(robust_json_parse)).invoke(
+            {"sql": candidate_sql}
+        )
+    except Exception:
+        checked = {}
     final_sql = (checked.get("sql") or "").strip()
     if not final_sql or "<final_sql_to_execute>" in final_sql or not SQL_HEAD.search(final_sql):
         final_sql = candidate_sql
 
     # 시간/날짜 의도 확인
-    has_date = bool(extract_date_yyyy_mm_dd(question))
-    has_week = bool(resolve_week_window_kst(question))
-    has_time = bool(extract_time_filter(question))
+    has_date = bool(a["resolved_date"])
+    has_week = bool(a["resolved_from"] or a["resolved_to"])
+    has_time = bool(a["time_op"])
     has_any_time_window = has_date or has_week or has_time
 
     # ✅ 최소 보정: 의미 왜곡 없이 오류만 예방 + 일관 출력 보장
@@ -308,9 +385,10 @@ def model_check_query(state):
 
     import re as _re2
     if _re2.search(r"(?i)\b(DROP|ALTER|TRUNCATE|ATTACH|DETACH)\b", final_sql):
-        return {"messages": [AIMessage(content=f"Error: Refusing to run potentially dangerous SQL: {final_sql}")]}
+        return {"last_sql": "", "messages": [AIMessage(content=f"Error: Refusing to run potentially dangerous SQL: {final_sql}")]}
 
     return {
+        "last_sql": final_sql,  # 실행 오류가 나면 repair_sql이 이 SQL을 고친다
         "messages": [
             AIMessage(
                 content="",
@@ -327,15 +405,15 @@ def model_check_query(state):
 
 def format_answer(state):
     # ---- Tool 결과 찾기 ----
-    tool_msg_content = None
+    tool_msg = None
     for m in reversed(state["messages"]):
         if hasattr(m, "name") and m.name == getattr(db_query_tool, "name", "db_query_tool"):
-            tool_msg_content = m.content
+            tool_msg = m
             break
-    if tool_msg_content is None:
+    if tool_msg is None:
         return {"messages": [AIMessage(content="Error: No tool result found")]}
 
-    ok, payload = parse_tool_result(tool_msg_content)
+    ok, payload = parse_tool_result(tool_msg)
     if not ok:
         return {"messages": [AIMessage(content=payload)]}
 
@@ -349,13 +427,8 @@ def format_answer(state):
 
     only = rows[0]
 
-    # 질문 의도(최대/최소) 파악
-    question = ""
-    for m in reversed(state["messages"]):
-        if isinstance(m, HumanMessage):
-            question = m.content or ""
-            break
-    direction = detect_extreme_direction(question)  # "max" | "min" | None
+    # 질문 의도(최대/최소): analyze_question 결과 재사용
+    direction = state.get("direction") if "direction" in state else detect_extreme_direction(_extract_latest_question(state))
 
     MAX_SHOW = 10
 
@@ -456,7 +529,7 @@ def format_answer(state):
 def after_answer(state):
     text = (state["messages"][-1].content or "").strip()
     if text.startswith("Error:"):
-        return "query_gen"
+        return "repair_sql"
     if text.startswith("Answer:"):
         return "narrate_answer"
     from langgraph.graph import END
@@ -473,7 +546,7 @@ def should_continue(state):
         from langgraph.graph import END
         return END
     if text.startswith("Error:"):
-        return "query_gen"
+        return "repair_sql"
     return "correct_query"
 
 
@@ -482,4 +555,4 @@ def route_after_check(state):
     from langchain_core.messages import AIMessage
     if isinstance(last, AIMessage) and getattr(last, "tool_calls", None):
         return "execute_query"
-    return "query_gen"
\ No newline at end of file
+    return "repair_sql"
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""
+슬롯 기반 SQL 플래너 (LLM 없는 fast path).
+
+"<이름>의 <메트릭> 최고/최저/평균/횟수 (+ 날짜/주/시각/구역/워치 조건)" 형태는 analyze_question이
+채운 State 필드만으로 파라미터 바인딩 SQL을 만들 수 있다. 확신할 때만 db_query_tool을 바로 호출하고,
+아니면 기존 query_gen → correct_query LLM 경로로 넘긴다.
+"""
+from __future__ import annotations
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.messages import AIMessage
+from app.config import settings
+from app.core.database import get_engine
+from app.core.tools import db_query_tool
+from app.graph.nodes import route_schema
+from llm_web import metrics
+
+_hits = metrics.counter("dbchat.planner.fast_path")
+_misses = metrics.counter("dbchat.planner.llm_path")
+_hit_ratio = metrics.gauge("dbchat.planner.hit_ratio")
+
+_AVG_RE = re.compile(r"(평균|average|avg)", re.I)
+_COUNT_RE = re.compile(r"(횟수|몇\s*번|몇\s*회|개수|건수|count)", re.I)
+# 임계값 비교, 사람/그룹 비교, 목록형 질문은 플래너가 다루지 않는다
+_UNSUPPORTED_RE = re.compile(
+    r"(\d+\s*(?:점\s*)?(?:이상|이하|초과|미만|넘)|비교|보다|누가|랭킹|순위|각각|별로|모두|전체|목록|리스트|추이|변화)",
+    re.I,
+)
+
+# 질문에 메트릭이 명시된 경우에만 확신 (choose_metric 결과와 일치해야 함)
+_METRIC_WORDS = {
+    "stress": re.compile(r"(스트레스|stress)", re.I),
+    "hrv": re.compile(r"(hrv|심박\s*변이)", re.I),
+    "ppg_threat_detected": re.compile(r"(ppg|위협|생체\s*신호)", re.I),
+    "imu_danger_level": re.compile(r"(imu|움직임|흔들림|넘어짐|낙상|자세|균형)", re.I),
+}
+
+# 횟수 모양은 "기록/데이터 몇 번"처럼 이벤트 종류가 없는 질문만 (COUNT(*)는 조건 없는 행 수다)
+# "위협 감지 횟수", "낙상 횟수"는 메트릭별 판정 기준이 필요하므로 LLM 경로로 보낸다
+_EVENT_RE = re.compile(r"(감지|탐지|이벤트|경고|알림|위험|충격|급등|이상\s*징후)", re.I)
+
+_TIME_OPS = {">=", ">", "<=", "<"}
+
+
+# users.name 캐시 (plan/detect_followup/remember_context가 턴마다 부르므로 매번 users를 읽지 않는다)
+_names_lock = threading.Lock()
+_names: Optional[List[str]] = None
+_names_at = 0.0
+
+
+def _known_names(max_age_s: Optional[float] = None) -> List[str]:
+    """users.name 목록. max_age_s(기본 settings.known_names_ttl_s)보다 오래됐으면 다시 읽는다."""
+    global _names, _names_at
+    max_age = settings.known_names_ttl_s if max_age_s is None else max_age_s
+    if _names is not None and time.monotonic() - _names_at < max_age:
+        return _names
+    with _names_lock:
+        if _names is None or time.monotonic() - _names_at >= max_age:
+            with get_engine().connect() as conn:
+                _names = [r[0] for r in conn.exec_driver_sql("SELECT name FROM users").fetchall() if r[0]]
+            _names_at = time.monotonic()
+        return _names
+
+
+def _names_in(question: str) -> List[str]:
+    """
+    질문에 나온 대상자 이름. 캐시에 하나도 없으면 새로 등록된 대상자일 수 있어 다시 읽는다
+    (이름 없는 후속 질문마다 읽지 않도록 known_names_refresh_s에 한 번까지).
+    """
+    names = [n for n in _known_names() if n in question]
+    if not names:
+        names = [n for n in _known_names(settings.known_names_refresh_s) if n in question]
+    return names
+
+
+def _shape(question: str, direction: Optional[str]) -> Optional[str]:
+    shapes = [s for s, hit in (
+        ("extreme", direction is not None),
+        ("avg", bool(_AVG_RE.search(question))),
+        ("count", bool(_COUNT_RE.search(question))),
+    ) if hit]
+    return shapes[0] if len(shapes) == 1 else None
+
+
+def plan_sql(state: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """확신할 수 있으면 (SQL, 바인딩 파라미터), 아니면 None."""
+    question = state.get("question") or ""
+    metric = state.get("metric_col")
+    # 후속 질문은 지난 턴에 플래너가 확인한 대상자/모양을 context에서 받아 온다 (app.graph.followup)
+    followup = bool(state.get("followup"))
+    if not question or not metric or (not followup and _UNSUPPORTED_RE.search(question)):
+        return None
+
+    shape = (state.get("shape") or None) if followup else _shape(question, state.get("direction"))
+    if shape is None or (shape == "extreme" and state.get("direction") not in ("max", "min")):
+        return None
+    words = [m for m, pat in _METRIC_WORDS.items() if pat.search(question)]
+    if shape == "count":
+        # 후속 질문도 확인한다 (question에 지난 질문 + 후속 질문이 함께 들어 있음)
+        if words or _EVENT_RE.search(question):
+            return None
+    elif not followup and words != [metric]:
+        return None
+
+    names = [state["name"]] if followup and state.get("name") else _names_in(question)
+    if len(names) != 1:
+        return None
+
+    resolved_date = state.get("resolved_date") or ""
+    week = (state.get("resolved_from") or "", state.get("resolved_to") or "")
+    if resolved_date and any(week):
+        return None
+
+    where = ["e.timestamp IS NOT NULL", "e.timestamp <> ''", "u.name = :name"]
+    params: Dict[str, Any] = {"name": names[0]}
+    if shape != "count":
+        where.append(f"e.{metric} IS NOT NULL")
+    if resolved_date:
+        day = datetime.strptime(resolved_date, "%Y-%m-%d")
+        where += ["e.timestamp >= :ts_from", "e.timestamp < :ts_to"]
+        params.update(ts_from=f"{resolved_date} 00:00:00", ts_to=(day + timedelta(days=1)).strftime("%Y-%m-%d 00:00:00"))
+    elif all(week):
+        where += ["e.timestamp >= :ts_from", "e.timestamp < :ts_to"]
+        params.update(ts_from=week[0], ts_to=week[1])
+    op = state.get("time_op") or ""
+    if op:
+        if op not in _TIME_OPS:
+            return None
+        where.append(f"strftime('%H:%M:%S', e.timestamp) {op} :tod")
+        params["tod"] = state.get("time_hhmmss")
+    if state.get("zone"):
+        where.append("e.zone_type = :zone")
+        params["zone"] = state["zone"]
+    if state.get("watch") is not None:
+        where.append("e.is_watch_connected = :watch")
+        params["watch"] = int(state["watch"])
+
+    base = "FROM event e JOIN users u ON u.id = e.protectee_id WHERE " + " AND ".join(where)
+    if shape == "extreme":
+        cols = f"e.timestamp, e.{metric}" if state.get("want_when") else f"e.{metric}"
+        order = "DESC" if state["direction"] == "max" else "ASC"
+        sql = f"SELECT {cols} {base} ORDER BY e.{metric} {order}, e.timestamp DESC LIMIT 1"
+    elif shape == "avg":
+        sql = f"SELECT ROUND(AVG(e.{metric}), 1) {base}"
+    else:
+        sql = f"SELECT COUNT(*) {base}"
+    return sql, params
+
+
+def _record(hit: bool) -> None:
+    (_hits if hit else _misses).inc()
+    total = _hits.value + _misses.value
+    _hit_ratio.set(_hits.value / total if total else 0.0)
+
+
+def sql_planner_node(state) -> Dict[str, Any]:
+    """플래너가 확신하면 db_query_tool 호출 메시지를 바로 만든다 (planned=True)."""
+    try:
+        plan = plan_sql(state)
+    except Exception:
+        plan = None
+    _record(plan is not None)
+    if plan is None:
+        return {"planned": False}
+    sql, params = plan
+    return {
+        "planned": True,
+        "messages": [AIMessage(content="", tool_calls=[{
+            "name": getattr(db_query_tool, "name", "db_query_tool"),
+            "args": {"query": sql, "parameters": params},
+            "id": f"plan_sql_{uuid.uuid4()}",
+        }])],
+    }
+
+
+def route_after_planner(state) -> str:
+    if state.get("planned"):
+        return "execute_query"
+    return route_schema(state)
@@ -0,0 +1,88 @@
+"""
+오류 인지 SQL 수리 루프.
+
+query_gen/correct_query/실행 결과가 "Error:"면 예전처럼 query_gen으로 돌아가 처음부터 다시 생성하지 않고,
+실패한 SQL과 실제 SQLite 오류 문구를 수리 프롬프트에 넣어 고친 SQL을 받는다 (요청당 settings.sql_repair_attempts회).
+예산을 다 쓰면 Final: 안내 문구로 끝낸다. 요청별 시도 횟수는 entrypoint가 dbchat.sql_repair.attempts에 남긴다.
+"""
+from __future__ import annotations
+from typing import Any, Dict
+from langchain_core.messages import AIMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END
+from app.config import settings
+from app.core.llm import get_json_llm, register_static_prefix
+from app.graph.guards import SQL_HEAD, ALLOWED_SCHEMA, extract_sql
+from app.graph.nodes import _SQL_SCHEMA, _analysis, query_gen_node, robust_json_parse, should_continue
+from app.graph.schema_facts import JOIN_RULE
+from llm_web import metrics
+
+_repairs = metrics.counter("dbchat.sql_repair.repairs")
+_regenerations = metrics.counter("dbchat.sql_repair.regenerations")
+_exhausted = metrics.counter("dbchat.sql_repair.exhausted")
+
+GIVE_UP_MESSAGE = "질문에 맞는 조회를 만들지 못했습니다. 대상자 이름이나 기간을 조금 더 구체적으로 적어 다시 물어봐 주세요."
+
+_TABLES = "; ".join(f"{t}({', '.join(spec['columns'])})" for t, spec in ALLOWED_SCHEMA.items())
+
+REPAIR_INSTRUCTION = f"""You are a careful SQLite expert fixing a query that failed.
+Tables: {_TABLES}. Join rule: {JOIN_RULE}. Use aliases e (event) and u (users).
+Change only what the error points at; keep the question's filters, metric and ordering.
+
+Return ONLY valid JSON, no code fences, no extra text, with schema:
+{{{{"sql": "<fixed_sql>"}}}}
+"""
+
+repair_prompt = ChatPromptTemplate.from_messages([
+    ("system", REPAIR_INSTRUCTION),
+    ("human",
+     "Question: {question}\n"
+     "Metric column: e.{metric_col}\n"
+     "Failing SQL:\n{sql}\n"
+     "Error:\n{error}"),
+])
+register_static_prefix(REPAIR_INSTRUCTION.format())
+
+
+def _last_error(state) -> str:
+    text = str(state["messages"][-1].content or "").strip()
+    return text[len("Error:"):].strip() if text.startswith("Error:") else text
+
+
+def repair_sql_node(state) -> Dict[str, Any]:
+    attempts = state.get("repair_attempts", 0)
+    if attempts >= settings.sql_repair_attempts:
+        _exhausted.inc()
+        return {"repair_failed": True, "messages": [AIMessage(content=f"Final: {GIVE_UP_MESSAGE}")]}
+    attempts += 1
+
+    failing = state.get("last_sql") or ""
+    if not failing:
+        # 고칠 SQL이 없으면 (생성 실패, 플래너의 바인딩 SQL) 처음부터 다시 생성
+        _regenerations.inc()
+        return {**query_gen_node(state), "repair_attempts": attempts}
+
+    _repairs.inc()
+    a = _analysis(state)
+    llm = get_json_llm(_SQL_SCHEMA, profile="sql_repair")
+    try:
+        fixed = (repair_prompt | llm | StrOutputParser() | RunnableLambda(robust_json_parse)).invoke({
+            "question": a["question"],
+            "metric_col": a["metric_col"],
+            "sql": failing,
+            "error": _last_error(state)[:500],
+        })
+    except Exception:
+        fixed = {}
+    sql = extract_sql(fixed.get("sql") or "")
+    if not sql or not SQL_HEAD.search(sql):
+        return {"repair_attempts": attempts, "messages": [AIMessage(content="Error: repair returned no SQL")]}
+    return {"repair_attempts": attempts, "messages": [AIMessage(content=sql)]}
+
+
+def route_after_repair(state) -> str:
+    if state.get("repair_failed"):
+        return END
+    return should_continue(state)
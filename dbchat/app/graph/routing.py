@@ -2,7 +2,7 @@ import json, re
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableLambda
-from app.core.llm import get_chat_llm
+from app.core.llm import get_json_llm, register_static_prefix
 
 METRIC_TO_COL = {
     "imu_danger_level": "imu_danger_level",
@@ -40,6 +40,15 @@ _SCORING_PROMPT = ChatPromptTemplate.from_messages([
     ("system", _SCORING_SYSTEM),
     ("human", "Question: {question}\nReturn JSON only.")
 ])
+register_static_prefix(_SCORING_SYSTEM.format())
+
+_SCORING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "scores": {"type": "object", "properties": {k: {"type": "integer", "maximum": 100} for k in METRIC_TO_COL}},
+        "metric": {"enum": list(METRIC_TO_COL)},
+    },
+}
 
 def _parse_scores(text: str):
     s = re.sub(r"^```(?:json)?|```$", "", (text or "").strip(), flags=re.MULTILINE)
@@ -62,7 +71,7 @@ def _parse_scores(text: str):
     return metric, norm
 
 def choose_metric(question: str) -> str:
-    llm = get_chat_llm()
+    llm = get_json_llm(_SCORING_SCHEMA, profile="route_json")
     parser = StrOutputParser() | RunnableLambda(_parse_scores)
     metric_label, _scores = (_SCORING_PROMPT | llm | parser).invoke({"question": question})
     return METRIC_TO_COL[metric_label]
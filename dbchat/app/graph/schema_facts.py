@@ -41,4 +41,10 @@ SCHEMA_STRICT_TEXT = (
 )
 
 def inject_schema_facts(_: dict) -> dict:
-    return {"messages": [AIMessage(content=SCHEMA_STRICT_TEXT)]}
\ No newline at end of file
+    from app.core.schema_snapshot import get_snapshot
+    try:
+        snap = get_snapshot()
+        live = f"\nLIVE SCHEMA (schema_version={snap.version}):\n{snap.ddl}\n"
+    except Exception:
+        live = ""
+    return {"messages": [AIMessage(content=SCHEMA_STRICT_TEXT + live)]}
\ No newline at end of file
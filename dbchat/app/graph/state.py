@@ -1,6 +1,46 @@
-from typing import Annotated, List
+from typing import Annotated, List, Optional
 from langgraph.graph.message import AnyMessage, add_messages
 from typing_extensions import TypedDict
 
-class State(TypedDict):
-    messages: Annotated[List[AnyMessage], add_messages]
\ No newline at end of file
+class QuestionAnalysis(TypedDict, total=False):
+    """analyze_question 노드가 요청당 한 번 채우는 질문 해석 결과 (이후 노드는 읽기만)."""
+    question: str
+    intent: str                  # "db_query" | "other" (classify_intent)
+    metric_col: str              # event 컬럼명 (choose_metric)
+    direction: Optional[str]     # "max" | "min" | None
+    want_when: bool              # 시각/언제를 묻는지
+    resolved_date: str           # YYYY-MM-DD 또는 ""
+    resolved_from: str           # 주간 창 시작 'YYYY-MM-DD HH:MM:SS' 또는 ""
+    resolved_to: str             # 주간 창 끝(미포함) 또는 ""
+    time_op: str                 # 시각 필터 연산자 ('>=' 등) 또는 ""
+    time_hhmmss: str             # 시각 필터 값 'HH:MM:SS' 또는 ""
+    zone: Optional[str]          # "safe" | "unfamiliar" | None
+    watch: Optional[int]         # 1(연결) | 0(끊김) | None
+    name: str                    # 대상자 이름 (후속 질문에서 context로부터) 또는 ""
+    shape: str                   # "extreme" | "avg" | "count" (후속 질문에서 context로부터) 또는 ""
+
+class ConversationContext(TypedDict, total=False):
+    """대화 스레드에서 답을 낸 마지막 턴의 해석 결과 (app.graph.followup)."""
+    question: str
+    name: str
+    shape: str
+    metric_col: str
+    direction: Optional[str]
+    want_when: bool
+    resolved_date: str
+    resolved_from: str
+    resolved_to: str
+    time_op: str
+    time_hhmmss: str
+    zone: Optional[str]
+    watch: Optional[int]
+    sql: str                     # 실행한 SQL (플래너면 바인딩 SQL)
+
+class State(QuestionAnalysis):
+    messages: Annotated[List[AnyMessage], add_messages]
+    planned: bool                # SQL 플래너 fast path로 처리했는지
+    last_sql: str                # 마지막으로 검사/실행한 SQL (repair_sql이 고칠 대상)
+    repair_attempts: int         # 이번 요청에서 쓴 SQL 수리 시도 수
+    repair_failed: bool          # 수리 예산 소진 → 안내 문구로 종료
+    followup: bool               # 지난 context의 슬롯만 바꿔 재계획한 후속 질문인지
+    context: ConversationContext # 턴 사이에 유지 (대화 스레드 체크포인트)
@@ -1,22 +1,37 @@
 from langgraph.graph import END, StateGraph, START
-from langgraph.checkpoint.memory import MemorySaver
 from app.graph.state import State
+from app.graph.checkpoint import make_checkpointer
 from app.graph.nodes import (
-    first_tool_call, model_get_schema, query_gen_node, model_check_query,
+    classify_intent, route_metric, extract_status, route_after_analysis, analyze_question, first_tool_call, model_get_schema, query_gen_node, model_check_query,
     format_answer, should_continue, route_after_check, after_answer,
     create_tool_node_with_fallback, get_sql_tools
 )
 from app.graph.nlg import narrate_answer 
+from app.graph.planner import sql_planner_node, route_after_planner
+from app.graph.repair import repair_sql_node, route_after_repair
+from app.graph.followup import (
+    CLASSIFY_NODES, route_entry, replan_followup_node, remember_context, conversation_thread_id, turn_inputs,
+)
 from app.graph.schema_facts import inject_schema_facts
 from app.core.tools import db_query_tool
+from app.core.schema_snapshot import get_snapshot
 
 _app_singleton = None
 
 
 def build_graph():
     list_tables_tool, get_schema_tool = get_sql_tools()
+    try:
+        get_snapshot()  # 시작 시 스키마 스냅샷을 만들어 둔다
+    except Exception:
+        pass  # DB를 못 읽으면 요청마다 route_schema가 툴 경로로 보낸다 (nodes.route_schema)
 
     workflow = StateGraph(State)
+    workflow.add_node("classify_intent", classify_intent)
+    workflow.add_node("route_metric", route_metric)
+    workflow.add_node("extract_status", extract_status)
+    workflow.add_node("analyze_question", analyze_question)
+    workflow.add_node("plan_sql", sql_planner_node)
     workflow.add_node("first_tool_call", first_tool_call)
     workflow.add_node("list_tables_tool", create_tool_node_with_fallback([list_tables_tool]))
     workflow.add_node("get_schema_tool", create_tool_node_with_fallback([get_schema_tool]))
@@ -25,25 +40,37 @@ def build_graph():
     workflow.add_node("model_get_schema", model_get_schema)
     workflow.add_node("query_gen", query_gen_node)
     workflow.add_node("correct_query", model_check_query)
+    workflow.add_node("repair_sql", repair_sql_node)
     workflow.add_node("format_answer", format_answer)
     workflow.add_node("narrate_answer", narrate_answer)
+    workflow.add_node("replan_followup", replan_followup_node)
+    workflow.add_node("remember_context", remember_context)
 
-    workflow.add_edge(START, "first_tool_call")
+    # 질문 이해 단계: 독립적인 LLM 분류 세 개를 병렬로 돌리고 analyze_question에서 합류
+    # 대화 스레드의 후속 질문("그럼 어제는?")은 지난 context 슬롯만 바꿔 플래너로 바로 간다
+    workflow.add_conditional_edges(START, route_entry, [*CLASSIFY_NODES, "replan_followup"])
+    workflow.add_edge(CLASSIFY_NODES, "analyze_question")
+    workflow.add_edge("replan_followup", "plan_sql")
+    workflow.add_conditional_edges("analyze_question", route_after_analysis, ["plan_sql", END])
+    workflow.add_conditional_edges("plan_sql", route_after_planner, ["execute_query", "inject_schema", "first_tool_call"])
     workflow.add_edge("first_tool_call", "list_tables_tool")
     workflow.add_edge("list_tables_tool", "model_get_schema")
     workflow.add_edge("model_get_schema", "get_schema_tool")
     workflow.add_edge("get_schema_tool", "inject_schema")
     workflow.add_edge("inject_schema", "query_gen")
-    workflow.add_conditional_edges("query_gen", should_continue)
-    workflow.add_conditional_edges("correct_query", route_after_check)
+    # 오류는 모두 repair_sql로 모인다 (실패 SQL + SQLite 오류로 수리, 예산 소진 시 종료)
+    workflow.add_conditional_edges("query_gen", should_continue, ["correct_query", "repair_sql", END])
+    workflow.add_conditional_edges("repair_sql", route_after_repair, ["correct_query", "repair_sql", END])
+    workflow.add_conditional_edges("correct_query", route_after_check, ["execute_query", "repair_sql"])
     workflow.add_edge("execute_query", "format_answer")
     workflow.add_conditional_edges("format_answer", after_answer, {
-        "query_gen": "query_gen",
-        "narrate_answer": "narrate_answer",
+        "repair_sql": "repair_sql",
+        "narrate_answer": "remember_context",
         "__end__": END,
     })
+    workflow.add_edge("remember_context", "narrate_answer")
 
-    app = workflow.compile(checkpointer=MemorySaver())
+    app = workflow.compile(checkpointer=make_checkpointer())
     return app
 
 
@@ -54,14 +81,97 @@ def get_graph_app():
     return _app_singleton
 
 # Public runner used by API
-from langchain_core.messages import HumanMessage
+from typing import Optional
 from langchain_core.runnables import RunnableConfig
+from llm_server import cancel
+from app.config import settings
+from app.core.tracing import GraphTracer
 from app.utils.messages import random_uuid, invoke_graph
 
 
-def run_graph(message: str, recursive_limit: int = 30) -> dict:
+def prepare_run(message: str, recursive_limit: int = 30, speculative_intent: bool = False, thread_id: Optional[str] = None):
+    """
+    (tracer, config, inputs). thread_id(ChatThread id)를 주면 "chat:<id>" 체크포인트를 이어 써서
+    지난 턴의 context로 후속 질문을 재계획한다 (app.graph.followup). 없으면 1회성 thread_id.
+    """
+    tracer = GraphTracer(message) if settings.trace_enabled else None
+    config = RunnableConfig(
+        recursion_limit=recursive_limit,
+        configurable={
+            "thread_id": conversation_thread_id(thread_id) if thread_id else random_uuid(),
+            "speculative_intent": speculative_intent,
+        },
+        callbacks=[tracer] if tracer else None,
+    )
+    return tracer, config, turn_inputs(message)
+
+
+def _finish_trace(tracer, values: dict, trace_out: Optional[dict], error: Optional[BaseException] = None) -> None:
+    if tracer:
+        trace = tracer.finish(values, error=error)
+        if trace_out is not None:
+            trace_out.update(trace)
+
+
+def run_graph(
+    message: str,
+    recursive_limit: int = 30,
+    cancel_token=None,
+    speculative_intent: bool = False,
+    thread_id: Optional[str] = None,
+    trace_out: Optional[dict] = None,
+) -> dict:
+    """
+    cancel_token(llm_server.cancel.CancelToken)을 주면 노드가 끝날 때마다 확인해 Cancelled로 중단하고,
+    진행 중인 LLM 생성도 엔진에서 끊긴다. speculative_intent면 그래프 안의 인텐트 분류를 건너뛴다.
+    trace_out을 주면 트레이스 레코드(지연, 토큰 수 등)를 채워 준다.
+    """
     app = get_graph_app()
-    config = RunnableConfig(recursion_limit=recursive_limit, configurable={"thread_id": random_uuid()})
-    inputs = {"messages": [HumanMessage(content=message)]}
-    invoke_graph(app, inputs, config)
-    return app.get_state(config).values
+    tracer, config, inputs = prepare_run(message, recursive_limit, speculative_intent, thread_id)
+
+    def on_node(_):
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+    # 최종 상태는 스트림의 values에서 받는다 (checkpointer=none이면 get_state를 쓸 수 없음)
+    # 노드별 콘솔 출력은 settings.trace_console일 때만 (요청 경로에서 stdout I/O를 하지 않음)
+    values = {}
+    try:
+        with cancel.scope(cancel_token):
+            values = invoke_graph(app, inputs, config, callback=on_node, verbose=settings.trace_console)
+    except BaseException as e:
+        _finish_trace(tracer, values, trace_out, error=e)
+        raise
+    _finish_trace(tracer, values, trace_out)
+    return values
+
+
+async def arun_graph(
+    message: str,
+    recursive_limit: int = 30,
+    cancel_token=None,
+    speculative_intent: bool = False,
+    thread_id: Optional[str] = None,
+    trace_out: Optional[dict] = None,
+) -> dict:
+    """
+    run_graph의 async 버전 (ASGI 뷰용). 이벤트 루프를 막지 않고 graph.astream으로 돌린다.
+    동기 노드는 LangGraph가 실행기 스레드에서, LLM 호출은 app.core.llm의 LLM 스레드 풀에서 처리된다.
+    (노드별 콘솔 출력은 동기 경로의 settings.trace_console만 지원)
+    """
+    app = get_graph_app()
+    tracer, config, inputs = prepare_run(message, recursive_limit, speculative_intent, thread_id)
+
+    values = {}
+    try:
+        with cancel.scope(cancel_token):
+            async for mode, chunk in app.astream(inputs, config, stream_mode=["updates", "values"]):
+                if mode == "values":
+                    values = chunk
+                elif cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+    except BaseException as e:
+        _finish_trace(tracer, values, trace_out, error=e)
+        raise
+    _finish_trace(tracer, values, trace_out)
+    return values
@@ -1,7 +1,7 @@
 from __future__ import annotations
 from typing import Dict, Any
 import json, re
-from app.core.llm import get_chat_llm
+from app.core.llm import get_json_llm, register_static_prefix
 from app.core.database import get_db
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
@@ -21,9 +21,7 @@ ALWAYS return pure JSON: {{\"intent\": \"db_query\"}} or {{\"intent\": \"other\"
 Do not add explanations. No code fences.
 """
 
-PROMPT = ChatPromptTemplate.from_messages([
-    ("system", SCHEMA_HINT),
-    ("system",
+_EXAMPLES = (
      "Examples:\n"
      "Q: \"박해름의 스트레스가 가장 높았던 시각 알려줘\" -> {{\"intent\":\"db_query\"}}\n"
      "Q: \"안녕?\" -> {{\"intent\":\"other\"}}\n"
@@ -31,9 +29,16 @@ PROMPT = ChatPromptTemplate.from_messages([
      "Q: \"박주연의 HRV 최저값과 시각\" -> {{\"intent\":\"db_query\"}}\n"
      "Q: \"워치가 최근에 끊긴 시간\" -> {{\"intent\":\"db_query\"}}\n"
      "Q: \"수학 문제 풀어줘\" -> {{\"intent\":\"other\"}}\n"
-    ),
+)
+
+PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SCHEMA_HINT),
+    ("system", _EXAMPLES),
     ("human", "{question}")
 ])
+register_static_prefix(SCHEMA_HINT.format(), _EXAMPLES.format())
+
+_INTENT_SCHEMA = {"type": "object", "properties": {"intent": {"enum": ["db_query", "other"]}}}
 
 def _robust_json(text: str) -> Dict[str, Any]:
     cleaned = text.strip()
@@ -51,7 +56,7 @@ def _robust_json(text: str) -> Dict[str, Any]:
 
 def classify_intent_llm(question: str) -> str:
     """Return 'db_query' or 'other'."""
-    llm = get_chat_llm()
+    llm = get_json_llm(_INTENT_SCHEMA, profile="intent")
     chain = PROMPT | llm | StrOutputParser() | RunnableLambda(_robust_json)
     out = chain.invoke({"question": question})
     return out.get("intent", "other")
@@ -144,7 +149,7 @@ _STATUS_SYS = (
     "- zone_conf: integer 0~100\n"
     "- watch: one of 1 | 0 | empty (1=connected, 0=disconnected)\n"
     "- watch_conf: integer 0~100\n"
-    "- notes: short reason\n"
+    "- notes: very short reason (20 characters max)\n"
     "Prefer precision over recall; do NOT guess."
 )
 
@@ -156,6 +161,19 @@ _STATUS_PROMPT = ChatPromptTemplate.from_messages([
     ("system", _STATUS_SYS),
     ("human", "Question: {q}\nJSON only:")
 ])
+register_static_prefix(_STATUS_SYS)
+
+_STATUS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "zone": {"enum": ["safe", "unfamiliar", "empty"]},
+        "zone_conf": {"type": "integer", "maximum": 100},
+        "watch": {"enum": [1, 0, "empty"]},
+        "watch_conf": {"type": "integer", "maximum": 100},
+        # notes는 쓰지 않는 값이라 짧게 둔다 (status_json 예산 안에서 JSON이 닫히도록)
+        "notes": {"type": "string", "maxLength": 20},
+    },
+}
 
 
 
@@ -187,7 +205,7 @@ def semantic_status_extractor(q: str) -> dict:
        "watch_conf": 0~100,
        "notes": "..."}
     """
-    llm = get_chat_llm()  # temperature=0 권장
+    llm = get_json_llm(_STATUS_SCHEMA, profile="status_json")  # temperature=0 권장
     out = (_STATUS_PROMPT | llm | StrOutputParser()).invoke({"q": q})
     data = _safe_json_load(out)
 
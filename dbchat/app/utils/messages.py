@@ -279,13 +279,23 @@ def invoke_graph(
     config: RunnableConfig,
     node_names: List[str] = [],
     callback: Callable = None,
-):
+    verbose: bool = False,
+) -> dict:
+    """
+    노드별 업데이트를 callback에 넘기고 (callback이 없거나 verbose면 콘솔에 출력),
+    최종 상태 값을 돌려준다 (체크포인터 없이도 동작).
+    """
     def format_namespace(namespace):
         return namespace[-1].split(":")[0] if len(namespace) > 0 else "root graph"
 
-    for namespace, chunk in graph.stream(
-        inputs, config, stream_mode="updates", subgraphs=True
+    final: dict = {}
+    for namespace, mode, chunk in graph.stream(
+        inputs, config, stream_mode=["updates", "values"], subgraphs=True
     ):
+        if mode == "values":
+            if not namespace:
+                final = chunk
+            continue
         for node_name, node_chunk in chunk.items():
             if len(node_names) > 0 and node_name not in node_names:
                 continue
@@ -293,8 +303,8 @@ def invoke_graph(
             # 콜백 함수가 있는 경우 실행
             if callback is not None:
                 callback({"node": node_name, "content": node_chunk})
-            # 콜백이 없는 경우 기본 출력
-            else:
+            # 콜백이 없거나 verbose면 디버그 출력
+            if callback is None or verbose:
                 print("\n" + "=" * 50)
                 formatted_namespace = format_namespace(namespace)
                 if formatted_namespace == "root graph":
@@ -326,6 +336,7 @@ def invoke_graph(
                         for item in node_chunk:
                             print(item)
                 print("=" * 50)
+    return final
 
 async def astream_graph(
     graph: CompiledStateGraph,
@@ -0,0 +1,38 @@
+"""
+워밍업용 프롬프트 계열. 노드별 정적 system 프롬프트 + 더미 질문으로 짧게 한 번씩 생성해
+CUDA 커널/접두부 KV 캐시/제약 디코딩 토큰 테이블을 미리 채운다.
+"""
+from typing import Any, Callable, Dict
+from app.core.llm import get_chat_llm, get_json_llm
+from app.graph import nlg, nodes, repair, routing
+from app.utils import intent
+
+WARMUP_QUESTION = "박주연의 어제 스트레스가 가장 높았던 시각 알려줘"
+_WARMUP_SQL = "SELECT e.timestamp, e.stress FROM event e ORDER BY e.stress DESC LIMIT 1"
+
+
+def warmup_families() -> Dict[str, Callable[[], Any]]:
+    q = WARMUP_QUESTION
+
+    def run(prompt, llm, **values):
+        return lambda: (prompt | llm.bind(max_new_tokens=8)).invoke(values)
+
+    return {
+        "intent": run(intent.PROMPT, get_json_llm(intent._INTENT_SCHEMA), question=q),
+        "routing": run(routing._SCORING_PROMPT, get_json_llm(routing._SCORING_SCHEMA), question=q),
+        "status": run(intent._STATUS_PROMPT, get_json_llm(intent._STATUS_SCHEMA), q=q),
+        "query_gen": run(
+            nodes.query_gen_prompt, get_chat_llm(), question=q, metric_col="stress",
+            resolved_date_yyyy_mm_dd="", resolved_from="", resolved_to="", time_op="", time_hhmmss="",
+            zone="", watch="",
+        ),
+        "query_check": run(nodes.query_check_prompt, get_json_llm(nodes._SQL_SCHEMA), sql=_WARMUP_SQL),
+        "repair": run(
+            repair.repair_prompt, get_json_llm(nodes._SQL_SCHEMA), question=q, metric_col="stress",
+            sql=_WARMUP_SQL, error="(sqlite3.OperationalError) no such column: e.stres",
+        ),
+        "narrate": run(
+            nlg.PROMPT, get_chat_llm(), question=q, answer="Answer: 2025-08-18 19:50 (지수 99.0)",
+            rows_summary='[["2025-08-18 19:50:00", 99]]', has_ts="예", has_val="예",
+        ),
+    }
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class DbchatConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "dbchat"
+
+    def ready(self):
+        from llm_server.config import settings as server_settings
+        from llm_web import readiness
+        if server_settings.warmup and readiness.should_warm_up():
+            def _families():
+                from dbchat.app.warmup import warmup_families
+                return warmup_families()
+
+            from dbchat.app.core.llm import get_chat_llm
+            readiness.start_warmup("chat", get_chat_llm, _families)
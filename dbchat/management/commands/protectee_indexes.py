@@ -0,0 +1,74 @@
+"""
+protectee.db 보조 인덱스 적용/제거/비교.
+
+    python manage.py protectee_indexes                 # 없는 인덱스 생성 + ANALYZE
+    python manage.py protectee_indexes --drop
+    python manage.py protectee_indexes --explain       # 대표 쿼리의 EXPLAIN QUERY PLAN + 시간 (현재 상태)
+    python manage.py protectee_indexes --db /tmp/bench.db --compare   # 인덱스 없이/있이 EXPLAIN + 시간 비교 (끝나면 적용된 상태)
+
+--compare는 인덱스를 지웠다가 다시 만들므로 --db로 지정한 복사본에만 쓴다 (운영 DB면 거부).
+"""
+import json
+import sqlite3
+from django.core.management.base import BaseCommand, CommandError
+from dbchat.app.core import indexes
+
+
+def _probes(conn: sqlite3.Connection):
+    from report.db_service import query_template
+    params = indexes.probe_params(conn)
+    return indexes.chat_probes(params) + [("report_daily", query_template.text, {"name": params["name"], "date": params["date"]})]
+
+
+class Command(BaseCommand):
+    help = "protectee.db(event/users) 보조 인덱스를 적용하고 대표 쿼리의 실행 계획/시간을 보여준다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--db", default=None, help="SQLite 파일 (기본: dbchat settings.sqlite_uri)")
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument("--drop", action="store_true", help="관리 인덱스 제거")
+        mode.add_argument("--explain", action="store_true", help="현재 상태의 실행 계획/시간")
+        mode.add_argument("--compare", action="store_true", help="인덱스 없이/있이 실행 계획/시간 비교 (--db 복사본 필수)")
+        parser.add_argument("--repeats", type=int, default=3)
+
+    def handle(self, *args, **opts):
+        path = opts["db"] or indexes.sqlite_path()
+        if opts["compare"] and (not opts["db"] or indexes.is_live_db(path)):
+            raise CommandError("--compare는 인덱스를 지웠다가 다시 만듭니다. 운영 DB의 복사본을 --db로 지정하세요.")
+        if opts["compare"]:
+            self._compare(path, opts["repeats"])
+            return
+        conn = sqlite3.connect(path)
+        try:
+            if opts["drop"]:
+                self.stdout.write(f"dropped: {indexes.drop(conn)}")
+            elif opts["explain"]:
+                self._report("current", conn, opts["repeats"])
+            else:
+                created = indexes.apply(conn)
+                self.stdout.write(f"created: {created or '(all present)'}")
+        finally:
+            conn.close()
+
+    def _compare(self, path: str, repeats: int):
+        conn = sqlite3.connect(path)
+        try:
+            probes = _probes(conn)
+        finally:
+            conn.close()
+        before, after = indexes.compare(path, probes, repeats)
+        self._write("without indexes", before)
+        self._write("with indexes", after)
+        self.stdout.write("speedup (best_ms):")
+        for b, a in zip(before, after):
+            ratio = b["best_ms"] / a["best_ms"] if a["best_ms"] else float("inf")
+            self.stdout.write(f"  {b['name']}: {b['best_ms']} → {a['best_ms']} ms (x{ratio:.1f})")
+
+    def _report(self, label: str, conn: sqlite3.Connection, repeats: int):
+        rows = indexes.profile(conn, _probes(conn), repeats)
+        self._write(label, rows)
+        return rows
+
+    def _write(self, label: str, rows):
+        self.stdout.write(f"== {label} ==")
+        self.stdout.write(json.dumps(rows, ensure_ascii=False, indent=2))
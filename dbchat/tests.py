@@ -1,3 +1,578 @@
-from django.test import TestCase
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from unittest import mock
+from typing import Annotated
+from django.test import RequestFactory, SimpleTestCase
+from langgraph.graph import START, StateGraph
+from typing_extensions import TypedDict
+from sqlalchemy import create_engine
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+from dbchat.answers import strip_tag, stream_strip_tag
+from dbchat.app import entrypoint
+from dbchat import utils, views_api
+from dbchat.app.graph import checkpoint, followup, nodes, planner, repair
+from dbchat.app.graph.guards import parse_tool_result
+from dbchat.app.core import indexes, schema_snapshot, tools, tracing
+from benchmarks.synth_data import generate
 
-# Create your tests here.
+_NARRATE = {"langgraph_node": "narrate_answer"}
+
+
+def _events():
+    return [
+        ("values", {"intent": "db_query", "repair_attempts": 1, "messages": []}),
+        ("messages", (AIMessageChunk(content="첫 줄"), _NARRATE)),
+        ("messages", (AIMessageChunk(content=" 둘째 줄"), _NARRATE)),
+    ]
+
+
+class AskStreamFinishTests(SimpleTestCase):
+    """소비자가 첫 조각에서 스트림을 닫아도 트레이스/state_out이 채워져야 한다."""
+
+    def _app(self):
+        def stream(*a, **kw):
+            yield from _events()
+
+        async def astream(*a, **kw):
+            for ev in _events():
+                yield ev
+
+        app = mock.Mock()
+        app.stream.side_effect = stream
+        app.astream.side_effect = astream
+        return app
+
+    def _patched(self, tracer):
+        return mock.patch.multiple(
+            entrypoint,
+            get_graph_app=mock.Mock(return_value=self._app()),
+            prepare_run=mock.Mock(return_value=(tracer, {}, {})),
+        )
+
+    def test_sync_stream_closed_early_still_finishes(self):
+        tracer, out = mock.Mock(), {}
+        with self._patched(tracer):
+            pieces = entrypoint.ask_stream("q", state_out=out, speculative=False)
+            self.assertEqual(next(pieces), "첫 줄")
+            pieces.close()
+        tracer.finish.assert_called_once()
+        self.assertEqual(out["repair_attempts"], 1)
+
+    async def test_async_stream_closed_early_still_finishes(self):
+        tracer, out = mock.Mock(), {}
+        with self._patched(tracer):
+            pieces = entrypoint.aask_stream("q", state_out=out, speculative=False)
+            self.assertEqual(await pieces.__anext__(), "첫 줄")
+            await pieces.aclose()
+        tracer.finish.assert_called_once()
+        self.assertEqual(out["repair_attempts"], 1)
+
+    def test_stream_runs_to_end_once(self):
+        tracer, out = mock.Mock(), {}
+        with self._patched(tracer):
+            self.assertEqual(list(entrypoint.ask_stream("q", state_out=out, speculative=False)), ["첫 줄", " 둘째 줄"])
+        tracer.finish.assert_called_once()
+        self.assertEqual(out["intent"], "db_query")
+
+
+class StripTagTests(SimpleTestCase):
+    def test_strip_tag_keeps_first_meaningful_line(self):
+        self.assertEqual(strip_tag("Final: 첫 줄\n둘째 줄"), "첫 줄")
+        self.assertEqual(strip_tag(None), "")
+
+    async def test_stream_strip_tag_drops_split_tag_and_stops_at_newline(self):
+        async def pieces():
+            for p in ("Fin", "al: 최대", " 스트레스는 91", "입니다.\n추가 설명"):
+                yield p
+
+        self.assertEqual([p async for p in stream_strip_tag(pieces())], ["최대", " 스트레스는 91", "입니다."])
+
+
+class AskStreamViewTests(SimpleTestCase):
+    async def _stream(self, question, intent="db_query"):
+        closed = []
+
+        async def fake_aask_stream(q, recursive_limit=None, state_out=None):
+            state_out["intent"] = intent
+            try:
+                for p in ("Final: 홍길동의", " 최고 스트레스는 91입니다.", "\n추가 설명"):
+                    yield p
+            finally:
+                closed.append(q)
+
+        request = RequestFactory().post(
+            "/dbchat/api/ask_stream", data=json.dumps({"question": question}), content_type="application/json",
+        )
+        with mock.patch.object(views_api, "aask_stream", fake_aask_stream), \
+                mock.patch.object(views_api, "aguide", mock.AsyncMock(return_value="안내")):
+            response = await views_api.api_ask_stream(request)
+            body = "".join([p.decode() if isinstance(p, bytes) else p async for p in response.streaming_content])
+        return body, closed
+
+    async def test_streams_the_first_answer_line(self):
+        body, closed = await self._stream("홍길동 최고 스트레스")
+        self.assertEqual(body, "홍길동의 최고 스트레스는 91입니다.\n")
+        self.assertEqual(closed, ["홍길동 최고 스트레스"])
+
+    async def test_non_db_intent_gets_the_guide(self):
+        body, _ = await self._stream("안녕", intent="other")
+        self.assertTrue(body.endswith("안내"))
+        self.assertNotIn("[예외]", body)
+
+
+class PipelineErrorTests(SimpleTestCase):
+    async def test_exception_text_stays_out_of_the_chat_message(self):
+        thread = mock.Mock(id="t1")
+        boom = mock.AsyncMock(side_effect=RuntimeError("no such table: event_x (/srv/db/protectee.db)"))
+        with mock.patch.object(utils, "aask_once", boom), self.assertLogs("dbchat.pipeline", "ERROR") as logs:
+            answer, meta = await utils.arun_dbchat_pipeline(thread, "홍길동 어제 최고 스트레스?")
+        self.assertIn("no such table", str(logs.records[0].exc_info[1]))
+        self.assertEqual(answer, utils.ANSWER_FAILED)
+        self.assertEqual(meta["error"], "RuntimeError")  # meta는 ChatMessageSerializer로 노출된다
+
+
+class KnownNamesCacheTests(SimpleTestCase):
+    def setUp(self):
+        planner._names = None
+        self.engine = mock.MagicMock()
+        self.rows = self.engine.connect.return_value.__enter__.return_value.exec_driver_sql.return_value.fetchall
+        self.rows.return_value = [("홍길동",), ("김철수",)]
+        self.patches = [
+            mock.patch.object(planner, "get_engine", return_value=self.engine),
+            mock.patch.object(planner.settings, "known_names_ttl_s", 300.0),
+            mock.patch.object(planner.settings, "known_names_refresh_s", 10.0),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        planner._names = None
+
+    def test_names_are_read_once_per_ttl(self):
+        for _ in range(3):
+            self.assertEqual(planner._names_in("홍길동 어제 최고 스트레스"), ["홍길동"])
+        self.assertEqual(self.rows.call_count, 1)
+
+    def test_miss_refreshes_at_most_once_per_interval(self):
+        planner._names_in("홍길동")
+        self.rows.return_value = [("홍길동",), ("이영희",)]
+        self.assertEqual(planner._names_in("그럼 어제는?"), [])  # 방금 읽었으므로 다시 읽지 않음
+        self.assertEqual(self.rows.call_count, 1)
+        planner._names_at -= 11.0
+        self.assertEqual(planner._names_in("이영희 평균 hrv"), ["이영희"])
+        self.assertEqual(self.rows.call_count, 2)
+
+
+class IndexCompareTests(SimpleTestCase):
+    def test_compare_refuses_the_live_db(self):
+        with mock.patch.object(indexes, "sqlite_path", return_value=__file__):
+            with self.assertRaises(ValueError):
+                indexes.compare(__file__, [], repeats=1)
+
+    def test_compare_runs_on_a_copy_and_leaves_indexes_applied(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "copy.db")
+            generate(path, users=3, events=2000, days=3, seed=1, start=datetime(2025, 8, 1))
+            conn = sqlite3.connect(path)
+            try:
+                probes = indexes.chat_probes(indexes.probe_params(conn))
+            finally:
+                conn.close()
+            before, after = indexes.compare(path, probes, repeats=1)
+            self.assertEqual([r["name"] for r in before], [r["name"] for r in after])
+            conn = sqlite3.connect(path)
+            try:
+                self.assertTrue({name for name, _, _ in indexes.INDEXES} <= set(indexes.existing(conn)))
+            finally:
+                conn.close()
+
+
+class AnalyzeQuestionTests(SimpleTestCase):
+    def test_question_is_analysed_once_into_state_fields(self):
+        state = {"messages": [HumanMessage(content="홍길동 8월 3일 밤 9시 이후 낯선 곳에서 최고 심박수는 언제?")]}
+        with mock.patch.object(nodes, "choose_metric", return_value="heart_rate") as choose:
+            a = nodes.analyze_question(state)
+            self.assertEqual(nodes._analysis({**state, **a})["metric_col"], "heart_rate")
+        choose.assert_called_once()
+        self.assertEqual((a["direction"], a["want_when"]), ("max", True))
+        self.assertTrue(a["resolved_date"].endswith("-08-03"))
+        self.assertEqual((a["time_op"], a["time_hhmmss"]), (">=", "21:00:00"))
+        self.assertEqual(a["zone"], "unfamiliar")
+        self.assertEqual((a["repair_attempts"], a["last_sql"]), (0, ""))
+
+    def test_fanout_fields_are_not_recomputed(self):
+        state = {"messages": [HumanMessage(content="홍길동 최고 스트레스")], "metric_col": "stress", "zone": None, "watch": 1}
+        with mock.patch.object(nodes, "choose_metric") as choose:
+            a = nodes.analyze_question(state)
+        choose.assert_not_called()
+        self.assertEqual((a["metric_col"], a["zone"], a["watch"]), ("stress", None, 1))
+
+
+class SchemaSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 's.db')}")
+        self._ddl("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        self.patches = [
+            mock.patch.object(schema_snapshot, "get_engine", return_value=self.engine),
+            mock.patch.object(schema_snapshot, "_snapshot", None),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _ddl(self, sql):
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(sql)
+
+    def test_snapshot_is_reused_until_the_schema_changes(self):
+        first = schema_snapshot.get_snapshot()
+        self.assertEqual(first.columns, {"users": ["id", "name"]})
+        self.assertIn("CREATE TABLE users", first.ddl)
+        self.assertIs(schema_snapshot.get_snapshot(), first)
+        self._ddl("CREATE TABLE event (id INTEGER, protectee_id INTEGER)")
+        self.assertEqual(set(schema_snapshot.get_snapshot().columns), {"users", "event"})
+
+    def test_validity_follows_required_columns(self):
+        self.assertTrue(schema_snapshot.snapshot_is_valid({"users": ["id", "name"]}))
+        self.assertFalse(schema_snapshot.snapshot_is_valid({"users": ["email"]}))
+        self.assertFalse(schema_snapshot.snapshot_is_valid({"event": ["id"]}))
+        with mock.patch.object(schema_snapshot, "current_schema_version", side_effect=RuntimeError("db down")):
+            self.assertFalse(schema_snapshot.snapshot_is_valid({"users": ["id"]}))
+
+
+class SqlPlannerTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmp.name, "plan.db")
+        generate(cls.path, users=3, events=2000, days=3, seed=1, start=datetime(2025, 8, 1))
+        conn = sqlite3.connect(cls.path)
+        try:
+            cls.name = conn.execute("SELECT name FROM users ORDER BY id LIMIT 1").fetchone()[0]
+        finally:
+            conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def _state(self, question, **kw):
+        return {"question": question, "metric_col": "stress", "direction": None, "want_when": False, **kw}
+
+    def _run(self, plan):
+        sql, params = plan
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def test_extreme_with_date_window_matches_a_hand_written_query(self):
+        state = self._state(f"{self.name} 8월 2일 최고 스트레스", direction="max", resolved_date="2025-08-02")
+        with mock.patch.object(planner, "_names_in", return_value=[self.name]):
+            plan = planner.plan_sql(state)
+        self.assertEqual(plan[1]["name"], self.name)
+        expected = self._run((
+            "SELECT MAX(e.stress) FROM event e JOIN users u ON u.id = e.protectee_id "
+            "WHERE u.name = ? AND e.timestamp >= '2025-08-02 00:00:00' AND e.timestamp < '2025-08-03 00:00:00'",
+            (self.name,),
+        ))
+        self.assertEqual(self._run(plan), expected)
+
+    def test_metric_counts_are_not_answered_with_a_row_count(self):
+        with mock.patch.object(planner, "_names_in", return_value=[self.name]):
+            for q in ("위협 감지 횟수", "낙상 횟수", "스트레스 횟수", "어제 경고 몇 번"):
+                self.assertIsNone(planner.plan_sql(self._state(f"{self.name} {q}")), q)
+            followup_q = self._state(f"{self.name} 기록 횟수 (후속 질문: 그럼 낙상은?)", followup=True, shape="count", name=self.name)
+            self.assertIsNone(planner.plan_sql(followup_q))
+
+    def test_plain_record_count_uses_the_fast_path(self):
+        state = self._state(f"{self.name} 8월 2일 낯선 곳 기록 횟수", resolved_date="2025-08-02", zone="unfamiliar")
+        with mock.patch.object(planner, "_names_in", return_value=[self.name]):
+            plan = planner.plan_sql(state)
+        expected = self._run((
+            "SELECT COUNT(*) FROM event e JOIN users u ON u.id = e.protectee_id WHERE u.name = ? AND e.zone_type = 'unfamiliar'"
+            " AND e.timestamp >= '2025-08-02 00:00:00' AND e.timestamp < '2025-08-03 00:00:00'",
+            (self.name,),
+        ))
+        self.assertEqual(self._run(plan), expected)
+
+    def test_unsure_questions_fall_back_to_the_llm_path(self):
+        with mock.patch.object(planner, "_names_in", return_value=[self.name]):
+            self.assertIsNone(planner.plan_sql(self._state(f"{self.name} 스트레스 80 이상 횟수")))   # 임계값
+            self.assertIsNone(planner.plan_sql(self._state(f"{self.name} 최고 hrv", direction="max")))  # 메트릭 불일치
+            self.assertIsNone(planner.plan_sql(self._state(f"{self.name} 스트레스 알려줘")))            # 모양 없음
+        with mock.patch.object(planner, "_names_in", return_value=[]):
+            self.assertIsNone(planner.plan_sql(self._state("최고 스트레스", direction="max")))
+
+
+class ClassifyFanOutTests(SimpleTestCase):
+    def test_fanout_nodes_write_disjoint_keys(self):
+        state = {"messages": [HumanMessage(content="홍길동 워치 끊긴 동안 최고 스트레스")]}
+        with mock.patch.multiple(
+            nodes,
+            classify_intent_llm=mock.Mock(return_value="db_query"),
+            choose_metric=mock.Mock(return_value="stress"),
+            resolve_status_filters=mock.Mock(return_value={"zone": None, "watch": 0}),
+        ):
+            parts = [nodes.classify_intent(state), nodes.route_metric(state), nodes.extract_status(state)]
+        self.assertEqual(parts, [{"intent": "db_query"}, {"metric_col": "stress"}, {"zone": None, "watch": 0}])
+
+    def test_non_db_questions_end_after_analysis(self):
+        self.assertEqual(nodes.route_after_analysis({"intent": "other"}), "__end__")
+        self.assertEqual(nodes.route_after_analysis({"intent": "db_query"}), "plan_sql")
+        self.assertEqual(nodes.route_after_analysis({}), "plan_sql")
+
+
+class SqlRepairTests(SimpleTestCase):
+    FAILING = "SELECT MAX(e.stres) FROM event e JOIN users u ON u.id = e.protectee_id WHERE u.name = '홍길동'"
+
+    def _state(self, attempts=0, last_sql=FAILING):
+        return {
+            "messages": [HumanMessage(content="홍길동 최고 스트레스"), AIMessage(content="Error: no such column: e.stres")],
+            "question": "홍길동 최고 스트레스", "metric_col": "stress",
+            "last_sql": last_sql, "repair_attempts": attempts,
+        }
+
+    def setUp(self):
+        self.prompts = []
+
+        def fake_llm(prompt_value):
+            self.prompts.append(prompt_value.to_string())
+            return json.dumps({"sql": self.FAILING.replace("e.stres", "e.stress")}, ensure_ascii=False)
+
+        self.budget = mock.patch.object(repair.settings, "sql_repair_attempts", 2)
+        self.budget.start()
+        self.llm = mock.patch.object(repair, "get_json_llm", return_value=RunnableLambda(fake_llm))
+        self.llm.start()
+
+    def tearDown(self):
+        self.llm.stop()
+        self.budget.stop()
+
+    def test_repair_sees_the_failing_sql_and_the_sqlite_error(self):
+        out = repair.repair_sql_node(self._state())
+        self.assertEqual(out["repair_attempts"], 1)
+        self.assertIn("e.stress", out["messages"][0].content)
+        self.assertIn(self.FAILING, self.prompts[0])
+        self.assertIn("no such column: e.stres", self.prompts[0])
+
+    def test_nothing_to_fix_regenerates(self):
+        with mock.patch.object(repair, "query_gen_node", return_value={"messages": [AIMessage(content="SELECT 1")]}) as gen:
+            out = repair.repair_sql_node(self._state(last_sql=""))
+        gen.assert_called_once()
+        self.assertEqual(out["repair_attempts"], 1)
+
+    def test_exhausted_budget_gives_up_and_ends(self):
+        out = repair.repair_sql_node(self._state(attempts=2))
+        self.assertTrue(out["repair_failed"])
+        self.assertIn(repair.GIVE_UP_MESSAGE, out["messages"][0].content)
+        self.assertEqual(self.prompts, [])
+        self.assertEqual(repair.route_after_repair(out), repair.END)
+
+
+class _Turns(TypedDict):
+    turns: Annotated[list, lambda a, b: a + b]
+
+
+def _turn_graph(saver):
+    g = StateGraph(_Turns)
+    g.add_node("say", lambda state: {"turns": [len(state["turns"])]})
+    g.add_edge(START, "say")
+    return g.compile(checkpointer=saver)
+
+
+class CheckpointerTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "checkpoints.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _cfg(self, tid):
+        return {"configurable": {"thread_id": tid}}
+
+    def test_sqlite_state_survives_a_new_saver(self):
+        _turn_graph(checkpoint.SqliteSaver(self.path, 10, 0)).invoke({"turns": []}, self._cfg("t1"))
+        # 다른 워커/재시작: 같은 파일을 새로 연다
+        graph = _turn_graph(checkpoint.SqliteSaver(self.path, 10, 0))
+        self.assertEqual(graph.invoke({"turns": []}, self._cfg("t1"))["turns"], [0, 1])
+        self.assertEqual(graph.get_state(self._cfg("t1")).values["turns"], [0, 1])
+
+    async def test_sqlite_async_path(self):
+        graph = _turn_graph(checkpoint.SqliteSaver(self.path, 10, 0))
+        await graph.ainvoke({"turns": []}, self._cfg("t1"))
+        self.assertEqual((await graph.ainvoke({"turns": []}, self._cfg("t1")))["turns"], [0, 1])
+
+    def test_sqlite_prunes_least_recent_threads(self):
+        saver = checkpoint.SqliteSaver(self.path, 2, 0)
+        saver._PRUNE_EVERY = 1
+        graph = _turn_graph(saver)
+        for tid in ("a", "b", "c"):
+            graph.invoke({"turns": []}, self._cfg(tid))
+        self.assertEqual(saver.threads(), 2)
+        self.assertIsNone(saver.get_tuple(self._cfg("a")))
+        self.assertGreater(saver.evictions(), 0)
+
+    def test_memory_saver_is_bounded_by_threads(self):
+        saver = checkpoint.BoundedMemorySaver(max_threads=2, ttl_s=0)
+        graph = _turn_graph(saver)
+        for tid in ("a", "b", "c"):
+            graph.invoke({"turns": []}, self._cfg(tid))
+        self.assertEqual(saver.threads(), 2)
+        self.assertIsNone(saver.get_tuple(self._cfg("a")))
+        self.assertEqual(graph.invoke({"turns": []}, self._cfg("c"))["turns"], [0, 1])
+
+    def test_make_checkpointer_follows_settings(self):
+        with mock.patch.multiple(checkpoint.settings, checkpointer="none"):
+            self.assertIsNone(checkpoint.make_checkpointer())
+        with mock.patch.multiple(checkpoint.settings, checkpointer="sqlite", checkpoint_path=self.path):
+            self.assertIsInstance(checkpoint.make_checkpointer(), checkpoint.SqliteSaver)
+        with mock.patch.multiple(checkpoint.settings, checkpointer="redis"), self.assertRaises(ValueError):
+            checkpoint.make_checkpointer()
+
+
+class GraphTracerTests(SimpleTestCase):
+    def test_trace_collects_nodes_and_sql_into_the_ring_buffer(self):
+        tracer = tracing.GraphTracer("홍길동 최고 스트레스")
+        _turn_graph(None).invoke({"turns": []}, {"callbacks": [tracer]})
+        run_id = uuid.uuid4()
+        tracer.on_tool_start({"name": "db_query_tool"}, "SELECT 1", run_id=run_id)
+        tracer.on_tool_end(
+            ToolMessage(content="{}", tool_call_id="c1", artifact={"row_count": 3, "truncated": True}), run_id=run_id,
+        )
+        trace = tracer.finish({"intent": "db_query", "repair_attempts": 1})
+        self.assertEqual([n["name"] for n in trace["nodes"]], ["say"])
+        sql = trace["sql"][0]
+        self.assertEqual((sql["name"], sql["ok"], sql["rows"], sql["truncated"]), ("db_query_tool", True, 3, True))
+        self.assertEqual((trace["intent"], trace["repair_attempts"]), ("db_query", 1))
+        self.assertIs(tracing.recent(1)[0], trace)
+
+    def test_records_are_flushed_to_jsonl_off_thread(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "traces.jsonl")
+            with mock.patch.object(tracing.settings, "trace_path", path), mock.patch.object(tracing, "_writer", None):
+                tracing.record({"trace_id": "t1", "question": "질문"})
+                deadline = time.monotonic() + 5
+                while not (os.path.exists(path) and os.path.getsize(path)) and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(json.loads(f.readline())["question"], "질문")
+
+
+class FollowupTests(SimpleTestCase):
+    CONTEXT = {
+        "question": "홍길동 8월 2일 최고 스트레스", "name": "홍길동", "shape": "extreme", "metric_col": "stress",
+        "direction": "max", "want_when": False, "resolved_date": "2025-08-02", "resolved_from": "", "resolved_to": "",
+        "time_op": "", "time_hhmmss": "", "zone": None, "watch": None, "sql": "SELECT ...",
+    }
+
+    def setUp(self):
+        self.names = mock.patch.object(followup, "_names_in", side_effect=lambda q: ["김철수"] if "김철수" in q else [])
+        self.names.start()
+
+    def tearDown(self):
+        self.names.stop()
+
+    def _state(self, question, context=CONTEXT):
+        return {"messages": [HumanMessage(content=question)], "context": context}
+
+    def test_elliptic_question_replans_only_the_changed_slot(self):
+        state = self._state("그럼 낯선 곳에서는?")
+        self.assertEqual(followup.route_entry(state), ["replan_followup"])
+        out = followup.replan_followup_node(state)
+        self.assertEqual((out["zone"], out["metric_col"], out["resolved_date"]), ("unfamiliar", "stress", "2025-08-02"))
+        self.assertTrue(out["followup"])
+        self.assertIn("후속 질문: 그럼 낯선 곳에서는?", out["question"])
+
+    def test_new_questions_go_through_classification(self):
+        self.assertEqual(followup.route_entry(self._state("그럼 낯선 곳에서는?", context={})), followup.CLASSIFY_NODES)
+        self.assertIsNone(followup.detect_followup(self._state("그럼 김철수는?")))
+        self.assertIsNone(followup.detect_followup(self._state("지난주 전체 사용자 중 스트레스가 가장 높았던 사람과 그 시각을 알려줘")))
+
+    def test_short_off_topic_question_is_not_a_followup(self):
+        # "오늘"이 날짜 슬롯이어도 "날씨"는 지난 질문의 슬롯이 아니다 (intent를 db_query로 덮어쓰면 안 됨)
+        for question in ("오늘 날씨는요?", "그럼 점심 뭐 먹지?"):
+            self.assertIsNone(followup.detect_followup(self._state(question)), question)
+            self.assertEqual(followup.route_entry(self._state(question)), followup.CLASSIFY_NODES)
+        self.assertIsNotNone(followup.detect_followup(self._state("그럼 밤 9시 이후는?")))
+
+    def test_context_is_kept_only_for_chat_threads(self):
+        state = {**self.CONTEXT, "question": "김철수 최고 스트레스", "name": "", "shape": "", "planned": True, "messages": []}
+        self.assertEqual(followup.remember_context(state, {"configurable": {"thread_id": "one-shot"}}), {})
+        ctx = followup.remember_context(state, {"configurable": {"thread_id": followup.conversation_thread_id("7")}})["context"]
+        self.assertEqual((ctx["name"], ctx["shape"], ctx["question"]), ("김철수", "extreme", "김철수 최고 스트레스"))
+
+    def test_turn_inputs_reset_per_turn_fields(self):
+        inputs = followup.turn_inputs("그럼 어제는?")
+        self.assertEqual(inputs["messages"][-1].content, "그럼 어제는?")
+        self.assertEqual((inputs["planned"], inputs["followup"], inputs["name"]), (False, False, ""))
+        self.assertNotIn("context", inputs)
+
+
+class QueryResultArtifactTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'q.db')}")
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE event (id INTEGER, stress INTEGER, hrv REAL, note TEXT, raw BLOB)")
+            for i in range(5):
+                conn.exec_driver_sql(
+                    "INSERT INTO event VALUES (?, ?, ?, ?, ?)", (i, 50 + i, None if i else 41.5, "x" * (10 * i), b"\0\1"),
+                )
+        self.patches = [
+            mock.patch.object(tools.settings, "tool_max_rows", 3),
+            mock.patch.object(tools.settings, "tool_max_string", 15),
+            mock.patch.object(tools, "get_engine", return_value=self.engine),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_rows_keep_sqlite_types_and_flag_truncation(self):
+        res = tools.run_query("SELECT id, stress, hrv, note, raw FROM event ORDER BY id")
+        self.assertEqual(res["columns"], ["id", "stress", "hrv", "note", "raw"])
+        self.assertEqual((res["row_count"], res["truncated"]), (3, True))
+        self.assertEqual(res["rows"][0], [0, 50, 41.5, "", "<2 bytes>"])
+        self.assertEqual(res["rows"][2][3], "x" * 15 + "...")
+        self.assertFalse(tools.run_query("SELECT COUNT(*) FROM event")["truncated"])
+
+    def test_tool_message_carries_the_artifact_to_parse_tool_result(self):
+        msg = tools.db_query_tool.invoke({
+            "name": "db_query_tool", "type": "tool_call", "id": "c1",
+            "args": {"query": "SELECT MAX(stress) AS m FROM event WHERE id < :n", "parameters": {"n": 3}},
+        })
+        self.assertEqual(msg.artifact["rows"], [[52]])
+        self.assertEqual(json.loads(msg.content)["rows"], [[52]])
+        self.assertEqual(parse_tool_result(msg), (True, [[52]]))
+
+    def test_errors_and_plain_text(self):
+        msg = tools.db_query_tool.invoke({
+            "name": "db_query_tool", "type": "tool_call", "id": "c2", "args": {"query": "SELECT nope FROM event"},
+        })
+        ok, text = parse_tool_result(msg)
+        self.assertFalse(ok)
+        self.assertIn("no such column", text)
+        self.assertEqual(parse_tool_result(ToolMessage(content="[(1,)]", tool_call_id="c3")), (True, "[(1,)]"))
@@ -1,42 +1,47 @@
-from .models import ChatThread
-import random
+import logging
+import time
 from datetime import datetime
+from .models import ChatThread
+from .app.entrypoint import aask_once
+from .answers import aguide, strip_tag
+
+log = logging.getLogger("dbchat.pipeline")
+
+ANSWER_FAILED = "답변을 만드는 중 문제가 발생했습니다. 잠시 후 다시 시도해 주세요."
 
 def make_auto_title(first_question: str) -> str:
     s = first_question.strip().replace("\n", " ")
     return (s[:28] + ("…" if len(s) > 28 else "")) or "새 대화"
 
-# def run_dbchat_pipeline(thread: ChatThread):
-
-#     # 1) 직전 대화 이력 불러오기
-#     history = list(thread.messages.order_by("created_at").values("role", "content"))
-#     # 2) 파이프라인에 맞춰 history 전달 → 답변 생성
-#     #    answer = generate_response_from_query_with_history(history, ...)
-#     answer = "여기서 SQL-Agent 또는 RAG를 호출해 생성한 답변을 넣습니다."
-#     meta = {"latency_ms": 0}
-#     return answer, meta
 
-
-# 임시 더미: 최근 user 메시지를 받아서 에코/규칙 기반으로 간단 응답.
-def run_dbchat_pipeline(thread):
-    msgs = list(thread.messages.order_by("-created_at")[:10][::-1])  # 최근 10개만
-    user_last = next((m.content for m in reversed(msgs) if m.role == "user"), "")
-
-    canned = [
-        "네, 확인했어요.",
-        "일단 최근 데이터부터 검사해볼게요.",
-        "잠깐만요… SQL 쿼리를 구성 중입니다.",
-        "그 질문은 날짜가 필요해 보여요. 예: 2025-08-17",
-        "관련 이벤트를 정리해서 알려드릴게요."
-    ]
-
-    if "안녕" in user_last or "hello" in user_last.lower():
-        answer = "안녕하세요! 무엇을 찾아드릴까요?"
-    elif "스트레스" in user_last:
-        answer = "스트레스 지표를 조회하려면 날짜/이름을 알려주세요. 예) '박주연 8월 17일 스트레스 최고 시각'"
+async def arun_dbchat_pipeline(thread: ChatThread, question: str):
+    """
+    SQL 에이전트 그래프로 답변 생성 → (answer, meta).
+    ChatThread id를 그래프 thread_id로 넘겨 지난 턴의 해석 context를 재사용한다 (후속 질문 재계획).
+    meta에는 실제 지연/토큰 수/경로(planned, followup)를 남긴다.
+    """
+    trace: dict = {}
+    t0 = time.perf_counter()
+    try:
+        res = await aask_once(question, recursive_limit=30, thread_id=str(thread.id), trace_out=trace)
+    except Exception as e:
+        # 예외 문구(SQL/경로 포함 가능)는 로그에만 남긴다. meta는 API로 노출되므로 예외 클래스 이름만 둔다
+        log.exception("dbchat pipeline failed (thread=%s)", thread.id)
+        res, answer = {"ok": False, "error": type(e).__name__}, ANSWER_FAILED
     else:
-        answer = f"'{user_last}' 질문을 받았어요. 곧 분석 결과를 붙일게요."
-
-    answer += " " + random.choice(canned)
-    meta = {"latency_ms": random.randint(30, 120), "ts": datetime.now().isoformat(timespec="seconds")}
+        answer = strip_tag(res.get("answer", "") or "") if res.get("intent") == "db_query" else await aguide()
+    meta = {
+        "latency_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "intent": res.get("intent"),
+        "planned": res.get("planned", False),
+        "followup": res.get("followup", False),
+        "repair_attempts": res.get("repair_attempts", 0),
+        # 트레이스가 꺼져 있으면(TRACE_ENABLED=false) 토큰 수는 None
+        "prompt_tokens": trace.get("prompt_tokens"),
+        "completion_tokens": trace.get("completion_tokens"),
+        "trace_id": trace.get("trace_id"),
+    }
+    if not res.get("ok", True):
+        meta["error"] = res.get("error")
     return answer, meta
@@ -2,11 +2,15 @@ import json
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.shortcuts import render, get_object_or_404
+from django.http import JsonResponse
+from django.shortcuts import render, get_object_or_404, aget_object_or_404
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from .models import ChatThread, ChatMessage
 from .serializers import ChatThreadSerializer, ChatMessageSerializer
-from .utils import make_auto_title, run_dbchat_pipeline
+from .utils import make_auto_title, arun_dbchat_pipeline
 
 
 def _ensure_session(request):
@@ -14,6 +18,11 @@ def _ensure_session(request):
         request.session.save()
     return request.session.session_key
 
+async def _aensure_session(request):
+    if not request.session.session_key:
+        await request.session.asave()
+    return request.session.session_key
+
 def chat_page(request):
     _ensure_session(request)
     return render(request, "dbchat/dbchat.html")
@@ -60,7 +69,10 @@ class MessageListAPI(APIView):
         return Response({"messages": data}, status=status.HTTP_200_OK)
 
 
-class AskAPI(APIView):
+# ASGI에서 요청 하나가 워커 스레드를 잡지 않도록 async 뷰 (DRF APIView는 async 핸들러를 지원하지 않음)
+# DRF가 익명 세션에 CSRF를 강제하지 않던 동작을 그대로 유지
+@method_decorator(csrf_exempt, name="dispatch")
+class AskAPI(View):
     """
     POST /dbchat/ask  — 질문 전송
     Body JSON:
@@ -71,29 +83,33 @@ class AskAPI(APIView):
       "ui_context": {"page": "dbchat"}
     }
     """
-    def post(self, request):
-        session_key = _ensure_session(request)
-
-        question = (request.data.get("question") or "").strip()
+    async def post(self, request):
+        session_key = await _aensure_session(request)
+        try:
+            data = json.loads(request.body.decode("utf-8") or "{}")
+        except ValueError:
+            return JsonResponse({"detail": "Invalid JSON"}, status=status.HTTP_400_BAD_REQUEST)
+
+        question = (data.get("question") or "").strip()
         if not question:
-            return Response({"detail": "Empty question"}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponse({"detail": "Empty question"}, status=status.HTTP_400_BAD_REQUEST)
 
-        thread_id = request.data.get("thread_id")
+        thread_id = data.get("thread_id")
         if thread_id:
-            thread = get_object_or_404(ChatThread, pk=thread_id)
+            thread = await aget_object_or_404(ChatThread, pk=thread_id)
         else:
-            thread = ChatThread.objects.create(
+            thread = await ChatThread.objects.acreate(
                 django_session_key=session_key, page="dbchat", title=""
             )
 
         # 사용자 메시지 저장
-        ChatMessage.objects.create(thread=thread, role="user", content=question)
+        await ChatMessage.objects.acreate(thread=thread, role="user", content=question)
 
-        # LLM/SQL-Agent 호출 (utils.run_dbchat_pipeline)
-        answer_text, meta = run_dbchat_pipeline(thread)
+        # SQL-Agent 그래프 호출 (스레드 단위 context 재사용, utils.arun_dbchat_pipeline)
+        answer_text, meta = await arun_dbchat_pipeline(thread, question)
 
         # 어시스턴트 메시지 저장
-        asst = ChatMessage.objects.create(
+        asst = await ChatMessage.objects.acreate(
             thread=thread, role="assistant", content=answer_text, meta=meta or {}
         )
 
@@ -101,10 +117,10 @@ class AskAPI(APIView):
         if not thread.title:
             thread.title = make_auto_title(question)
         thread.updated_at = timezone.now()
-        thread.save(update_fields=["title", "updated_at"])
+        await thread.asave(update_fields=["title", "updated_at"])
 
         msg_payload = ChatMessageSerializer(asst).data
-        return Response({"thread_id": str(thread.id), "message": msg_payload}, status=status.HTTP_200_OK)
+        return JsonResponse({"thread_id": str(thread.id), "message": msg_payload}, status=status.HTTP_200_OK)
 
 
 class DeleteThreadAPI(APIView):
@@ -1,33 +1,12 @@
 from __future__ import annotations
-import json, time, re
+import json
 from django.http import JsonResponse, StreamingHttpResponse, HttpResponseNotAllowed
 from django.views.decorators.csrf import csrf_exempt
-from dbchat.app.entrypoint import ask_once
-from dbchat.app.utils.intent import classify_intent_llm, list_known_names
-
-def _guide() -> str:
-    names = list_known_names(limit=3)
-    hint = f" (예: {', '.join(names)})" if names else ""
-    return "이 화면에서는 보호대상자의 데이터 조건 검색만 가능합니다. \n누구의 어떤 정보를 알고싶으신가요? 😊" + hint
-
-def _strip_tag(text: str) -> str:
-    """
-    Final:/Answer: 태그 제거 + 첫 유의미 라인만 반환
-    (여러 줄 Final 방지)
-    """
-    if not isinstance(text, str):
-        return ""
-    # 줄 단위에서 Final:/Answer: 태그 제거
-    cleaned = re.sub(r'(?m)^\s*(Final:|Answer:)\s*', '', text).strip()
-    # 첫 유의미 라인만
-    for ln in cleaned.splitlines():
-        s = ln.strip()
-        if s:
-            return s
-    return ""
+from dbchat.answers import aguide, strip_tag, stream_strip_tag
+from dbchat.app.entrypoint import aask_once, aask_stream
 
 @csrf_exempt
-def api_ask(request):
+async def api_ask(request):
     if request.method != "POST":
         return HttpResponseNotAllowed(["POST"])
     try:
@@ -39,25 +18,19 @@ def api_ask(request):
     if not q:
         return JsonResponse({"ok": False, "error": "empty question"}, status=400)
 
-    # 인텐트 게이트 (오류를 JSON으로 돌려주기)
+    # 인텐트 분류는 그래프 안에서 메트릭/상태 분류와 병렬로 돈다 (db_query가 아니면 그래프가 바로 끝남)
     try:
-        intent = classify_intent_llm(q)
-    except Exception as e:
-        return JsonResponse({"ok": False, "error": f"intent_error: {e}"}, status=500)
-
-    if intent != "db_query":
-        return JsonResponse({"ok": True, "answer": _guide()}, status=200)
-
-    try:
-        res = ask_once(q, recursive_limit=30)
-        content = _strip_tag(res.get("answer", "") or "")
+        res = await aask_once(q, recursive_limit=30)
+        if res.get("intent") != "db_query":
+            return JsonResponse({"ok": True, "answer": await aguide()}, status=200)
+        content = strip_tag(res.get("answer", "") or "")
         return JsonResponse({"ok": True, "answer": content}, status=200)
     except Exception as e:
         return JsonResponse({"ok": False, "error": f"ask_error: {e}"}, status=500)
 
 
 @csrf_exempt
-def api_ask_stream(request):
+async def api_ask_stream(request):
     if request.method != "POST":
         return HttpResponseNotAllowed(["POST"])
     try:
@@ -66,34 +39,23 @@ def api_ask_stream(request):
     except Exception:
         q = ""
 
-    def chunk_text(s: str, size: int = 18):
-        for i in range(0, len(s), size):
-            yield s[i:i+size]
-
-    def gen():
+    async def gen():
         if not q:
             yield "질문을 입력해 주세요."
             return
-        # 인텐트 게이트 (제너레이터 내부에서 예외 흘려보내기)
+        # 그래프 실행: narrate_answer 토큰을 생성되는 대로 전달 (인텐트 분류도 그래프 안에서 병렬로)
+        final: dict = {}
+        pieces = aask_stream(q, recursive_limit=30, state_out=final)
         try:
-            intent = classify_intent_llm(q)
-        except Exception as e:
-            yield f"[예외] intent_error: {e}\n"; return
-
-        if intent != "db_query":
-            yield _guide()
-            return
-
-        # 그래프 실행
-        try:
-            res = ask_once(q, recursive_limit=30)
-            content = _strip_tag(res.get("answer", "") or "")
+            async for part in stream_strip_tag(pieces):
+                yield part
         except Exception as e:
             yield f"[예외] ask_error: {e}\n"; return
-
-        for part in chunk_text(content, size=18):
-            yield part
-            time.sleep(0.008)
+        finally:
+            await pieces.aclose()  # 첫 줄에서 끊거나 클라이언트가 떠나면 그래프 스트림도 바로 닫는다
+        if final.get("intent", "db_query") != "db_query":
+            yield await aguide()
+            return
         yield "\n"
 
     return StreamingHttpResponse(
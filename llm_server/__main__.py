@@ -0,0 +1,30 @@
+"""
+모델 서버 실행:  python -m llm_server [--host 127.0.0.1] [--port 8765] [--models chat,report]
+
+Django 워커들은 LLM_SERVER_URL=http://127.0.0.1:8765 로 이 프로세스에 붙는다.
+"""
+import argparse
+import os
+
+from dbchat.app.logger import setup_logging
+from llm_server.config import settings
+from llm_server.server import load_models, serve
+
+
+def main():
+    # report 모델 경로가 Django settings(BASE_DIR)에 의존
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "llm_web.settings")
+
+    ap = argparse.ArgumentParser(prog="llm_server")
+    ap.add_argument("--host", default=settings.server_host)
+    ap.add_argument("--port", type=int, default=settings.server_port)
+    ap.add_argument("--models", default=settings.server_models)
+    args = ap.parse_args()
+
+    setup_logging("INFO")
+    load_models([m.strip() for m in args.models.split(",") if m.strip()])
+    serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, List
+
+from llm_server.cancel import Cancelled
+from llm_web import metrics
+
+# 행마다 달라도 되는 파라미터 (engine.complete_mixed가 행별로 처리) → 배치 키에서 뺀다
+_ROW_KEYS = frozenset({"profile", "json_schema", "max_new_tokens", "stop", "early_stop", "prefix", "cancel"})
+
+
+def _dumps(params: Dict[str, Any]) -> str:
+    return json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class _Pending:
+    __slots__ = ("prompt", "params", "usage", "key", "exact", "future", "enqueued_at")
+
+    def __init__(self, prompt: str, params: Dict[str, Any]):
+        self.prompt = prompt
+        # 토큰 수를 받을 호출자 리스트는 배치 키에 넣지 않고 행별로 돌려준다
+        self.usage = params.pop("usage", None)
+        self.params = params
+        # 샘플링 등 공통 파라미터가 같은 요청끼리 한 배치로 묶는다 (프로필/스키마가 달라도 됨)
+        self.key = _dumps({k: v for k, v in params.items() if k not in _ROW_KEYS})
+        self.exact = _dumps(params)
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """
+    동시 요청들의 프롬프트를 모아 (최대 max_batch_size, 최대 max_wait_ms 대기)
+    왼쪽 패딩 배치 하나로 engine.complete 한다. GenerationEngine과 같은 메서드를 제공.
+    행별 파라미터(_ROW_KEYS)가 섞인 배치는 engine.complete_mixed로 한 번에 생성한다.
+
+    메트릭:
+      llm.<name>.queue_depth  대기 중인 요청 수
+      llm.<name>.batch_size   실제로 묶인 배치 크기
+      llm.<name>.wait_ms      요청별 큐 대기 시간
+      llm.<name>.mixed_batches 행별 파라미터가 섞여 complete_mixed로 처리한 배치 수
+    """
+
+    def __init__(self, engine, max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.engine = engine
+        self.name = engine.name
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: deque[_Pending] = deque()
+        self._cv = threading.Condition()
+
+        self._queue_depth = metrics.gauge(f"llm.{self.name}.queue_depth")
+        self._batch_size = metrics.summary(f"llm.{self.name}.batch_size")
+        self._wait_ms = metrics.summary(f"llm.{self.name}.wait_ms")
+        self._mixed = metrics.counter(f"llm.{self.name}.mixed_batches")
+
+        self._worker = threading.Thread(target=self._loop, name=f"batch-{self.name}", daemon=True)
+        self._worker.start()
+
+    # ---- GenerationEngine 호환 API ----
+    def render(self, messages: List[Dict[str, str]]) -> str:
+        return self.engine.render(messages)
+
+    def submit(self, prompt: str, **params: Any) -> Future:
+        req = _Pending(prompt, params)
+        cancel = params.get("cancel")
+        if cancel is not None and cancel.cancelled:
+            req.future.set_exception(Cancelled(f"cancelled: {cancel.id}"))
+            return req.future
+        with self._cv:
+            self._queue.append(req)
+            self._queue_depth.set(len(self._queue))
+            self._cv.notify()
+        return req.future
+
+    def complete(self, prompts: List[str], **params: Any) -> List[str]:
+        futures = [self.submit(p, **params) for p in prompts]
+        return [f.result() for f in futures]
+
+    def count_tokens(self, texts: List[str]):
+        return self.engine.count_tokens(texts)
+
+    def chat_prompt(self, messages: List[Dict[str, str]], prefix_messages: int = 0):
+        return self.engine.chat_prompt(messages, prefix_messages)
+
+    def chat(self, messages: List[Dict[str, str]], **params: Any) -> str:
+        prompt, prefix = self.chat_prompt(messages, params.pop("prefix_messages", 0))
+        return self.complete([prompt], prefix=prefix, **params)[0]
+
+    def stream(self, prompt: str, **params: Any):
+        # 스트리밍은 토큰 단위로 바로 내보내야 하므로 배치를 거치지 않는다 (엔진 락으로 직렬화)
+        return self.engine.stream(prompt, **params)
+
+    def stream_chat(self, messages: List[Dict[str, str]], **params: Any):
+        return self.engine.stream_chat(messages, **params)
+
+    # ---- worker ----
+    @staticmethod
+    def _row_params(r: _Pending) -> Dict[str, Any]:
+        return dict(r.params) if r.usage is None else {**r.params, "usage": r.usage}
+
+    def _count_key(self, key: str) -> int:
+        return sum(1 for r in self._queue if r.key == key)
+
+    def _take_batch(self) -> List[_Pending]:
+        with self._cv:
+            while not self._queue:
+                self._cv.wait()
+            head = self._queue[0]
+            deadline = head.enqueued_at + self.max_wait
+            while self._count_key(head.key) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cv.wait(remaining)
+
+            batch, rest = [], deque()
+            for r in self._queue:
+                if r.key == head.key and len(batch) < self.max_batch_size:
+                    batch.append(r)
+                else:
+                    rest.append(r)
+            self._queue = rest
+            self._queue_depth.set(len(self._queue))
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._take_batch()
+            started = time.perf_counter()
+            for r in batch:
+                self._wait_ms.observe((started - r.enqueued_at) * 1000.0)
+            self._batch_size.observe(len(batch))
+            try:
+                prompts = [r.prompt for r in batch]
+                if all(r.exact == batch[0].exact for r in batch):
+                    params = dict(batch[0].params)
+                    usage: List[Dict[str, int]] = []
+                    if any(r.usage is not None for r in batch):
+                        params["usage"] = usage
+                    texts = self.engine.complete(prompts, **params)
+                    for r, u in zip(batch, usage):
+                        if r.usage is not None:
+                            r.usage.append(u)
+                else:
+                    self._mixed.inc()
+                    texts = self.engine.complete_mixed(prompts, [self._row_params(r) for r in batch])
+                for r, t in zip(batch, texts):
+                    cancel = r.params.get("cancel")
+                    if cancel is not None and cancel.cancelled:
+                        r.future.set_exception(Cancelled(f"cancelled: {cancel.id}"))
+                    else:
+                        r.future.set_result(t)
+            except Exception as e:
+                for r in batch:
+                    r.future.set_exception(e)
+
+
+def with_batching(engine, max_batch_size: int, max_wait_ms: float):
+    """
+    max_batch_size가 1 이하면 배치 없이 엔진을 그대로 쓴다.
+    초안 모델(assisted decoding)은 배치 1에서만 동작하므로 그 엔진도 배치하지 않는다.
+    """
+    if max_batch_size <= 1 or getattr(engine, "draft_model", None) is not None:
+        return engine
+    return BatchScheduler(engine, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
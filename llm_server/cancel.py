@@ -0,0 +1,105 @@
+"""
+생성 취소 토큰.
+
+호출자가 CancelToken을 만들어 scope()로 현재 컨텍스트에 걸어 두면, 그 안에서 나가는 LLM 호출이
+params["cancel"]로 토큰을 엔진까지 넘기고, 엔진은 StoppingCriteria로 매 스텝 확인해 디코딩을 끊는다.
+모델 서버를 쓰면 토큰 id(cancel_id)만 넘어가고, 취소 시 클라이언트가 /v1/cancel을 보낸다.
+"""
+from __future__ import annotations
+import contextvars
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+class Cancelled(RuntimeError):
+    """취소된 요청의 생성/그래프 실행을 중단할 때 던진다."""
+
+
+class CancelToken:
+    def __init__(self, token_id: Optional[str] = None):
+        self.id = token_id or uuid.uuid4().hex
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            cb()
+
+    def on_cancel(self, cb: Callable[[], None]) -> None:
+        """취소 시 한 번 호출할 콜백 (이미 취소됐으면 바로 호출)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(cb)
+                return
+        cb()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise Cancelled(f"cancelled: {self.id}")
+
+    def __str__(self) -> str:  # 배치 키 등 json.dumps(default=str)용
+        return f"cancel:{self.id}"
+
+
+_current: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar("llm_cancel", default=None)
+
+
+def current() -> Optional[CancelToken]:
+    return _current.get()
+
+
+@contextmanager
+def scope(token: Optional[CancelToken]) -> Iterator[Optional[CancelToken]]:
+    """이 블록(과 여기서 컨텍스트를 복사해 가는 워커 스레드)의 LLM 호출에 토큰을 건다."""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+# ---- 모델 서버 쪽: 원격 요청의 cancel_id → 토큰 ----
+# 한 그래프 실행의 병렬 노드들이 같은 cancel_id로 동시에 들어오므로 참조 수를 센다
+_remote: Dict[str, CancelToken] = {}
+_refs: Dict[str, int] = {}
+_remote_lock = threading.Lock()
+
+
+def remote_token(token_id: str) -> CancelToken:
+    """요청 시작 시 호출. 끝나면 반드시 release_remote로 짝을 맞춘다."""
+    with _remote_lock:
+        tok = _remote.get(token_id)
+        if tok is None:
+            tok = _remote[token_id] = CancelToken(token_id)
+        _refs[token_id] = _refs.get(token_id, 0) + 1
+        return tok
+
+
+def cancel_remote(token_id: str) -> None:
+    # 진행 중인 요청만 대상 (요청 전 취소는 클라이언트가 보내기 전에 확인한다)
+    with _remote_lock:
+        tok = _remote.get(token_id)
+    if tok is not None:
+        tok.cancel()
+
+
+def release_remote(token_id: str) -> None:
+    with _remote_lock:
+        n = _refs.get(token_id, 0) - 1
+        if n > 0:
+            _refs[token_id] = n
+        else:
+            _refs.pop(token_id, None)
+            _remote.pop(token_id, None)
@@ -0,0 +1,105 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterator, List
+
+import requests
+
+from llm_server.cancel import Cancelled
+from llm_server.config import settings
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+def server_get(path: str, base_url: str | None = None) -> Dict[str, Any]:
+    """모델 서버 GET (헬스/통계 조회용)."""
+    r = requests.get(f"{(base_url or settings.server_url).rstrip('/')}{path}", timeout=5)
+    r.raise_for_status()
+    return r.json()
+
+
+class RemoteEngine:
+    """
+    GenerationEngine과 같은 메서드(complete/chat)를 모델 서버 HTTP 호출로 제공.
+    워커는 torch/transformers를 import하지 않으므로 가볍게 뜨고 빨리 재시작된다.
+    """
+
+    def __init__(self, name: str, base_url: str | None = None, timeout: float | None = None):
+        self.name = name
+        self.base_url = (base_url or settings.server_url).rstrip("/")
+        self.timeout = timeout or settings.request_timeout
+        self._http = requests.Session()
+
+    def _with_cancel(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """params의 CancelToken은 id만 보내고, 취소되면 서버에 /v1/cancel을 보낸다."""
+        params = payload.get("params") or {}
+        token = params.get("cancel")
+        if token is None:
+            return payload
+        token.raise_if_cancelled()
+        token.on_cancel(lambda: self._cancel(token.id))
+        params = {k: v for k, v in params.items() if k != "cancel"}
+        return {**payload, "params": {**params, "cancel_id": token.id}}
+
+    def _cancel(self, token_id: str) -> None:
+        try:
+            requests.post(f"{self.base_url}/v1/cancel", json={"cancel_id": token_id}, timeout=5)
+        except requests.RequestException:
+            pass  # 서버가 못 받으면 생성이 끝날 때까지 둔다 (결과는 호출 쪽에서 버림)
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        payload = self._with_cancel(payload)
+        try:
+            r = self._http.post(f"{self.base_url}{path}", json={"model": self.name, **payload}, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise ModelServerError(f"model server unreachable: {e}") from e
+        if r.status_code == 409:
+            raise Cancelled(r.json().get("error", "cancelled"))
+        if r.status_code != 200:
+            raise ModelServerError(f"model server error {r.status_code}: {r.text[:300]}")
+        return r.json()
+
+    def complete(self, prompts: List[str], **params: Any) -> List[str]:
+        usage = params.pop("usage", None)
+        res = self._post("/v1/complete", {"prompts": prompts, "params": params})
+        if usage is not None:
+            usage.extend(res.get("usage") or [])
+        return res["texts"]
+
+    def chat(self, messages: List[Dict[str, str]], **params: Any) -> str:
+        usage = params.pop("usage", None)
+        res = self._post("/v1/chat", {"messages": messages, "params": params})
+        if usage is not None:
+            usage.extend(res.get("usage") or [])
+        return res["text"]
+
+    def count_tokens(self, texts: List[str]) -> List[int | None]:
+        return self._post("/v1/tokens", {"texts": texts})["counts"]
+
+    def _stream(self, payload: Dict[str, Any]) -> Iterator[str]:
+        payload = self._with_cancel(payload)
+        try:
+            r = self._http.post(
+                f"{self.base_url}/v1/stream", json={"model": self.name, **payload}, timeout=self.timeout, stream=True
+            )
+        except requests.RequestException as e:
+            raise ModelServerError(f"model server unreachable: {e}") from e
+        with r:
+            if r.status_code != 200:
+                raise ModelServerError(f"model server error {r.status_code}: {r.text[:300]}")
+            r.encoding = "utf-8"
+            for piece in r.iter_content(chunk_size=None, decode_unicode=True):
+                if piece:
+                    yield piece
+
+    # 스트림 응답은 텍스트 조각뿐이라 토큰 수(usage)는 싣지 않는다
+    def stream(self, prompt: str, **params: Any) -> Iterator[str]:
+        params.pop("usage", None)
+        return self._stream({"prompt": prompt, "params": params})
+
+    def stream_chat(self, messages: List[Dict[str, str]], **params: Any) -> Iterator[str]:
+        params.pop("usage", None)
+        return self._stream({"messages": messages, "params": params})
+
+    def health(self) -> Dict[str, Any]:
+        return server_get("/health", self.base_url)
@@ -0,0 +1,49 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class ServerSettings(BaseSettings):
+    # 워커가 붙을 모델 서버 주소. 비어 있으면 워커 프로세스 안에서 직접 모델을 올린다.
+    server_url: str = Field(default="", description="model server base URL (e.g., 'http://127.0.0.1:8765')")
+    server_host: str = "127.0.0.1"
+    server_port: int = 8765
+    server_models: str = Field(default="chat,report", description="comma-separated model names to preload")
+    request_timeout: float = 300.0
+
+    # 동적 배치: 동시 요청을 최대 batch_max_size개까지, 최대 batch_max_wait_ms 동안 모아 한 번에 생성
+    batch_max_size: int = 8
+    batch_max_wait_ms: float = 10.0
+
+    # 추론 백엔드: "default"(GPU, dtype auto) | "cpu"(int8 동적 양자화 + 스레드 튜닝 + 선택적 torch.compile)
+    backend: str = "default"
+    cpu_threads: int = Field(default=0, description="intra-op threads for the CPU backend (0 = physical cores)")
+    cpu_int8: bool = True
+    cpu_compile: bool = False
+    report_device: str = Field(default="cuda:1", description="device for the report model on the default backend")
+
+    # 리포트 생성 품질/속도 설정. report_draft_model을 주면 assisted(speculative) decoding 사용
+    report_max_new_tokens: int = 1024
+    report_temperature: float = 0.7
+    report_draft_model: str = Field(default="", description="small draft model sharing the report tokenizer")
+
+    # greedy 생성 결과 캐시: 메모리 LRU(항목 수, 0이면 끔) + 선택적 sqlite 디스크 계층
+    response_cache_entries: int = 2048
+    response_cache_path: str = Field(default="", description="sqlite file for the on-disk tier (empty = memory only)")
+    response_cache_ttl_s: float = 86400.0
+    response_cache_max_mb: float = 64.0
+
+    # 앱 시작 시 백그라운드로 모델을 올리고 프롬프트 계열별 더미 생성 (readyz는 완료 후 200)
+    warmup: bool = False
+
+    # 정적 접두부 KV 캐시 용량 (MB, 0이면 끔). 초과 시 LRU로 버림
+    prefix_cache_mb: float = 1024.0
+
+    model_config = SettingsConfigDict(
+        env_prefix="LLM_",
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+        case_sensitive=False,
+    )
+
+settings = ServerSettings()
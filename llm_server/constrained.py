@@ -0,0 +1,310 @@
+"""
+JSON 스키마 기반 제약 디코딩 (LogitsProcessor).
+
+지원하는 스키마 부분집합 (노드들이 요구하는 형태만):
+  - {"type": "object", "properties": {...}}   모든 키 필수, properties 순서대로 출력
+  - {"enum": [...]}                            문자열/숫자 리터럴 중 하나
+  - {"type": "integer", "maximum": N}          음이 아닌 정수 (자릿수 상한)
+  - {"type": "string", "maxLength": N}         이스케이프(\\uXXXX 제외) 허용 문자열
+  - {"type": "boolean"}
+
+스키마를 고정 포맷(`{"a": 1, "b": "x"}`)의 세그먼트 열로 컴파일하고, 매 스텝 현재 상태에서
+이어질 수 있는 토큰만 남긴다. 닫는 '}'가 나오면 EOS만 허용하므로 출력은 항상 json.loads 가능하다.
+"""
+from __future__ import annotations
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from transformers import LogitsProcessor
+
+_DIGITS = "0123456789"
+_ESCAPES = '"\\/bnrt'
+_CLOSED = "closed"
+
+
+class _Lit:
+    def __init__(self, text: str):
+        self.text = text
+
+    init = 0
+
+    def step(self, x, ch):
+        return x + 1 if ch == self.text[x] else None
+
+    def closed(self, x):
+        return x == len(self.text)
+
+    def can_end(self, x):
+        return self.closed(x)
+
+    def first_chars(self, x):
+        return {self.text[x]}
+
+
+class _Choice:
+    def __init__(self, options: List[str]):
+        self.options = options
+
+    init = ""
+
+    def step(self, x, ch):
+        p = x + ch
+        return p if any(o.startswith(p) for o in self.options) else None
+
+    def closed(self, x):
+        return x in self.options and not any(len(o) > len(x) and o.startswith(x) for o in self.options)
+
+    def can_end(self, x):
+        return x in self.options
+
+    def first_chars(self, x):
+        return {o[len(x)] for o in self.options if len(o) > len(x) and o.startswith(x)}
+
+
+class _Int:
+    def __init__(self, max_digits: int):
+        self.max_digits = max(1, max_digits)
+
+    init = 0
+
+    def step(self, x, ch):
+        if ch not in _DIGITS or x >= self.max_digits:
+            return None
+        # JSON은 선행 0을 허용하지 않는다 → '0'이면 바로 끝
+        return self.max_digits if (x == 0 and ch == "0") else x + 1
+
+    def closed(self, x):
+        return x >= self.max_digits
+
+    def can_end(self, x):
+        return x >= 1
+
+    def first_chars(self, x):
+        return set(_DIGITS) if x < self.max_digits else set()
+
+
+class _Str:
+    """상태: -1(여는 따옴표 전) | (글자수, 이스케이프중) | 'closed'. 길이 상한은 allowed()에서만 강제."""
+
+    def __init__(self, max_len: int):
+        self.max_len = max_len
+
+    init = -1
+
+    def step(self, x, ch):
+        if x == -1:
+            return (0, False) if ch == '"' else None
+        if x == _CLOSED:
+            return None
+        n, esc = x
+        if esc:
+            return (n + 1, False) if ch in _ESCAPES else None
+        if ch == '"':
+            return _CLOSED
+        if ch == "\\":
+            return (n, True)
+        if ch < " ":
+            return None
+        return (n + 1, False)
+
+    def closed(self, x):
+        return x == _CLOSED
+
+    def can_end(self, x):
+        return x == _CLOSED
+
+    def first_chars(self, x):
+        return {'"'} if x == -1 else None  # 본문은 거의 모든 문자
+
+
+def _emit(schema: Dict[str, Any], out: list) -> None:
+    if "enum" in schema:
+        out.append(_Choice([json.dumps(v, ensure_ascii=False) for v in schema["enum"]]))
+        return
+    t = schema.get("type")
+    if t == "object":
+        out.append(_Lit("{"))
+        for n, (key, sub) in enumerate(schema.get("properties", {}).items()):
+            out.append(_Lit((", " if n else "") + json.dumps(key, ensure_ascii=False) + ": "))
+            _emit(sub, out)
+        out.append(_Lit("}"))
+    elif t == "integer":
+        out.append(_Int(len(str(int(schema.get("maximum", 10**9))))))
+    elif t == "string":
+        out.append(_Str(int(schema.get("maxLength", 256))))
+    elif t == "boolean":
+        out.append(_Choice(["true", "false"]))
+    else:
+        raise ValueError(f"unsupported json schema node: {schema}")
+
+
+def compile_schema(schema: Dict[str, Any]) -> list:
+    segs: list = []
+    _emit(schema, segs)
+    merged: list = []
+    for s in segs:
+        if merged and isinstance(s, _Lit) and isinstance(merged[-1], _Lit):
+            merged[-1] = _Lit(merged[-1].text + s.text)
+        else:
+            merged.append(s)
+    return merged
+
+
+class TokenTable:
+    """토큰 id → 디코딩 문자열과 첫 글자 인덱스. 토크나이저마다 한 번 만든다."""
+
+    def __init__(self, tokenizer):
+        special = set(tokenizer.all_special_ids)
+        self.strings: List[Optional[str]] = []
+        self.by_first: Dict[str, List[int]] = {}
+        plain, quoted = [], []
+        for i in range(len(tokenizer)):
+            s = None if i in special else tokenizer.decode([i])
+            # 빈 토큰, 불완전한 UTF-8 바이트 조각(�)은 제약 구간에서 쓰지 않는다
+            if not s or "�" in s:
+                s = None
+            self.strings.append(s)
+            if s is None:
+                continue
+            self.by_first.setdefault(s[0], []).append(i)
+            if '"' in s or "\\" in s or any(c < " " for c in s):
+                quoted.append(i)
+            else:
+                plain.append(i)
+        self.plain = plain
+        self.quoted = quoted
+
+
+class JsonGrammar:
+    """컴파일된 스키마 + 상태별 허용 토큰 메모."""
+
+    def __init__(self, schema: Dict[str, Any], table: TokenTable):
+        self.segs = compile_schema(schema)
+        self.table = table
+        self.start = self._enter(0)
+        self._memo: Dict[Tuple, torch.Tensor] = {}
+
+    def _enter(self, i: int):
+        return (i, self.segs[i].init) if i < len(self.segs) else (i, None)
+
+    def done(self, state) -> bool:
+        return state[0] >= len(self.segs)
+
+    def step(self, state, ch: str):
+        i, x = state
+        if i >= len(self.segs):
+            return None
+        seg = self.segs[i]
+        nx = seg.step(x, ch)
+        if nx is not None:
+            return self._enter(i + 1) if seg.closed(nx) else (i, nx)
+        if seg.can_end(x):
+            return self.step(self._enter(i + 1), ch)
+        return None
+
+    def advance(self, state, text: Optional[str]):
+        if text is None:
+            return None
+        for ch in text:
+            state = self.step(state, ch)
+            if state is None:
+                return None
+        return state
+
+    def _first_chars(self, state):
+        i, x = state
+        if i >= len(self.segs):
+            return set()
+        seg = self.segs[i]
+        chars = seg.first_chars(x)
+        if chars is None:
+            return None
+        if seg.can_end(x):
+            nxt = self._first_chars(self._enter(i + 1))
+            return None if nxt is None else chars | nxt
+        return chars
+
+    def _memo_key(self, state):
+        i, x = state
+        if i < len(self.segs) and isinstance(self.segs[i], _Str) and isinstance(x, tuple):
+            return (i, "body", x[1], x[0] >= self.segs[i].max_len)
+        return state
+
+    def allowed(self, state, device) -> torch.Tensor:
+        key = (self._memo_key(state), str(device))
+        ids = self._memo.get(key)
+        if ids is not None:
+            return ids
+        t = self.table
+        chars = self._first_chars(state)
+        i, x = state
+        if chars is None:
+            seg = self.segs[i]
+            if x[1]:
+                cand, base = [tid for c in _ESCAPES for tid in t.by_first.get(c, [])], []
+            elif x[0] >= seg.max_len:
+                # 길이 상한 도달 → 닫는 따옴표로 시작하는 토큰만
+                cand, base = t.by_first.get('"', []), []
+            else:
+                cand, base = t.quoted, t.plain
+            ok = base + [tid for tid in cand if self.advance(state, t.strings[tid]) is not None]
+        else:
+            cand = [tid for c in chars for tid in t.by_first.get(c, [])]
+            ok = [tid for tid in cand if self.advance(state, t.strings[tid]) is not None]
+        ids = torch.tensor(ok, dtype=torch.long, device=device)
+        self._memo[key] = ids
+        return ids
+
+
+class JsonSchemaLogitsProcessor(LogitsProcessor):
+    """
+    행마다 (생성 토큰열, 상태열)을 기억해 두고, 호출마다 공통 접두부 이후만 다시 전진한다.
+    assisted decoding처럼 같은 길이를 여러 번/되돌아가며 호출해도 상태가 어긋나지 않는다.
+
+    grammar에 리스트를 주면 행마다 다른 스키마를 쓴다 (None인 행은 제약 없음, 혼합 배치용).
+    """
+
+    def __init__(self, grammar: JsonGrammar | List[Optional[JsonGrammar]], eos_token_id: int):
+        self.grammar = grammar
+        self.eos_token_id = eos_token_id
+        self.prompt_len: Optional[int] = None
+        self._grammars: List[Optional[JsonGrammar]] = []
+        self._hist: List[Tuple[List[int], List[Any]]] = []
+
+    def _state(self, row: int, generated: List[int]):
+        toks, states = self._hist[row]
+        n = 0
+        while n < len(toks) and n < len(generated) and toks[n] == generated[n]:
+            n += 1
+        del toks[n:], states[n + 1:]
+        g = self._grammars[row]
+        for tok in generated[n:]:
+            prev = states[-1]
+            nxt = prev if (prev is None or g.done(prev)) else g.advance(prev, g.table.strings[tok])
+            toks.append(tok)
+            states.append(nxt)
+        return states[-1]
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if self.prompt_len is None:
+            self.prompt_len = input_ids.shape[1]
+            n = input_ids.shape[0]
+            self._grammars = list(self.grammar) if isinstance(self.grammar, list) else [self.grammar] * n
+            self._hist = [([], [g.start if g else None]) for g in self._grammars]
+        mask = torch.full_like(scores, float("-inf"))
+        for row in range(input_ids.shape[0]):
+            g = self._grammars[row]
+            if g is None:
+                mask[row] = 0
+                continue
+            st = self._state(row, input_ids[row, self.prompt_len:].tolist())
+            if st is None or g.done(st):
+                mask[row, self.eos_token_id] = 0
+                continue
+            ids = g.allowed(st, scores.device)
+            if ids.numel() == 0:
+                mask[row, self.eos_token_id] = 0
+            else:
+                mask[row, ids] = 0
+        return scores + mask
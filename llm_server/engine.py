@@ -0,0 +1,513 @@
+from __future__ import annotations
+import copy
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List
+
+import torch
+from transformers import (
+    AutoTokenizer, AutoModelForCausalLM, DynamicCache, LogitsProcessor, LogitsProcessorList, StoppingCriteria,
+    StoppingCriteriaList, TextIteratorStreamer,
+)
+
+from llm_server.cancel import Cancelled, CancelToken
+from llm_server.config import settings
+from llm_server.prefix_cache import PrefixCache
+from llm_server.profiles import apply_profile, early_stop_at
+from llm_web import metrics
+
+log = logging.getLogger("llm_server")
+
+
+def truncate_at_stop(text: str, stop: Iterable[str] | None) -> str:
+    """생성 결과를 가장 먼저 나온 stop 문자열 앞에서 자른다."""
+    cut = len(text)
+    for s in stop or ():
+        if not s:
+            continue
+        i = text.find(s)
+        if i != -1:
+            cut = min(cut, i)
+    return text[:cut]
+
+
+def stream_until_stop(pieces: Iterable[str], stop: List[str] | None) -> Iterator[str]:
+    """
+    스트리밍 조각을 흘려보내되 stop 문자열이 나오면 그 앞에서 끊는다.
+    stop이 조각 경계에 걸칠 수 있으므로 (가장 긴 stop 길이 - 1)자만큼은 잡아 둔다.
+    """
+    stop = [s for s in stop or [] if s]
+    hold = max((len(s) for s in stop), default=1) - 1
+    buf = ""
+    for piece in pieces:
+        buf += piece
+        cut = truncate_at_stop(buf, stop)
+        if len(cut) < len(buf):
+            if cut:
+                yield cut
+            return
+        if len(buf) > hold:
+            out, buf = buf[:len(buf) - hold], buf[len(buf) - hold:]
+            yield out
+    if buf:
+        yield buf
+
+
+class StopOnStrings(StoppingCriteria):
+    """배치의 모든 행이 stop 문자열을 만나면 디코딩을 멈춘다."""
+
+    def __init__(self, tokenizer, stop: List[str], prompt_len: int):
+        self.tokenizer = tokenizer
+        self.stop = [s for s in stop if s]
+        self.prompt_len = prompt_len
+        # stop 문자열이 걸쳐 있을 수 있는 꼬리 토큰 수만 디코딩한다
+        self.window = max((len(s) for s in self.stop), default=0) + 8
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        if not self.stop:
+            return False
+        tails = self.tokenizer.batch_decode(input_ids[:, self.prompt_len:][:, -self.window:], skip_special_tokens=True)
+        return all(any(s in t for s in self.stop) for t in tails)
+
+
+class EarlyStop(StoppingCriteria):
+    """배치의 모든 행이 프로필의 조기 종료 기준(JSON 닫힘, 첫 줄 끝)을 만족하면 멈춘다."""
+
+    def __init__(self, tokenizer, mode: str, prompt_len: int):
+        self.tokenizer = tokenizer
+        self.mode = mode
+        self.prompt_len = prompt_len
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        texts = self.tokenizer.batch_decode(input_ids[:, self.prompt_len:], skip_special_tokens=True)
+        return all(early_stop_at(t, self.mode) != -1 for t in texts)
+
+
+class StopOnCancel(StoppingCriteria):
+    """취소 토큰이 켜지면 다음 스텝에서 디코딩을 끊는다 (요청 취소 시 진행 중 생성 중단)."""
+
+    def __init__(self, token):
+        self.token = token
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.token.cancelled
+
+
+class RowFinish(LogitsProcessor):
+    """
+    혼합 배치용: 행마다 다른 토큰 예산/stop/조기 종료 기준을 만나면 그 행에만 EOS를 강제한다.
+    EOS를 낸 행은 generate가 끝난 행으로 보고 패딩만 채우므로, 배치는 가장 긴 행 기준으로 끝난다.
+    """
+
+    def __init__(self, tokenizer, rows: List[Dict[str, Any]], eos_token_id: int):
+        self.tokenizer = tokenizer
+        self.rows = rows  # [{"max_new_tokens", "stop", "early_stop", "cancel"}]
+        self.eos_token_id = eos_token_id
+        self.prompt_len: int | None = None
+
+    def _done(self, row: Dict[str, Any], ids) -> bool:
+        if len(ids) >= row["max_new_tokens"] or (row["cancel"] is not None and row["cancel"].cancelled):
+            return True
+        if not (row["stop"] or row["early_stop"]) or not len(ids):
+            return False
+        text = self.tokenizer.decode(ids, skip_special_tokens=True)
+        if any(s in text for s in row["stop"]):
+            return True
+        return bool(row["early_stop"]) and early_stop_at(text, row["early_stop"]) != -1
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if self.prompt_len is None:
+            self.prompt_len = input_ids.shape[1]
+        for i, row in enumerate(self.rows):
+            if self._done(row, input_ids[i, self.prompt_len:].tolist()):
+                scores[i] = float("-inf")
+                scores[i, self.eos_token_id] = 0
+        return scores
+
+
+def _finish(text: str, stop: List[str], early_stop: str | None) -> str:
+    text = truncate_at_stop(text, stop)
+    end = early_stop_at(text, early_stop)
+    return text[:end] if end != -1 else text
+
+
+class GenerationEngine:
+    """
+    토크나이저 + 모델 한 벌. 프로세스마다 한 번만 만들고 공유한다.
+    (워커 안에서 직접 쓰거나, llm_server 프로세스가 들고 HTTP로 서비스)
+    """
+
+    def __init__(self, name: str, tokenizer, model, draft_model=None, **defaults: Any):
+        self.name = name
+        self.tokenizer = tokenizer
+        self.model = model
+        self.defaults = defaults
+        self._lock = threading.Lock()
+
+        # assisted(speculative) decoding: 같은 토크나이저를 쓰는 작은 초안 모델
+        self.draft_model = draft_model
+        if draft_model is not None:
+            from llm_server.speculative import ForwardCounter, SpeculativeStats
+            self._target_fwd = ForwardCounter(model)
+            self._draft_fwd = ForwardCounter(draft_model)
+            self.spec_stats = SpeculativeStats(name)
+        self.prefix_cache = (
+            PrefixCache(name, int(settings.prefix_cache_mb * 1024 * 1024)) if settings.prefix_cache_mb > 0 else None
+        )
+
+        # json_schema 제약 디코딩: 토큰 테이블은 처음 쓸 때 한 번, 문법은 스키마별로 캐시
+        self._token_table = None
+        self._grammars: Dict[str, Any] = {}
+        self._constrained = metrics.counter(f"llm.{name}.constrained_json")
+        self._prefix_split_mismatch = metrics.counter(f"llm.{name}.prefix_cache.split_mismatch")
+
+    def render(self, messages: List[Dict[str, str]]) -> str:
+        return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+
+    def chat_prompt(self, messages: List[Dict[str, str]], prefix_messages: int = 0) -> tuple[str, str | None]:
+        """
+        (전체 프롬프트, 캐시할 접두부). 앞쪽 prefix_messages개 메시지(정적 system 등)를
+        템플릿에 입힌 문자열이 전체 프롬프트의 접두부일 때만 접두부로 쓴다.
+        """
+        prompt = self.render(messages)
+        if prefix_messages <= 0:
+            return prompt, None
+        prefix = self.tokenizer.apply_chat_template(
+            messages[:prefix_messages], tokenize=False, add_generation_prompt=False
+        )
+        return prompt, (prefix if prompt.startswith(prefix) and len(prefix) < len(prompt) else None)
+
+    def _gen_kwargs(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        p = {**self.defaults, **{k: v for k, v in params.items() if v is not None}}
+        kw = {
+            "max_new_tokens": int(p.get("max_new_tokens", 256)),
+            "do_sample": bool(p.get("do_sample", False)),
+            "pad_token_id": self.tokenizer.pad_token_id,
+        }
+        if kw["do_sample"]:
+            kw["temperature"] = float(p.get("temperature", 1.0))
+            kw["top_p"] = float(p.get("top_p", 1.0))
+        return kw
+
+    def _eos_id(self) -> int:
+        eos = self.model.generation_config.eos_token_id
+        if isinstance(eos, (list, tuple)):
+            eos = eos[0]
+        return self.tokenizer.eos_token_id if eos is None else eos
+
+    def _grammar(self, schema: Dict[str, Any]):
+        """엔진 락 안에서 호출. 토큰 테이블은 한 번, 문법은 스키마별로 캐시."""
+        from llm_server.constrained import JsonGrammar, TokenTable
+        if self._token_table is None:
+            self._token_table = TokenTable(self.tokenizer)
+        key = json.dumps(schema, sort_keys=True)
+        grammar = self._grammars.get(key)
+        if grammar is None:
+            grammar = self._grammars[key] = JsonGrammar(schema, self._token_table)
+        self._constrained.inc()
+        return grammar
+
+    def _json_processor(self, schema: Dict[str, Any]):
+        """스키마를 만족하는 토큰만 남기고 닫는 '}' 뒤엔 EOS를 강제한다."""
+        from llm_server.constrained import JsonSchemaLogitsProcessor
+        return JsonSchemaLogitsProcessor(self._grammar(schema), self._eos_id())
+
+    def count_tokens(self, texts: List[str]) -> List[int | None]:
+        """트레이싱용 토큰 수 (특수 토큰 제외). 생성 중인 토크나이저와 충돌하면 None."""
+        try:
+            return [len(ids) for ids in self.tokenizer(texts, add_special_tokens=False)["input_ids"]]
+        except RuntimeError:  # fast tokenizer "Already borrowed" (다른 스레드가 패딩 설정 중)
+            return [None] * len(texts)
+
+    def _add_special(self, prompts: List[str]) -> bool:
+        # chat template 결과에는 이미 BOS가 들어 있으므로 중복으로 붙이지 않는다
+        bos = self.tokenizer.bos_token
+        return not (bos and all(p.startswith(bos) for p in prompts))
+
+    def _encode(self, prompts: List[str]):
+        enc = self.tokenizer(prompts, return_tensors="pt", padding=True, add_special_tokens=self._add_special(prompts))
+        return enc.to(self.model.device)
+
+    def _splits_cleanly(self, prompts: List[str], prefix: str) -> bool:
+        """접두부와 접미부를 따로 토큰화해 이어 붙인 것이 프롬프트 전체 토큰화와 같은지 (엔진 락 안에서 호출)."""
+        tok, add_special = self.tokenizer, self._add_special([prefix])
+        head = tok(prefix, add_special_tokens=add_special)["input_ids"]
+        return all(
+            tok(p, add_special_tokens=add_special)["input_ids"] == head + tok(p[len(prefix):], add_special_tokens=False)["input_ids"]
+            for p in prompts
+        )
+
+    def _prefix_kv(self, prefix: str):
+        """접두부 KV를 캐시에서 꺼내거나, 없으면 한 번 prefill 해서 캐시에 넣는다."""
+        hit = self.prefix_cache.get(prefix)
+        if hit is not None:
+            return hit
+        ids = self._encode([prefix])["input_ids"]
+        kv = DynamicCache()
+        self.model(input_ids=ids, past_key_values=kv, use_cache=True)
+        self.prefix_cache.put(prefix, ids, kv)
+        return ids, copy.deepcopy(kv)
+
+    def _encode_with_prefix(self, prompts: List[str], prefix: str):
+        """
+        [접두부 | 왼쪽 패딩된 접미부] 형태로 입력을 만들고, 접두부 KV를 배치 크기만큼 복제한다.
+        패딩이 가운데 끼지만 generate가 attention_mask 누적합으로 position id를 잡고(접미부는 접두부 길이부터 이어짐)
+        패딩 칸은 키에서 가려지므로 캐시 없이 돌린 것과 같은 greedy 결과가 나온다 (llm_server.tests.PrefixKvEquivalenceTests).
+        접두부 경계에서 토큰이 나뉘어야 하므로 chat_prompt처럼 메시지 경계(특수 토큰)로 자른 접두부만 쓴다.
+        경계가 토큰 중간에 걸리면(원문 프롬프트의 개행 병합, sentencepiece "▁" 등) 캐시 없이 전체를 토큰화한다.
+        """
+        if not self._splits_cleanly(prompts, prefix):
+            self._prefix_split_mismatch.inc()
+            return self._encode(prompts)
+        prefix_ids, kv = self._prefix_kv(prefix)
+        suffix = self.tokenizer(
+            [p[len(prefix):] for p in prompts], return_tensors="pt", padding=True, add_special_tokens=False
+        ).to(self.model.device)
+        n = len(prompts)
+        if n > 1:
+            kv.batch_repeat_interleave(n)
+        input_ids = torch.cat([prefix_ids.expand(n, -1), suffix["input_ids"]], dim=1)
+        attention_mask = torch.cat([torch.ones_like(prefix_ids).expand(n, -1), suffix["attention_mask"]], dim=1)
+        return {"input_ids": input_ids, "attention_mask": attention_mask, "past_key_values": kv}
+
+    def _criteria(self, stop: List[str], early_stop: str | None, prompt_len: int, cancel=None) -> Dict[str, Any]:
+        criteria = []
+        if cancel is not None:
+            criteria.append(StopOnCancel(cancel))
+        if stop:
+            criteria.append(StopOnStrings(self.tokenizer, stop, prompt_len))
+        if early_stop:
+            criteria.append(EarlyStop(self.tokenizer, early_stop, prompt_len))
+        return {"stopping_criteria": StoppingCriteriaList(criteria)} if criteria else {}
+
+    @staticmethod
+    def _usage_rows(enc, new_tokens: List[int]) -> List[Dict[str, int]]:
+        """행별 실제 토큰 수 (프롬프트는 패딩을 빼고 챗 템플릿/접두부 KV 구간을 포함)."""
+        prompt_tokens = enc["attention_mask"].sum(dim=1).tolist()
+        return [{"prompt_tokens": p, "completion_tokens": n} for p, n in zip(prompt_tokens, new_tokens)]
+
+    def _record_profile(self, profile: str | None, new_tokens: List[int], seconds: float) -> None:
+        if not profile:
+            return
+        metrics.counter(f"llm.profile.{profile}.calls").inc()
+        metrics.counter(f"llm.profile.{profile}.decode_tokens").inc(sum(new_tokens))
+        metrics.summary(f"llm.profile.{profile}.gen_ms").observe(seconds * 1000.0)
+        summary = metrics.summary(f"llm.profile.{profile}.new_tokens")
+        for n in new_tokens:
+            summary.observe(n)
+
+    def complete(self, prompts: List[str], **params: Any) -> List[str]:
+        """
+        프롬프트 배치를 생성하고, 프롬프트를 뺀 새 텍스트만 돌려준다.
+        params["usage"]에 리스트를 주면 행별 토큰 수({"prompt_tokens", "completion_tokens"})를 덧붙인다.
+        """
+        profile, params = apply_profile(params)
+        usage = params.pop("usage", None)
+        stop = list(params.pop("stop", None) or [])
+        early_stop = params.pop("early_stop", None)
+        prefix = params.pop("prefix", None)
+        schema = params.pop("json_schema", None)
+        cancel = params.pop("cancel", None)
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        # assisted=False로 호출별로 초안 모델을 끌 수 있다 (A/B 비교용)
+        assisted = params.pop("assisted", True)
+        kw = self._gen_kwargs(params)
+        # assisted generation은 배치 1만 지원하고, 외부에서 넣은 접두부 KV와는 같이 쓰지 않는다
+        speculative = assisted and self.draft_model is not None and len(prompts) == 1
+        if speculative:
+            kw["assistant_model"] = self.draft_model
+        use_prefix = bool(
+            not speculative and self.prefix_cache and prefix
+            and all(p.startswith(prefix) and len(p) > len(prefix) for p in prompts)
+        )
+        with self._lock, torch.inference_mode():
+            enc = self._encode_with_prefix(prompts, prefix) if use_prefix else self._encode(prompts)
+            prompt_len = enc["input_ids"].shape[1]
+            kw.update(self._criteria(stop, early_stop, prompt_len, cancel))
+            if schema:
+                kw["logits_processor"] = LogitsProcessorList([self._json_processor(schema)])
+            t_fwd, d_fwd = (self._target_fwd.calls, self._draft_fwd.calls) if self.draft_model is not None else (0, 0)
+            t0 = time.perf_counter()
+            out = self.model.generate(**enc, **kw)
+            seconds = time.perf_counter() - t0
+            new_tokens = (out[:, prompt_len:] != self.tokenizer.pad_token_id).sum(dim=1).tolist()
+            rows = self._usage_rows(enc, new_tokens)
+            if self.draft_model is not None:
+                self.spec_stats.record(
+                    speculative=speculative,
+                    new_tokens=int(sum(new_tokens)),
+                    seconds=seconds,
+                    target_forwards=self._target_fwd.calls - t_fwd,
+                    draft_forwards=self._draft_fwd.calls - d_fwd,
+                )
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        if usage is not None:
+            usage.extend(rows)
+        self._record_profile(profile, new_tokens, seconds)
+        texts = self.tokenizer.batch_decode(out[:, prompt_len:], skip_special_tokens=True)
+        return [_finish(t, stop, early_stop) for t in texts]
+
+    def complete_mixed(self, prompts: List[str], row_params: List[Dict[str, Any]]) -> List[str]:
+        """
+        행마다 프로필/json_schema/토큰 예산/stop이 다른 프롬프트들을 generate 한 번으로 처리한다.
+        샘플링 등 공통 파라미터는 첫 행 기준이며 (배치 키가 같으므로 모두 동일), 행별 종료는 RowFinish가 맡는다.
+        취소된 행은 EOS로 끝내고 텍스트를 그대로 돌려준다 (Cancelled 전달은 BatchScheduler 몫).
+        행의 params["usage"] 리스트에는 그 행의 토큰 수를 덧붙인다.
+        """
+        rows, schemas, profiles = [], [], []
+        for params in row_params:
+            profile, rest = apply_profile(dict(params))
+            rest.pop("assisted", None)
+            budget = self._gen_kwargs(rest)["max_new_tokens"]
+            rows.append({
+                "max_new_tokens": budget,
+                "stop": [s for s in rest.pop("stop", None) or [] if s],
+                "early_stop": rest.pop("early_stop", None),
+                "prefix": rest.pop("prefix", None),
+                "cancel": rest.pop("cancel", None),
+                "usage": rest.pop("usage", None),
+            })
+            schemas.append(rest.pop("json_schema", None))
+            profiles.append(profile)
+        shared = {k: v for k, v in rest.items() if k != "max_new_tokens"}
+        kw = self._gen_kwargs({**shared, "max_new_tokens": max(r["max_new_tokens"] for r in rows)})
+        prefix = rows[0]["prefix"]
+        use_prefix = bool(
+            self.prefix_cache and prefix and all(r["prefix"] == prefix for r in rows)
+            and all(p.startswith(prefix) and len(p) > len(prefix) for p in prompts)
+        )
+        with self._lock, torch.inference_mode():
+            enc = self._encode_with_prefix(prompts, prefix) if use_prefix else self._encode(prompts)
+            prompt_len = enc["input_ids"].shape[1]
+            eos = self._eos_id()
+            processors = []
+            if any(schemas):
+                from llm_server.constrained import JsonSchemaLogitsProcessor
+                grammars = [self._grammar(s) if s else None for s in schemas]
+                processors.append(JsonSchemaLogitsProcessor(grammars, eos))
+            processors.append(RowFinish(self.tokenizer, rows, eos))
+            t0 = time.perf_counter()
+            out = self.model.generate(**enc, **kw, logits_processor=LogitsProcessorList(processors))
+            seconds = time.perf_counter() - t0
+            new_tokens = (out[:, prompt_len:] != self.tokenizer.pad_token_id).sum(dim=1).tolist()
+            usage_rows = self._usage_rows(enc, new_tokens)
+        for profile, n in zip(profiles, new_tokens):
+            self._record_profile(profile, [n], seconds)
+        for row, u in zip(rows, usage_rows):
+            if row["usage"] is not None:
+                row["usage"].append(u)
+        texts = self.tokenizer.batch_decode(out[:, prompt_len:], skip_special_tokens=True)
+        return [_finish(t, r["stop"], r["early_stop"]) for t, r in zip(texts, rows)]
+
+    def chat(self, messages: List[Dict[str, str]], **params: Any) -> str:
+        prompt, prefix = self.chat_prompt(messages, params.pop("prefix_messages", 0))
+        return self.complete([prompt], prefix=prefix, **params)[0]
+
+    def stream(self, prompt: str, **params: Any) -> Iterator[str]:
+        """
+        TextIteratorStreamer로 토큰이 디코딩되는 대로 텍스트 조각을 내보낸다.
+        params["usage"] 리스트의 토큰 수는 스트림을 끝까지 읽거나 닫은 뒤에 채워져 있다.
+        """
+        profile, params = apply_profile(params)
+        usage = params.pop("usage", None)
+        stop = list(params.pop("stop", None) or [])
+        early_stop = params.pop("early_stop", None)
+        prefix = params.pop("prefix", None)
+        schema = params.pop("json_schema", None)
+        cancel = params.pop("cancel", None)
+        kw = self._gen_kwargs(params)
+        use_prefix = bool(self.prefix_cache and prefix and prompt.startswith(prefix) and len(prompt) > len(prefix))
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors: List[BaseException] = []
+        # 소비자가 제너레이터를 닫거나(연결 끊김, stop 문자열) 호출자가 취소하면 디코딩을 끊는다
+        closed = CancelToken()
+        if cancel is not None:
+            cancel.on_cancel(closed.cancel)
+
+        def _run():
+            try:
+                with self._lock, torch.inference_mode():
+                    enc = self._encode_with_prefix([prompt], prefix) if use_prefix else self._encode([prompt])
+                    prompt_len = enc["input_ids"].shape[1]
+                    kw.update(self._criteria(stop, early_stop, prompt_len, closed))
+                    if schema:
+                        kw["logits_processor"] = LogitsProcessorList([self._json_processor(schema)])
+                    t0 = time.perf_counter()
+                    out = self.model.generate(**enc, **kw, streamer=streamer)
+                    new_tokens = (out[:, prompt_len:] != self.tokenizer.pad_token_id).sum(dim=1).tolist()
+                    self._record_profile(profile, new_tokens, time.perf_counter() - t0)
+                    if usage is not None:
+                        usage.extend(self._usage_rows(enc, new_tokens))
+            except BaseException as e:  # 스트리머가 영원히 기다리지 않도록 종료 신호
+                errors.append(e)
+                streamer.end()
+
+        worker = threading.Thread(target=_run, name=f"stream-{self.name}", daemon=True)
+        worker.start()
+        try:
+            yield from stream_until_stop(streamer, stop)
+        finally:
+            # 다 읽었으면 이미 끝난 스레드, 중간에 닫혔으면 다음 스텝에서 멈춘다 (락을 쥔 채 계속 디코딩하지 않도록)
+            closed.cancel()
+            worker.join()
+        if errors:
+            raise errors[0]
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+
+    def stream_chat(self, messages: List[Dict[str, str]], **params: Any) -> Iterator[str]:
+        prompt, prefix = self.chat_prompt(messages, params.pop("prefix_messages", 0))
+        return self.stream(prompt, prefix=prefix, **params)
+
+
+def _load_model(model_id: str, device_map: str, torch_dtype: Any, trust_remote_code: bool):
+    if settings.backend == "cpu":
+        from llm_server.cpu import optimize_for_cpu
+        mdl = AutoModelForCausalLM.from_pretrained(
+            model_id, torch_dtype=torch.float32, low_cpu_mem_usage=True, trust_remote_code=trust_remote_code,
+        )
+        mdl.eval()
+        return optimize_for_cpu(mdl, int8=settings.cpu_int8, compile=settings.cpu_compile)
+    mdl = AutoModelForCausalLM.from_pretrained(
+        model_id,
+        torch_dtype=torch_dtype,
+        device_map={"": device_map},  # "auto" or specific device
+        trust_remote_code=trust_remote_code,
+    )
+    mdl.eval()
+    return mdl
+
+
+def load_engine(
+    name: str,
+    model_id: str,
+    device_map: str,
+    *,
+    torch_dtype: Any = "auto",
+    trust_remote_code: bool = False,
+    draft_model_id: str | None = None,
+    **defaults: Any,
+) -> GenerationEngine:
+    """
+    settings.backend == "cpu"면 device/dtype 인자를 무시하고 fp32로 CPU에 올린 뒤
+    int8 동적 양자화/스레드 튜닝/torch.compile(선택)을 적용한다.
+    draft_model_id를 주면 같은 장치에 초안 모델을 올려 assisted decoding을 쓴다.
+    """
+    tok = AutoTokenizer.from_pretrained(model_id, use_fast=True, trust_remote_code=trust_remote_code)
+    if tok.pad_token_id is None:
+        tok.pad_token_id = tok.eos_token_id
+    tok.padding_side = "left"  # decoder-only 배치 생성은 왼쪽 패딩
+
+    if settings.backend == "cpu":
+        from llm_server.cpu import configure_threads
+        threads = configure_threads(settings.cpu_threads)
+        log.info("'%s' on CPU backend (threads=%d, int8=%s, compile=%s)",
+                 name, threads, settings.cpu_int8, settings.cpu_compile)
+
+    mdl = _load_model(model_id, device_map, torch_dtype, trust_remote_code)
+    draft = _load_model(draft_model_id, device_map, torch_dtype, trust_remote_code) if draft_model_id else None
+    return GenerationEngine(name, tok, mdl, draft_model=draft, **defaults)
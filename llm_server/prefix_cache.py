@@ -0,0 +1,64 @@
+from __future__ import annotations
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Tuple
+
+from llm_web import metrics
+
+
+def cache_nbytes(kv: Any) -> int:
+    """DynamicCache가 차지하는 텐서 바이트 수 (transformers 버전별 내부 구조 모두 지원)."""
+    layers = getattr(kv, "layers", None)
+    if layers is not None:
+        tensors = [t for layer in layers for t in (layer.keys, layer.values) if t is not None]
+    else:
+        tensors = list(getattr(kv, "key_cache", [])) + list(getattr(kv, "value_cache", []))
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class PrefixCache:
+    """
+    정적 프롬프트 접두부(system prompt, 리포트 예시 등)의 past_key_values를 보관하는 LRU.
+    키는 접두부 원문, 값은 (접두부 input_ids, KV 캐시). 전체 KV 바이트가 max_bytes를 넘으면
+    가장 오래 안 쓴 항목부터 버린다.
+    """
+
+    def __init__(self, name: str, max_bytes: int):
+        self.max_bytes = int(max_bytes)
+        self._entries: OrderedDict[str, Tuple[Any, Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        self.hits = metrics.counter(f"llm.{name}.prefix_cache.hits")
+        self.misses = metrics.counter(f"llm.{name}.prefix_cache.misses")
+        self.evictions = metrics.counter(f"llm.{name}.prefix_cache.evictions")
+        self.size_bytes = metrics.gauge(f"llm.{name}.prefix_cache.bytes")
+
+    def get(self, prefix: str):
+        """(input_ids, KV 사본) 또는 None. generate가 캐시를 늘려 쓰므로 항상 사본을 준다."""
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is None:
+                self.misses.inc()
+                return None
+            self._entries.move_to_end(prefix)
+            self.hits.inc()
+        ids, kv, _ = entry
+        return ids, copy.deepcopy(kv)
+
+    def put(self, prefix: str, ids: Any, kv: Any) -> None:
+        nbytes = cache_nbytes(kv)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(prefix, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[prefix] = (ids, kv, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, _, n) = self._entries.popitem(last=False)
+                self._bytes -= n
+                self.evictions.inc()
+            self.size_bytes.set(self._bytes)
@@ -0,0 +1,93 @@
+"""
+노드별 생성 프로필 (토큰 예산 / stop 문자열 / 조기 종료 기준).
+
+호출 측은 `llm.bind(profile="route_json")` 또는 `engine.complete(..., profile="report")`로 고르고,
+엔진이 프로필 값을 기본값으로 깔고 호출 파라미터를 위에 덮는다. 프로필별 생성 토큰 수/시간은
+llm.profile.<name>.* 메트릭으로 남는다.
+
+early_stop:
+  "json"  첫 JSON 객체의 닫는 '}'가 나오면 종료 (제약 디코딩을 끈 경우의 안전장치)
+  "line"  내용이 있는 첫 줄이 끝나면 종료
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from llm_server.config import settings
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    name: str
+    max_new_tokens: int
+    stop: Tuple[str, ...] = field(default_factory=tuple)
+    early_stop: Optional[str] = None
+
+
+_SQL_STOPS = ("\n\n", "/*", "SCHEMA (STRICT):", "CREATE TABLE", "System:", "Human:", "AI:", "Tool:", "```")
+
+PROFILES: Dict[str, GenerationProfile] = {p.name: p for p in (
+    GenerationProfile("intent", 16, early_stop="json"),
+    GenerationProfile("route_json", 64, early_stop="json"),
+    # 키/값 ~45토큰 + notes(최대 20자, 한글은 글자당 1~3토큰)
+    GenerationProfile("status_json", 160, early_stop="json"),
+    GenerationProfile("table_select", 32, early_stop="line"),
+    GenerationProfile("sql_gen", 256, stop=_SQL_STOPS),
+    GenerationProfile("sql_check", 320, early_stop="json"),
+    GenerationProfile("sql_repair", 320, early_stop="json"),
+    GenerationProfile("narrate", 160, stop=("\n\n",)),
+    GenerationProfile("report", settings.report_max_new_tokens),
+)}
+
+
+def apply_profile(params: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any]]:
+    """params에서 profile을 꺼내 프로필 값을 기본값으로 합친다. (프로필 이름, 합친 params)"""
+    name = params.pop("profile", None)
+    if not name:
+        return None, params
+    prof = PROFILES.get(name)
+    if prof is None:
+        raise ValueError(f"unknown generation profile: {name}")
+    merged = {"max_new_tokens": prof.max_new_tokens, **{k: v for k, v in params.items() if v is not None}}
+    extra = [s for s in (params.get("stop") or []) if s not in prof.stop]
+    merged["stop"] = list(prof.stop) + extra
+    if prof.early_stop:
+        merged.setdefault("early_stop", prof.early_stop)
+    return name, merged
+
+
+def _json_end(text: str) -> int:
+    """첫 JSON 객체가 닫히는 위치(+1), 아직 안 닫혔으면 -1. 문자열 안의 괄호는 무시."""
+    depth, in_str, esc = 0, False, False
+    for i, ch in enumerate(text):
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = depth > 0
+        elif ch == "{":
+            depth += 1
+        elif ch == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return -1
+
+
+def _line_end(text: str) -> int:
+    start = len(text) - len(text.lstrip())
+    i = text.find("\n", start)
+    return i if i != -1 and text[start:i].strip() else -1
+
+
+def early_stop_at(text: str, mode: Optional[str]) -> int:
+    """조기 종료 지점 (없으면 -1)."""
+    if mode == "json":
+        return _json_end(text)
+    if mode == "line":
+        return _line_end(text)
+    return -1
@@ -0,0 +1,141 @@
+"""
+결정적(greedy) 생성 결과 캐시: 프로세스 내 LRU + 선택적 sqlite 디스크 계층.
+
+키는 (모델 id, 프롬프트, 생성 파라미터)의 sha256. 샘플링(do_sample) 호출은 캐시하지 않는다.
+디스크 계층은 여러 워커가 같은 파일을 공유할 수 있고(WAL), TTL이 지난 항목은 읽을 때 버리며
+전체 크기가 max_bytes를 넘으면 가장 오래 안 읽힌 항목부터 지운다.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from llm_web import metrics
+
+# 출력에 영향을 주지 않는 파라미터 (키에서 제외)
+_IGNORED_PARAMS = {"prefix_messages", "prefix", "cancel"}
+
+
+def cacheable(params: Dict[str, Any]) -> bool:
+    return not params.get("do_sample")
+
+
+def make_key(model: str, prompt: Any, params: Dict[str, Any]) -> str:
+    p = {k: v for k, v in params.items() if k not in _IGNORED_PARAMS}
+    raw = json.dumps([model, prompt, p], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    def __init__(self, path: str, ttl_s: float, max_bytes: int):
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL,"
+            " nbytes INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_s > 0 and row[1] < now - self.ttl_s:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        nbytes = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses(key, value, created, accessed, nbytes) VALUES (?, ?, ?, ?, ?)",
+                (key, value, now, now, nbytes),
+            )
+            if self.ttl_s > 0:
+                self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_s,))
+            total = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM responses").fetchone()[0]
+            if 0 < self.max_bytes < total:  # ttl_s와 같이 0이면 제한 없음
+                # 오래 안 읽힌 순서로 초과분만큼 삭제
+                cut, freed = None, 0
+                for accessed, n in self._conn.execute("SELECT accessed, nbytes FROM responses ORDER BY accessed"):
+                    freed += n
+                    cut = accessed
+                    if total - freed <= self.max_bytes:
+                        break
+                if cut is not None:
+                    self._conn.execute("DELETE FROM responses WHERE accessed <= ?", (cut,))
+            self._conn.commit()
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    def __init__(self, name: str, max_entries: int, path: str = "", ttl_s: float = 0.0, max_bytes: int = 0):
+        self.max_entries = max(0, int(max_entries))
+        self._mem: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(path, ttl_s, max_bytes) if path else None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        metrics.register(f"llm.{name}.response_cache", self)
+
+    def _remember(self, key: str, value: str) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._mem[key] = value
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._mem.get(key)
+            if value is not None:
+                self._mem.move_to_end(key)
+                self.hits_memory += 1
+                return value
+        value = self._disk.get(key) if self._disk else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits_disk += 1
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        self._remember(key, value)
+        if self._disk:
+            self._disk.put(key, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        hits = self.hits_memory + self.hits_disk
+        total = hits + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": (hits / total) if total else None,
+            "entries": len(self._mem),
+            "disk_bytes": self._disk.nbytes() if self._disk else None,
+        }
@@ -0,0 +1,132 @@
+from __future__ import annotations
+import importlib
+import json
+import logging
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict
+
+from llm_server import cancel
+from llm_server.batching import with_batching
+from llm_server.config import settings
+from llm_web import metrics
+
+log = logging.getLogger("llm_server")
+
+# 모델 이름 → 로더 ("module:function"). 로더는 GenerationEngine을 반환한다.
+MODEL_LOADERS: Dict[str, str] = {
+    "chat": "dbchat.app.core.llm:load_chat_engine",
+    "report": "report.ai_service:load_report_engine",
+}
+
+ENGINES: Dict[str, Any] = {}
+
+
+def _resolve(spec: str) -> Callable[[], Any]:
+    mod, fn = spec.split(":")
+    return getattr(importlib.import_module(mod), fn)
+
+
+def load_models(names) -> None:
+    for name in names:
+        if name in ENGINES:
+            continue
+        log.info("loading model '%s' ...", name)
+        engine = _resolve(MODEL_LOADERS[name])()
+        ENGINES[name] = with_batching(engine, settings.batch_max_size, settings.batch_max_wait_ms)
+        log.info("model '%s' ready", name)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        log.debug("%s - %s", self.address_string(), fmt % args)
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n).decode("utf-8") or "{}")
+
+    def _send_stream(self, pieces) -> None:
+        """chunked transfer-encoding으로 텍스트 조각을 생성되는 대로 보낸다."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for piece in pieces:
+                data = piece.encode("utf-8")
+                if data:
+                    self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+        except Exception as e:  # 헤더를 이미 보냈으므로 로그만 남기고 스트림을 닫는다
+            log.error("stream failed: %s\n%s", e, traceback.format_exc())
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self._send_json(200, {"status": "ok", "models": sorted(ENGINES)})
+        if self.path == "/v1/stats":
+            return self._send_json(200, metrics.snapshot())
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            body = self._read_json()
+        except Exception:
+            return self._send_json(400, {"error": "invalid json"})
+
+        if self.path == "/v1/cancel":
+            cancel.cancel_remote(str(body.get("cancel_id") or ""))
+            return self._send_json(200, {"ok": True})
+
+        engine = ENGINES.get(body.get("model"))
+        if engine is None:
+            return self._send_json(404, {"error": f"unknown model: {body.get('model')}"})
+        params = body.get("params") or {}
+        cancel_id = params.pop("cancel_id", None)
+        if cancel_id:
+            params["cancel"] = cancel.remote_token(cancel_id)
+        # 엔진이 생성하면서 센 행별 토큰 수 (complete/chat 응답에 싣는다)
+        params["usage"] = usage = []
+
+        try:
+            if self.path == "/v1/complete":
+                texts = engine.complete(body["prompts"], **params)
+                return self._send_json(200, {"texts": texts, "usage": usage})
+            if self.path == "/v1/tokens":
+                return self._send_json(200, {"counts": engine.count_tokens(body["texts"])})
+            if self.path == "/v1/chat":
+                text = engine.chat(body["messages"], **params)
+                return self._send_json(200, {"text": text, "usage": usage})
+            if self.path == "/v1/stream":
+                if "messages" in body:
+                    return self._send_stream(engine.stream_chat(body["messages"], **params))
+                return self._send_stream(engine.stream(body["prompt"], **params))
+        except cancel.Cancelled as e:
+            return self._send_json(409, {"error": str(e)})
+        except Exception as e:
+            log.error("generation failed: %s\n%s", e, traceback.format_exc())
+            return self._send_json(500, {"error": str(e)})
+        finally:
+            if cancel_id:
+                cancel.release_remote(cancel_id)
+        self._send_json(404, {"error": "not found"})
+
+
+def serve(host: str, port: int) -> None:
+    httpd = ThreadingHTTPServer((host, port), _Handler)
+    httpd.daemon_threads = True
+    log.info("model server listening on http://%s:%d (models: %s)", host, port, ", ".join(sorted(ENGINES)))
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
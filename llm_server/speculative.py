@@ -0,0 +1,57 @@
+"""
+assisted(speculative) decoding 통계.
+
+HF generate는 초안 토큰 수락 개수를 밖으로 내주지 않으므로 forward 호출 수로 역산한다.
+  - 타깃 모델 forward 1회 = 검증 1회 → 수락된 초안 토큰 + 보정/보너스 토큰 1개를 만든다
+  - 초안 모델 forward 1회 = 후보 토큰 1개 제안
+  → accepted = new_tokens - target_forwards,  acceptance_rate = accepted / draft_forwards
+speedup은 같은 엔진에서 초안 없이 생성한 tokens/s 평균 대비 비율.
+"""
+from __future__ import annotations
+import threading
+from typing import Any, Dict
+
+from llm_web import metrics
+
+
+class ForwardCounter:
+    def __init__(self, module):
+        self.calls = 0
+        module.register_forward_hook(self._hook)
+
+    def _hook(self, *_):
+        self.calls += 1
+
+
+class SpeculativeStats:
+    def __init__(self, name: str):
+        self._lock = threading.Lock()
+        self.proposed = 0
+        self.accepted = 0
+        self.spec_tps = metrics.summary(f"llm.{name}.speculative.tokens_per_s")
+        self.plain_tps = metrics.summary(f"llm.{name}.plain.tokens_per_s")
+        metrics.register(f"llm.{name}.speculative", self)
+
+    def record(self, *, speculative: bool, new_tokens: int, seconds: float,
+               target_forwards: int = 0, draft_forwards: int = 0) -> None:
+        if seconds > 0 and new_tokens > 0:
+            (self.spec_tps if speculative else self.plain_tps).observe(new_tokens / seconds)
+        if speculative:
+            with self._lock:
+                self.proposed += draft_forwards
+                self.accepted += max(0, new_tokens - target_forwards)
+
+    def acceptance_rate(self) -> float | None:
+        return (self.accepted / self.proposed) if self.proposed else None
+
+    def speedup(self) -> float | None:
+        spec, plain = self.spec_tps.snapshot()["avg"], self.plain_tps.snapshot()["avg"]
+        return (spec / plain) if spec and plain else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "proposed": self.proposed,
+            "accepted": self.accepted,
+            "acceptance_rate": self.acceptance_rate(),
+            "speedup": self.speedup(),
+        }
@@ -0,0 +1,506 @@
+"""
+llm_server 테스트 (Django 없이도 돈다: python -m pytest llm_server/tests.py, 또는 manage.py test).
+torch/transformers가 필요한 테스트는 없으면 건너뛴다.
+"""
+import importlib.util
+import itertools
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from llm_server.batching import BatchScheduler, with_batching
+from llm_server import cancel, response_cache
+from llm_server.response_cache import ResponseCache, cacheable, make_key
+
+HAS_TORCH = all(importlib.util.find_spec(m) is not None for m in ("torch", "transformers", "tokenizers"))
+HAS_PSUTIL = importlib.util.find_spec("psutil") is not None
+HAS_PYDANTIC = importlib.util.find_spec("pydantic") is not None  # llm_server.config
+
+
+def _tiny_engine(name: str = "prefix-test", draft: bool = False):
+    """다운로드 없이 만드는 무작위 초기화 Llama + 단어 단위 토크나이저 (fp32, CPU). draft=True면 초안 모델도 붙인다."""
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+    from llm_server.engine import GenerationEngine
+    from llm_server.prefix_cache import PrefixCache
+
+    words = ["<pad>", "<unk>", "<s>", "</s>"] + [f"w{i}" for i in range(60)]
+    raw = Tokenizer(models.WordLevel({w: i for i, w in enumerate(words)}, unk_token="<unk>"))
+    raw.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tok = PreTrainedTokenizerFast(
+        tokenizer_object=raw, pad_token="<pad>", unk_token="<unk>", bos_token="<s>", eos_token="</s>",
+    )
+    tok.padding_side = "left"
+    torch.manual_seed(0)
+    cfg = LlamaConfig(
+        vocab_size=len(words), hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=128,
+        pad_token_id=0, bos_token_id=2, eos_token_id=3,
+    )
+    model = LlamaForCausalLM(cfg).eval()
+    draft_model = LlamaForCausalLM(cfg.__class__(**{**cfg.to_dict(), "num_hidden_layers": 1})).eval() if draft else None
+    engine = GenerationEngine(name, tok, model, draft_model=draft_model)
+    engine.prefix_cache = PrefixCache(name, 64 * 2**20)
+    return engine
+
+
+@unittest.skipUnless(HAS_TORCH, "torch/transformers not installed")
+class PrefixKvEquivalenceTests(unittest.TestCase):
+    """[접두부 KV | 왼쪽 패딩된 접미부] 배치가 캐시 없이 돌린 것과 같은 greedy 토큰을 내는지."""
+
+    PREFIX = "w1 w2 w3 w4 w5 w6 w7 w8"
+    # 접미부 길이가 달라 짧은 행은 접두부와 접미부 사이에 패딩이 낀다
+    PROMPTS = [PREFIX + " w10 w11", PREFIX + " w12 w13 w14 w15 w16"]
+
+    def setUp(self):
+        self.engine = _tiny_engine()
+
+    def test_batched_prefix_matches_plain_greedy(self):
+        hits = self.engine.prefix_cache.hits.value  # 메트릭은 이름별 전역이라 차이로 본다
+        plain = self.engine.complete(self.PROMPTS, max_new_tokens=8)
+        miss = self.engine.complete(self.PROMPTS, prefix=self.PREFIX, max_new_tokens=8)
+        hit = self.engine.complete(self.PROMPTS, prefix=self.PREFIX, max_new_tokens=8)
+        self.assertEqual(self.engine.prefix_cache.hits.value - hits, 1)
+        self.assertEqual(miss, plain)
+        self.assertEqual(hit, plain)
+
+    def test_usage_counts_the_real_prompt_and_new_tokens(self):
+        tok, add_special = self.engine.tokenizer, self.engine._add_special(self.PROMPTS)
+        lengths = [len(tok(p, add_special_tokens=add_special)["input_ids"]) for p in self.PROMPTS]
+        for prefix in (None, self.PREFIX):
+            usage = []
+            self.engine.complete(self.PROMPTS, prefix=prefix, max_new_tokens=4, usage=usage)
+            self.assertEqual([u["prompt_tokens"] for u in usage], lengths)  # 왼쪽 패딩은 빼고 접두부 KV 구간은 포함
+            self.assertTrue(all(0 < u["completion_tokens"] <= 4 for u in usage))
+        usage = []
+        list(self.engine.stream(self.PROMPTS[0], max_new_tokens=4, usage=usage))
+        self.assertEqual(usage[0]["prompt_tokens"], lengths[0])
+
+    def test_prefix_cut_inside_a_token_falls_back_to_plain_encoding(self):
+        prompt, prefix = "w1 w2 w3 w4", "w1 w2 w"  # 접두부/접미부를 따로 토큰화하면 w3이 <unk> 두 개로 갈라진다
+        hits, misses = self.engine.prefix_cache.hits.value, self.engine.prefix_cache.misses.value
+        mismatch = self.engine._prefix_split_mismatch.value
+        self.assertEqual(
+            self.engine.complete([prompt], prefix=prefix, max_new_tokens=8),
+            self.engine.complete([prompt], max_new_tokens=8),
+        )
+        self.assertEqual(self.engine._prefix_split_mismatch.value - mismatch, 1)
+        self.assertEqual(
+            (self.engine.prefix_cache.hits.value - hits, self.engine.prefix_cache.misses.value - misses), (0, 0),
+        )
+
+    def test_single_prompt_prefix_matches_plain_greedy(self):
+        prompt = self.PROMPTS[1]
+        self.assertEqual(
+            self.engine.complete([prompt], prefix=self.PREFIX, max_new_tokens=8),
+            self.engine.complete([prompt], max_new_tokens=8),
+        )
+
+
+class _FakeEngine:
+    """BatchScheduler가 부르는 complete/complete_mixed만 흉내 내고 호출을 기록한다."""
+
+    def __init__(self, name: str, fail: bool = False):
+        self.name = name
+        self.fail = fail
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def complete(self, prompts, **params):
+        usage = params.pop("usage", None)
+        with self._lock:
+            self.calls.append(("complete", list(prompts), params))
+        if self.fail:
+            raise RuntimeError("engine down")
+        if usage is not None:
+            usage.extend({"prompt_tokens": len(p), "completion_tokens": 1} for p in prompts)
+        return [p.upper() for p in prompts]
+
+    def complete_mixed(self, prompts, row_params):
+        with self._lock:
+            self.calls.append(("mixed", list(prompts), row_params))
+        for p, r in zip(prompts, row_params):
+            if r.get("usage") is not None:
+                r["usage"].append({"prompt_tokens": len(p), "completion_tokens": r.get("max_new_tokens")})
+        return [f"{p.upper()}/{r.get('max_new_tokens')}" for p, r in zip(prompts, row_params)]
+
+
+class BatchSchedulerTests(unittest.TestCase):
+    def test_concurrent_requests_share_one_generate(self):
+        engine = _FakeEngine("batch-test-same")
+        sched = BatchScheduler(engine, max_batch_size=3, max_wait_ms=1000)
+        futures = [sched.submit(p, max_new_tokens=8) for p in ("a", "b", "c")]
+        self.assertEqual([f.result(timeout=5) for f in futures], ["A", "B", "C"])
+        self.assertEqual(engine.calls, [("complete", ["a", "b", "c"], {"max_new_tokens": 8})])
+
+    def test_row_params_go_through_complete_mixed(self):
+        engine = _FakeEngine("batch-test-mixed")
+        sched = BatchScheduler(engine, max_batch_size=2, max_wait_ms=1000)
+        futures = [sched.submit("a", max_new_tokens=8), sched.submit("b", max_new_tokens=32)]
+        self.assertEqual([f.result(timeout=5) for f in futures], ["A/8", "B/32"])
+        self.assertEqual([c[0] for c in engine.calls], ["mixed"])
+
+    def test_token_usage_goes_back_to_each_request(self):
+        engine = _FakeEngine("batch-test-usage")
+        sched = BatchScheduler(engine, max_batch_size=3, max_wait_ms=1000)
+        same, other = [], []
+        futures = [sched.submit("a", usage=same), sched.submit("bb"), sched.submit("ccc", usage=other)]
+        [f.result(timeout=5) for f in futures]
+        self.assertEqual(same, [{"prompt_tokens": 1, "completion_tokens": 1}])
+        self.assertEqual(other, [{"prompt_tokens": 3, "completion_tokens": 1}])
+        self.assertEqual(engine.calls, [("complete", ["a", "bb", "ccc"], {})])  # 배치 키에는 영향 없음
+
+        mixed = []
+        sched = BatchScheduler(engine, max_batch_size=2, max_wait_ms=1000)
+        futures = [sched.submit("a", max_new_tokens=8), sched.submit("bb", max_new_tokens=32, usage=mixed)]
+        [f.result(timeout=5) for f in futures]
+        self.assertEqual(mixed, [{"prompt_tokens": 2, "completion_tokens": 32}])
+
+    def test_different_sampling_params_are_not_batched_together(self):
+        engine = _FakeEngine("batch-test-split")
+        sched = BatchScheduler(engine, max_batch_size=2, max_wait_ms=50)
+        futures = [sched.submit("a", do_sample=False), sched.submit("b", do_sample=True)]
+        self.assertEqual([f.result(timeout=5) for f in futures], ["A", "B"])
+        self.assertEqual(sorted(c[1] for c in engine.calls), [["a"], ["b"]])
+
+    def test_engine_error_fails_every_request_in_the_batch(self):
+        sched = BatchScheduler(_FakeEngine("batch-test-fail", fail=True), max_batch_size=2, max_wait_ms=1000)
+        futures = [sched.submit("a"), sched.submit("b")]
+        for f in futures:
+            with self.assertRaises(RuntimeError):
+                f.result(timeout=5)
+
+    def test_batch_size_one_bypasses_the_scheduler(self):
+        engine = _FakeEngine("batch-test-off")
+        self.assertIs(with_batching(engine, max_batch_size=1, max_wait_ms=10), engine)
+
+
+class _EchoEngine:
+    """모델 서버 HTTP 왕복 확인용 (GenerationEngine과 같은 메서드)."""
+    name = "echo"
+
+    def complete(self, prompts, **params):
+        params["usage"].extend({"prompt_tokens": len(p.split()), "completion_tokens": params.get("max_new_tokens")} for p in prompts)
+        return [f"{p}|{params.get('max_new_tokens')}" for p in prompts]
+
+    def chat(self, messages, **params):
+        return messages[-1]["content"][::-1]
+
+    def count_tokens(self, texts):
+        return [len(t.split()) for t in texts]
+
+    def stream(self, prompt, **params):
+        yield from prompt.split()
+
+    def stream_chat(self, messages, **params):
+        yield from self.stream(messages[-1]["content"])
+
+
+@unittest.skipUnless(HAS_PYDANTIC, "pydantic not installed")
+class ModelServerRoundTripTests(unittest.TestCase):
+    """llm_server.server + client.RemoteEngine을 실제 HTTP(임의 포트)로 왕복한다."""
+
+    def setUp(self):
+        from http.server import ThreadingHTTPServer
+        from llm_server import server
+        self.engines = mock.patch.dict(server.ENGINES, {"echo": _EchoEngine()}, clear=True)
+        self.engines.start()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), server._Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.engines.stop()
+
+    def test_complete_chat_tokens_and_stream(self):
+        from llm_server.client import RemoteEngine
+        remote = RemoteEngine("echo", base_url=self.base_url, timeout=5)
+        usage = []
+        self.assertEqual(remote.complete(["a", "b"], max_new_tokens=4, usage=usage), ["a|4", "b|4"])
+        self.assertEqual(usage, [{"prompt_tokens": 1, "completion_tokens": 4}] * 2)
+        self.assertEqual(remote.chat([{"role": "user", "content": "가나다"}]), "다나가")
+        self.assertEqual(remote.count_tokens(["one two", "x"]), [2, 1])
+        self.assertEqual("".join(remote.stream("스트림 조각 테스트")), "스트림조각테스트")
+        self.assertEqual(remote.health()["models"], ["echo"])
+
+    def test_unknown_model_is_a_server_error(self):
+        from llm_server.client import ModelServerError, RemoteEngine
+        with self.assertRaises(ModelServerError):
+            RemoteEngine("missing", base_url=self.base_url, timeout=5).complete(["a"])
+
+
+@unittest.skipUnless(HAS_TORCH, "torch/transformers not installed")
+class StreamingTests(unittest.TestCase):
+    def test_stop_split_across_pieces_is_cut_before_it(self):
+        from llm_server.engine import stream_until_stop
+        self.assertEqual("".join(stream_until_stop(["ab", "c\n", "\nde"], ["\n\n"])), "abc")
+        self.assertEqual("".join(stream_until_stop(["a", "b", "c"], None)), "abc")
+
+    def test_stream_yields_the_same_text_as_complete(self):
+        engine = _tiny_engine()
+        prompt = PrefixKvEquivalenceTests.PROMPTS[0]
+        pieces = list(engine.stream(prompt, max_new_tokens=8))
+        self.assertEqual("".join(pieces).strip(), engine.complete([prompt], max_new_tokens=8)[0].strip())
+
+    def test_closing_the_stream_stops_decoding_and_frees_the_lock(self):
+        engine = _tiny_engine()
+        stream = engine.stream(PrefixKvEquivalenceTests.PROMPTS[0], max_new_tokens=100)
+        for _ in stream:
+            break
+        stream.close()
+        self.assertTrue(engine._lock.acquire(blocking=False))  # 워커가 락을 놓고 끝났다
+        engine._lock.release()
+        self.assertFalse(any(t.name == "stream-prefix-test" for t in threading.enumerate()))
+
+
+@unittest.skipUnless(HAS_TORCH and HAS_PSUTIL, "torch/transformers/psutil not installed")
+class CpuBackendTests(unittest.TestCase):
+    def test_configure_threads_pins_intra_op_threads(self):
+        import torch
+        from llm_server.cpu import configure_threads
+        before = torch.get_num_threads()
+        try:
+            self.assertEqual(configure_threads(2), 2)
+            self.assertEqual(torch.get_num_threads(), 2)
+        finally:
+            torch.set_num_threads(before)
+
+    def test_int8_model_still_generates(self):
+        import torch
+        from llm_server.cpu import optimize_for_cpu
+        engine = _tiny_engine()
+        engine.model = optimize_for_cpu(engine.model, int8=True)
+        self.assertFalse(any(type(m) is torch.nn.Linear for m in engine.model.modules()))
+        text = engine.complete(PrefixKvEquivalenceTests.PROMPTS[:1], max_new_tokens=4)[0]
+        self.assertIsInstance(text, str)
+
+
+class SpeculativeStatsTests(unittest.TestCase):
+    def test_acceptance_is_derived_from_forward_counts(self):
+        from llm_server.speculative import SpeculativeStats
+        stats = SpeculativeStats("spec-test-stats")
+        # 타깃 forward 4회로 10토큰 → 초안 8개 중 6개 수락
+        stats.record(speculative=True, new_tokens=10, seconds=1.0, target_forwards=4, draft_forwards=8)
+        stats.record(speculative=False, new_tokens=5, seconds=1.0)
+        self.assertEqual((stats.proposed, stats.accepted), (8, 6))
+        self.assertAlmostEqual(stats.acceptance_rate(), 0.75)
+        self.assertAlmostEqual(stats.speedup(), 2.0)
+
+    def test_no_draft_calls_means_no_rate(self):
+        from llm_server.speculative import SpeculativeStats
+        stats = SpeculativeStats("spec-test-empty")
+        stats.record(speculative=False, new_tokens=5, seconds=1.0)
+        self.assertIsNone(stats.acceptance_rate())
+        self.assertIsNone(stats.speedup())
+
+
+@unittest.skipUnless(HAS_TORCH, "torch/transformers not installed")
+class AssistedDecodingTests(unittest.TestCase):
+    def test_greedy_output_does_not_depend_on_the_draft(self):
+        engine = _tiny_engine("spec-test", draft=True)
+        prompt = [PrefixKvEquivalenceTests.PROMPTS[0]]
+        plain = engine.complete(prompt, max_new_tokens=8, assisted=False)
+        self.assertEqual(engine.complete(prompt, max_new_tokens=8), plain)
+        self.assertGreater(engine.spec_stats.proposed, 0)
+
+
+class _CharTokenizer:
+    """TokenTable이 쓰는 메서드만 가진 글자 단위 토크나이저 (+ 몇 개의 여러 글자 토큰)."""
+    vocab = ["</s>"] + list('{}[]":, 0123456789abcdefghijklmnopqrstuvwxyz\\') + ['", "', '": ', "true", "fa", "lse"]
+    all_special_ids = [0]
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def decode(self, ids):
+        return "".join(self.vocab[i] for i in ids)
+
+
+@unittest.skipUnless(HAS_TORCH, "torch/transformers not installed")
+class ConstrainedDecodingTests(unittest.TestCase):
+    SCHEMA = {
+        "type": "object",
+        "properties": {
+            "intent": {"enum": ["db_query", "chitchat"]},
+            "days": {"type": "integer", "maximum": 99},
+            "name": {"type": "string", "maxLength": 4},
+            "ok": {"type": "boolean"},
+        },
+    }
+
+    def setUp(self):
+        from llm_server.constrained import JsonGrammar, TokenTable
+        self.tok = _CharTokenizer()
+        self.grammar = JsonGrammar(self.SCHEMA, TokenTable(self.tok))
+
+    def test_grammar_accepts_only_the_fixed_format(self):
+        g = self.grammar
+        self.assertTrue(g.done(g.advance(g.start, '{"intent": "db_query", "days": 7, "name": "kim", "ok": true}')))
+        self.assertIsNone(g.advance(g.start, '{"intent": "other"'))
+        self.assertIsNone(g.advance(g.start, '{"intent": "chitchat", "days": 123'))
+        self.assertIsNone(g.advance(g.start, '{"intent": "chitchat", "days": 07'))
+
+    def test_random_logits_always_decode_to_valid_json(self):
+        import json
+        import torch
+        from llm_server.constrained import JsonSchemaLogitsProcessor
+        torch.manual_seed(0)
+        for _ in range(5):
+            proc = JsonSchemaLogitsProcessor(self.grammar, eos_token_id=0)
+            ids = torch.tensor([[1, 2]])  # 프롬프트 두 토큰
+            for _ in range(80):
+                scores = proc(ids, torch.randn(1, len(self.tok)))
+                nxt = int(scores.argmax())
+                if nxt == 0:
+                    break
+                ids = torch.cat([ids, torch.tensor([[nxt]])], dim=1)
+            out = json.loads(self.tok.decode(ids[0, 2:].tolist()))
+            self.assertEqual(list(out), ["intent", "days", "name", "ok"])
+            self.assertIn(out["intent"], ["db_query", "chitchat"])
+            self.assertIsInstance(out["name"], str)
+            self.assertIsInstance(out["ok"], bool)
+
+
+class ResponseCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "responses.db")
+        # 디스크 계층의 created/accessed가 호출마다 1초씩 늘도록
+        self.clock = itertools.count(1_000_000)
+        self.time = mock.patch.object(response_cache.time, "time", side_effect=lambda: float(next(self.clock)))
+        self.time.start()
+
+    def tearDown(self):
+        self.time.stop()
+        self.tmp.cleanup()
+
+    def test_key_ignores_prefix_and_sampling_is_not_cached(self):
+        self.assertEqual(make_key("m", "p", {"max_new_tokens": 8, "prefix": "a"}), make_key("m", "p", {"max_new_tokens": 8}))
+        self.assertNotEqual(make_key("m", "p", {"max_new_tokens": 8}), make_key("m", "p", {"max_new_tokens": 9}))
+        self.assertFalse(cacheable({"do_sample": True}))
+        self.assertTrue(cacheable({"max_new_tokens": 8}))
+
+    def test_memory_lru_evicts_least_recently_read(self):
+        cache = ResponseCache("rc-test-lru", max_entries=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), ("A", "C"))
+        self.assertEqual(cache.snapshot()["entries"], 2)
+
+    def test_disk_tier_is_shared_and_refills_memory(self):
+        ResponseCache("rc-test-disk-w", max_entries=4, path=self.path).put("k", "값")
+        reader = ResponseCache("rc-test-disk-r", max_entries=4, path=self.path)
+        self.assertEqual(reader.get("k"), "값")
+        self.assertEqual(reader.get("k"), "값")
+        snap = reader.snapshot()
+        self.assertEqual((snap["hits_disk"], snap["hits_memory"], snap["misses"]), (1, 1, 0))
+
+    def test_disk_ttl_and_byte_budget(self):
+        cache = ResponseCache("rc-test-ttl", max_entries=0, path=self.path, ttl_s=10, max_bytes=10)
+        cache.put("old", "x" * 4)
+        cache.put("mid", "y" * 4)
+        cache.get("old")            # old가 더 최근에 읽힘
+        cache.put("new", "z" * 4)   # 12바이트 > 10 → mid부터 지운다
+        self.assertIsNone(cache.get("mid"))
+        self.assertEqual(cache.get("old"), "xxxx")
+        self.clock = itertools.count(2_000_000)
+        self.assertIsNone(cache.get("new"))  # TTL 경과
+
+
+@unittest.skipUnless(HAS_PYDANTIC, "pydantic not installed")
+class GenerationProfileTests(unittest.TestCase):
+    def test_profile_values_are_defaults_under_call_params(self):
+        from llm_server.profiles import apply_profile
+        name, params = apply_profile({"profile": "narrate", "max_new_tokens": 40, "stop": ["끝"], "temperature": None})
+        self.assertEqual(name, "narrate")
+        self.assertEqual(params, {"max_new_tokens": 40, "stop": ["\n\n", "끝"]})
+        _, params = apply_profile({"profile": "intent"})
+        self.assertEqual((params["max_new_tokens"], params["early_stop"]), (16, "json"))
+        self.assertEqual(apply_profile({"max_new_tokens": 5}), (None, {"max_new_tokens": 5}))
+
+    def test_unknown_profile_is_rejected(self):
+        from llm_server.profiles import apply_profile
+        with self.assertRaises(ValueError):
+            apply_profile({"profile": "nope"})
+
+    def test_early_stop_points(self):
+        from llm_server.profiles import early_stop_at
+        text = 'x {"a": "}{", "b": {"c": 1}} tail'
+        self.assertEqual(text[:early_stop_at(text, "json")], 'x {"a": "}{", "b": {"c": 1}}')
+        self.assertEqual(early_stop_at('{"a": 1', "json"), -1)
+        self.assertEqual(early_stop_at("\n  users\nmore", "line"), 8)
+        self.assertEqual(early_stop_at("\n\n", "line"), -1)
+        self.assertEqual(early_stop_at("a\nb", None), -1)
+
+
+@unittest.skipUnless(HAS_TORCH and HAS_PYDANTIC, "torch/transformers/pydantic not installed")
+class CompleteMixedTests(unittest.TestCase):
+    def test_mixed_rows_match_separate_calls(self):
+        engine = _tiny_engine("mixed-test")
+        prompts = PrefixKvEquivalenceTests.PROMPTS
+        rows = [{"max_new_tokens": 3}, {"max_new_tokens": 7}]
+        self.assertEqual(
+            engine.complete_mixed(prompts, rows),
+            [engine.complete([p], **r)[0] for p, r in zip(prompts, rows)],
+        )
+
+
+class CancelTokenTests(unittest.TestCase):
+    def test_callbacks_run_once_and_late_ones_run_immediately(self):
+        token, calls = cancel.CancelToken(), []
+        token.on_cancel(lambda: calls.append("early"))
+        token.cancel()
+        token.cancel()
+        token.on_cancel(lambda: calls.append("late"))
+        self.assertEqual(calls, ["early", "late"])
+        with self.assertRaises(cancel.Cancelled):
+            token.raise_if_cancelled()
+
+    def test_scope_sets_and_restores_the_current_token(self):
+        token = cancel.CancelToken()
+        self.assertIsNone(cancel.current())
+        with cancel.scope(token):
+            self.assertIs(cancel.current(), token)
+        self.assertIsNone(cancel.current())
+
+    def test_remote_tokens_are_shared_until_the_last_release(self):
+        a = cancel.remote_token("cancel-test")
+        b = cancel.remote_token("cancel-test")
+        self.assertIs(a, b)
+        cancel.release_remote("cancel-test")
+        cancel.cancel_remote("cancel-test")
+        self.assertTrue(b.cancelled)
+        cancel.release_remote("cancel-test")
+        self.assertIsNot(cancel.remote_token("cancel-test"), a)  # 다 놓으면 새 토큰
+        cancel.release_remote("cancel-test")
+
+    def test_scheduler_fails_cancelled_requests(self):
+        token = cancel.CancelToken()
+        token.cancel()
+        engine = _FakeEngine("batch-test-cancel-pre")
+        sched = BatchScheduler(engine, max_batch_size=2, max_wait_ms=10)
+        with self.assertRaises(cancel.Cancelled):
+            sched.submit("a", cancel=token).result(timeout=5)
+        self.assertEqual(engine.calls, [])
+
+    def test_request_cancelled_during_generate_fails_alone(self):
+        token = cancel.CancelToken()
+
+        class _Cancelling(_FakeEngine):
+            def complete_mixed(self, prompts, row_params):
+                token.cancel()
+                return super().complete_mixed(prompts, row_params)
+
+        sched = BatchScheduler(_Cancelling("batch-test-cancel-mid"), max_batch_size=2, max_wait_ms=1000)
+        futures = [sched.submit("a", cancel=token), sched.submit("b")]
+        with self.assertRaises(cancel.Cancelled):
+            futures[0].result(timeout=5)
+        self.assertEqual(futures[1].result(timeout=5), "B/None")
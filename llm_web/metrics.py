@@ -0,0 +1,107 @@
+"""
+프로세스 내 경량 메트릭 (카운터/게이지/요약치).
+외부 의존성 없이 snapshot()을 JSON으로 내보내는 용도 (/metrics, 모델 서버 /v1/stats).
+"""
+from __future__ import annotations
+import threading
+from collections import deque
+from typing import Any, Dict
+
+_lock = threading.Lock()
+_REGISTRY: Dict[str, Any] = {}
+
+
+class Counter:
+    def __init__(self):
+        self._v = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1) -> None:
+        with self._lock:
+            self._v += n
+
+    @property
+    def value(self) -> float:
+        return self._v
+
+    def snapshot(self):
+        return self._v
+
+
+class Gauge:
+    def __init__(self):
+        self._v = 0
+
+    def set(self, v: float) -> None:
+        self._v = v
+
+    @property
+    def value(self) -> float:
+        return self._v
+
+    def snapshot(self):
+        return self._v
+
+
+class Summary:
+    """count/sum/min/max + 최근 window개 관측치 기준 p50/p95."""
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._recent = deque(maxlen=window)
+
+    def observe(self, v: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += v
+            self.min = v if self.min is None else min(self.min, v)
+            self.max = v if self.max is None else max(self.max, v)
+            self._recent.append(v)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self._recent)
+        def pct(p):
+            return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else None
+        return {
+            "count": self.count,
+            "avg": (self.total / self.count) if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": pct(0.50),
+            "p95": pct(0.95),
+        }
+
+
+def _get(name: str, cls):
+    m = _REGISTRY.get(name)
+    if m is None:
+        with _lock:
+            m = _REGISTRY.setdefault(name, cls())
+    return m
+
+
+def counter(name: str) -> Counter:
+    return _get(name, Counter)
+
+
+def gauge(name: str) -> Gauge:
+    return _get(name, Gauge)
+
+
+def summary(name: str) -> Summary:
+    return _get(name, Summary)
+
+
+def register(name: str, obj: Any) -> Any:
+    """snapshot() 메서드를 가진 임의 객체를 등록 (파생 지표용)."""
+    with _lock:
+        return _REGISTRY.setdefault(name, obj)
+
+
+def snapshot() -> Dict[str, Any]:
+    return {name: m.snapshot() for name, m in sorted(_REGISTRY.items())}
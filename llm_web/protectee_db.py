@@ -0,0 +1,264 @@
+"""
+protectee.db 공유 읽기 전용 접근 계층.
+
+dbchat SQL 에이전트(app.core.database.get_db), report.db_service, report 이름 자동완성이 같은
+SQLAlchemy 엔진/커넥션 풀을 쓴다 (경로별 하나).
+- 연결은 `file:<path>?mode=ro` URI + `PRAGMA query_only = ON` → LLM이 만든 SQL도 물리적으로 쓸 수 없다
+  (authorizer로 ATTACH와 값을 바꾸는 PRAGMA도 막는다: ATTACH는 없는 파일을 새로 만들 수 있음)
+- mmap_size/cache_size는 연결마다, WAL은 파일이 쓰기 가능할 때 풀을 만들며 한 번 켠다 (읽기와 적재가 서로 막지 않도록)
+- query_budget(): 그 안에서 실행되는 쿼리에 SQLite progress handler로 VM 스텝/벽시계 한도를 건다
+  (LLM SQL의 실수 카테시안 조인, 끝없는 GROUP_CONCAT 등). 넘으면 SQLite가 "interrupted"로 중단하고
+  QueryBudget.exceeded에 이유가 남는다
+- 메트릭: protectee_db.pool_wait_ms, protectee_db.query_ms, protectee_db.in_use, protectee_db.pool_timeouts,
+  protectee_db.write_blocked, protectee_db.budget_aborts(.vm_steps/.wall_clock)
+"""
+from __future__ import annotations
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from llm_web import metrics
+
+log = logging.getLogger("llm_web.protectee_db")
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+class ProtecteeDbSettings(BaseSettings):
+    # 상대 경로는 프로젝트 루트 기준 (작업 디렉터리와 무관)
+    path: str = "db/protectee.db"
+    pool_size: int = 8
+    pool_timeout_s: float = 5.0
+    mmap_mb: int = 256
+    cache_mb: int = 64
+    wal: bool = True
+    # query_budget 기본 한도 (0이면 해당 한도 없음). progress handler는 VM 명령 progress_ops개마다 불린다
+    query_max_steps: int = 200_000_000
+    query_max_ms: int = 5000
+    report_max_ms: int = 15000
+    progress_ops: int = 10000
+
+    model_config = SettingsConfigDict(
+        env_prefix="PROTECTEE_DB_",
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+        case_sensitive=False,
+    )
+
+settings = ProtecteeDbSettings()
+
+_pool_wait = metrics.summary("protectee_db.pool_wait_ms")
+_query_ms = metrics.summary("protectee_db.query_ms")
+_in_use = metrics.gauge("protectee_db.in_use")
+_timeouts = metrics.counter("protectee_db.pool_timeouts")
+_write_blocked = metrics.counter("protectee_db.write_blocked")
+_budget_aborts = metrics.counter("protectee_db.budget_aborts")
+_budget_abort_reasons = {
+    "vm_steps": metrics.counter("protectee_db.budget_aborts.vm_steps"),
+    "wall_clock": metrics.counter("protectee_db.budget_aborts.wall_clock"),
+}
+
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+_checked_out = 0
+_checked_out_lock = threading.Lock()
+
+
+class _TimedQueuePool(QueuePool):
+    """체크아웃 대기 시간을 잰다 (SQLDatabase 등 엔진을 직접 쓰는 호출자까지 모두)."""
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            _timeouts.inc()
+            raise
+        finally:
+            _pool_wait.observe((time.perf_counter() - t0) * 1000.0)
+
+
+class QueryBudget:
+    """query_budget() 범위 하나의 VM 스텝/시간 한도. exceeded는 중단 이유("vm_steps"/"wall_clock") 또는 None."""
+
+    def __init__(self, max_steps: int, max_ms: int):
+        self.max_steps = max_steps
+        self.max_ms = max_ms
+        self.steps = 0
+        self.exceeded: Optional[str] = None
+        self._t0 = time.perf_counter()
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000.0
+
+    def _progress(self) -> int:
+        # 0이 아닌 값을 돌려주면 SQLite가 실행 중인 문장을 중단한다 (OperationalError: interrupted)
+        self.steps += settings.progress_ops
+        if self.max_steps and self.steps > self.max_steps:
+            self.exceeded = "vm_steps"
+        elif self.max_ms and self.elapsed_ms > self.max_ms:
+            self.exceeded = "wall_clock"
+        return 1 if self.exceeded else 0
+
+    def describe(self) -> str:
+        limit = f"{self.max_steps} steps" if self.exceeded == "vm_steps" else f"{self.max_ms} ms"
+        return (
+            f"QUERY_BUDGET_EXCEEDED reason={self.exceeded} limit={limit} "
+            f"elapsed_ms={self.elapsed_ms:.0f} vm_steps~{self.steps}"
+        )
+
+
+class QueryBudgetExceeded(RuntimeError):
+    def __init__(self, budget: QueryBudget):
+        super().__init__(budget.describe())
+        self.budget = budget
+
+
+_budget: ContextVar[Optional[QueryBudget]] = ContextVar("protectee_db_budget", default=None)
+
+
+@contextmanager
+def query_budget(max_steps: Optional[int] = None, max_ms: Optional[int] = None) -> Iterator[QueryBudget]:
+    """
+    범위 안에서 (같은 컨텍스트로) 실행되는 쿼리에 한도를 건다. 한도는 범위 전체에 대해 센다.
+    중단된 쿼리의 예외는 호출자에게 그대로 올라간다 (run_no_throw처럼 삼키는 호출자는 budget.exceeded를 본다).
+    """
+    budget = QueryBudget(
+        settings.query_max_steps if max_steps is None else max_steps,
+        settings.query_max_ms if max_ms is None else max_ms,
+    )
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+def resolve_path(path: Optional[str] = None) -> str:
+    p = Path(path or settings.path)
+    return str(p if p.is_absolute() else (BASE_DIR / p).resolve())
+
+
+def _enable_wal(path: str) -> None:
+    # journal_mode는 쓰기 연결에서만 바꿀 수 있고 파일에 남는다
+    if not settings.wal or not os.access(path, os.W_OK):
+        return
+    try:
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        log.warning("WAL 전환 실패 (%s): %s", path, e)
+
+
+# 인자를 받는 PRAGMA 중 스키마 조회용만 허용 (SQLAlchemy inspector/스키마 스냅샷이 쓴다)
+_READ_PRAGMAS = {"table_info", "table_xinfo", "index_list", "index_info", "index_xinfo", "foreign_key_list"}
+
+
+def _authorize(action, arg1, arg2, db_name, trigger):
+    if action in (sqlite3.SQLITE_ATTACH, sqlite3.SQLITE_DETACH):
+        return sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_PRAGMA and arg2 is not None and arg1.lower() not in _READ_PRAGMAS:
+        return sqlite3.SQLITE_DENY  # PRAGMA x = v (query_only = OFF 등)
+    return sqlite3.SQLITE_OK
+
+
+def _connect_ro(path: str):
+    def _connect() -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False, timeout=5)
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {int(settings.mmap_mb) * 2**20}")
+        conn.execute(f"PRAGMA cache_size = -{int(settings.cache_mb) * 1024}")  # KiB 단위 음수
+        conn.set_authorizer(_authorize)
+        return conn
+    return _connect
+
+
+def _track(engine: Engine) -> None:
+    def _set_in_use(delta: int) -> None:
+        global _checked_out
+        with _checked_out_lock:
+            _checked_out += delta
+            _in_use.set(_checked_out)
+
+    event.listen(engine, "checkout", lambda *a: _set_in_use(1))
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        _set_in_use(-1)
+        if connection_record.info.pop("_budget", None) is not None and dbapi_connection is not None:
+            dbapi_connection.set_progress_handler(None, 0)  # 다음 사용자에게 한도가 남지 않도록
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_t0", []).append(time.perf_counter())
+        # 핸들러는 커넥션을 풀에 돌려줄 때까지 둔다 (sqlite3는 fetch 중에도 VM을 돌린다)
+        budget = _budget.get()
+        if conn.info.get("_budget") is not budget:
+            dbapi = conn.connection.dbapi_connection
+            if budget is None:
+                dbapi.set_progress_handler(None, 0)
+            else:
+                dbapi.set_progress_handler(budget._progress, max(1, settings.progress_ops))
+            conn.info["_budget"] = budget
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _query_ms.observe((time.perf_counter() - conn.info["_t0"].pop()) * 1000.0)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(ctx):
+        if ctx.connection is not None and ctx.connection.info.get("_t0"):
+            ctx.connection.info["_t0"].pop()
+        err = ctx.original_exception
+        if isinstance(err, sqlite3.DatabaseError) and ("readonly" in str(err) or "not authorized" in str(err)):
+            _write_blocked.inc()
+        budget = _budget.get()
+        if budget is not None and budget.exceeded and isinstance(err, sqlite3.OperationalError) and "interrupt" in str(err):
+            _budget_aborts.inc()
+            _budget_abort_reasons[budget.exceeded].inc()
+            log.warning("쿼리 한도 초과로 중단: %s", budget.describe())
+
+
+def engine(path: Optional[str] = None) -> Engine:
+    """경로별 읽기 전용 엔진 (프로세스당 하나씩 공유)."""
+    resolved = resolve_path(path)
+    eng = _engines.get(resolved)
+    if eng is not None:
+        return eng
+    with _engines_lock:
+        eng = _engines.get(resolved)
+        if eng is None:
+            _enable_wal(resolved)
+            eng = create_engine(
+                "sqlite://",
+                creator=_connect_ro(resolved),
+                poolclass=_TimedQueuePool,
+                pool_size=max(1, settings.pool_size),
+                max_overflow=0,
+                pool_timeout=settings.pool_timeout_s,
+                pool_pre_ping=False,
+            )
+            _track(eng)
+            _engines[resolved] = eng
+    return eng
+
+
+def fetchall(sql: str, params: Sequence[Any] | Dict[str, Any] = (), path: Optional[str] = None) -> List[tuple]:
+    """드라이버 SQL 그대로 실행해 행 목록을 돌려준다 (자동완성 같은 짧은 조회용)."""
+    with engine(path).connect() as conn:
+        return [tuple(r) for r in conn.exec_driver_sql(sql, params).fetchall()]
@@ -0,0 +1,88 @@
+"""
+모델 로드/워밍업 상태 (readyz 응답용).
+
+상태: idle → loading → loaded → warming → ready   (실패 시 error)
+LLM_WARMUP=true면 AppConfig.ready()에서 백그라운드로 모델을 올리고 프롬프트 계열별
+더미 생성을 한 번씩 돌린다. 로드밸런서는 /readyz 가 200일 때만 트래픽을 보낸다.
+"""
+from __future__ import annotations
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable
+
+log = logging.getLogger("llm_web")
+
+_lock = threading.Lock()
+_models: Dict[str, Dict[str, Any]] = {}
+_started: set[str] = set()
+
+
+def _entry(name: str) -> Dict[str, Any]:
+    return _models.setdefault(name, {"status": "idle", "load_s": None, "warmup_s": None, "families": {}, "error": None})
+
+
+def _set(name: str, **kw: Any) -> None:
+    with _lock:
+        _entry(name).update(kw)
+
+
+@contextmanager
+def track_load(name: str):
+    """모델 로드 구간을 감싸 상태/소요 시간을 기록한다 (싱글플라이트 락 안에서 사용)."""
+    _set(name, status="loading", error=None)
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        _set(name, status="error", error=repr(e))
+        raise
+    _set(name, status="loaded", load_s=round(time.perf_counter() - t0, 2))
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        return {k: {**v, "families": dict(v["families"])} for k, v in _models.items()}
+
+
+def is_ready(names: Iterable[str]) -> bool:
+    with _lock:
+        return all(_models.get(n, {}).get("status") == "ready" for n in names)
+
+
+def should_warm_up() -> bool:
+    # runserver 자동 리로더의 부모 프로세스에서는 모델을 올리지 않는다
+    return not ("runserver" in sys.argv and os.environ.get("RUN_MAIN") != "true")
+
+
+def start_warmup(name: str, load: Callable[[], Any], families: Callable[[], Dict[str, Callable[[], Any]]]) -> None:
+    """
+    백그라운드 스레드에서 load()(싱글플라이트 getter)로 모델을 올리고,
+    families()가 돌려준 프롬프트 계열별 더미 생성을 한 번씩 실행한다. 이름당 한 번만 시작.
+    """
+    with _lock:
+        if name in _started:
+            return
+        _started.add(name)
+        _entry(name)
+
+    def _run():
+        try:
+            load()
+            _set(name, status="warming")
+            t0 = time.perf_counter()
+            for family, fn in families().items():
+                t1 = time.perf_counter()
+                fn()
+                with _lock:
+                    _entry(name)["families"][family] = round(time.perf_counter() - t1, 2)
+            _set(name, status="ready", warmup_s=round(time.perf_counter() - t0, 2))
+            log.info("model '%s' warmed up", name)
+        except Exception as e:
+            log.exception("warm-up failed for '%s'", name)
+            _set(name, status="error", error=repr(e))
+
+    threading.Thread(target=_run, name=f"warmup-{name}", daemon=True).start()
@@ -0,0 +1,152 @@
+"""
+llm_web 테스트 (Django 없이도 돈다: python -m pytest llm_web/tests.py, 또는 manage.py test).
+"""
+import importlib.util
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from llm_web import metrics, readiness
+
+HAS_DB_DEPS = all(importlib.util.find_spec(m) is not None for m in ("sqlalchemy", "pydantic_settings"))
+
+
+class ReadinessTests(unittest.TestCase):
+    def setUp(self):
+        self.state = mock.patch.multiple(readiness, _models={}, _started=set())
+        self.state.start()
+
+    def tearDown(self):
+        self.state.stop()
+
+    def _warm(self, name, load, families):
+        readiness.start_warmup(name, load, families)
+        for t in threading.enumerate():
+            if t.name == f"warmup-{name}":
+                t.join(timeout=5)
+
+    def test_warmup_runs_every_family_then_reports_ready(self):
+        calls = []
+        self._warm("m", lambda: calls.append("load"), lambda: {"a": lambda: calls.append("a"), "b": lambda: calls.append("b")})
+        self.assertEqual(calls, ["load", "a", "b"])
+        self.assertTrue(readiness.is_ready(["m"]))
+        self.assertEqual(set(readiness.snapshot()["m"]["families"]), {"a", "b"})
+        self.assertFalse(readiness.is_ready(["m", "other"]))
+
+    def test_warmup_starts_once_per_name(self):
+        load = mock.Mock()
+        self._warm("m", load, dict)
+        self._warm("m", load, dict)
+        load.assert_called_once()
+
+    def test_failed_family_is_an_error_not_ready(self):
+        def boom():
+            raise RuntimeError("oom")
+
+        with self.assertLogs("llm_web", "ERROR"):
+            self._warm("m", mock.Mock(), lambda: {"a": boom})
+        self.assertFalse(readiness.is_ready(["m"]))
+        self.assertIn("oom", readiness.snapshot()["m"]["error"])
+
+    def test_track_load_records_status(self):
+        with readiness.track_load("m"):
+            self.assertEqual(readiness.snapshot()["m"]["status"], "loading")
+        self.assertEqual(readiness.snapshot()["m"]["status"], "loaded")
+        with self.assertRaises(ValueError), readiness.track_load("n"):
+            raise ValueError("bad path")
+        self.assertEqual(readiness.snapshot()["n"]["status"], "error")
+
+
+def _protectee_copy(tmp: str) -> str:
+    path = os.path.join(tmp, "protectee.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT);"
+        "CREATE TABLE event (id INTEGER PRIMARY KEY, protectee_id INTEGER, stress INTEGER);"
+        "INSERT INTO users VALUES (1, '홍길동'), (2, '김철수');"
+        "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 2000)"
+        " INSERT INTO event (protectee_id, stress) SELECT i % 2 + 1, i % 100 FROM n;"
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+@unittest.skipUnless(HAS_DB_DEPS, "sqlalchemy/pydantic-settings not installed")
+class ReadOnlyPoolTests(unittest.TestCase):
+    def setUp(self):
+        from llm_web import protectee_db
+        self.db = protectee_db
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = _protectee_copy(self.tmp.name)
+
+    def tearDown(self):
+        self.db._engines.pop(self.db.resolve_path(self.path)).dispose()
+        self.tmp.cleanup()
+
+    def _denied(self, sql):
+        from sqlalchemy.exc import DBAPIError
+        with self.assertRaises(DBAPIError):
+            self.db.fetchall(sql, path=self.path)
+
+    def test_one_engine_per_path_and_reads_work(self):
+        self.assertIs(self.db.engine(self.path), self.db.engine(self.path))
+        self.assertEqual(self.db.fetchall("SELECT name FROM users WHERE id = ?", (1,), path=self.path), [("홍길동",)])
+        cols = [r[1] for r in self.db.fetchall('PRAGMA table_info("users")', path=self.path)]
+        self.assertEqual(cols, ["id", "name"])
+
+    def test_writes_attach_and_pragma_changes_are_blocked(self):
+        blocked = self.db._write_blocked.value
+        self._denied("INSERT INTO users VALUES (3, '이영희')")
+        self._denied("DELETE FROM event")
+        self._denied(f"ATTACH DATABASE '{os.path.join(self.tmp.name, 'new.db')}' AS x")
+        self._denied("PRAGMA query_only = OFF")
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "new.db")))
+        self.assertEqual(self.db.fetchall("SELECT COUNT(*) FROM users", path=self.path), [(2,)])
+        self.assertEqual(self.db._write_blocked.value - blocked, 4)
+
+
+@unittest.skipUnless(HAS_DB_DEPS, "sqlalchemy/pydantic-settings not installed")
+class QueryBudgetTests(unittest.TestCase):
+    CROSS_JOIN = "SELECT COUNT(*) FROM event a, event b, event c"
+
+    def setUp(self):
+        from llm_web import protectee_db
+        self.db = protectee_db
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = _protectee_copy(self.tmp.name)
+        self.pool = mock.patch.object(protectee_db.settings, "pool_size", 1)  # 중단된 커넥션을 다음 쿼리가 다시 쓰도록
+        self.pool.start()
+
+    def tearDown(self):
+        self.pool.stop()
+        self.db._engines.pop(self.db.resolve_path(self.path)).dispose()
+        self.tmp.cleanup()
+
+    def _abort(self, **limits):
+        from sqlalchemy.exc import OperationalError
+        aborts = self.db._budget_aborts.value
+        with self.db.query_budget(**limits) as budget, self.assertRaises(OperationalError):
+            self.db.fetchall(self.CROSS_JOIN, path=self.path)
+        self.assertEqual(self.db._budget_aborts.value - aborts, 1)
+        return budget
+
+    def test_wall_clock_limit_interrupts_a_runaway_join(self):
+        reason = metrics.counter("protectee_db.budget_aborts.wall_clock").value
+        budget = self._abort(max_steps=0, max_ms=50)
+        self.assertEqual(budget.exceeded, "wall_clock")
+        self.assertIn("reason=wall_clock", budget.describe())
+        self.assertEqual(metrics.counter("protectee_db.budget_aborts.wall_clock").value - reason, 1)
+
+    def test_step_limit_and_handler_is_cleared_for_the_next_user(self):
+        budget = self._abort(max_steps=50_000, max_ms=0)
+        self.assertEqual(budget.exceeded, "vm_steps")
+        # 같은 (유일한) 커넥션, 한도 밖 → 끝까지 돈다
+        self.assertEqual(self.db.fetchall("SELECT COUNT(*) FROM event a, event b", path=self.path), [(4_000_000,)])
+
+    def test_queries_under_budget_are_untouched(self):
+        with self.db.query_budget(max_steps=10**9, max_ms=10_000) as budget:
+            self.assertEqual(self.db.fetchall("SELECT COUNT(*) FROM event", path=self.path), [(2000,)])
+        self.assertIsNone(budget.exceeded)
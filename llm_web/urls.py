@@ -19,11 +19,14 @@ from django.contrib import admin
 from django.urls import path,include
 from report.views import report
 from home.views import home_page
+from llm_web.views import metrics_view, readyz_view
 
 print("✅ urls.py loaded")
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics/", metrics_view, name="metrics"),
+    path("readyz/", readyz_view, name="readyz"),
  
     path("", include("home.urls")),
     path("dbchat/", include("dbchat.urls")),
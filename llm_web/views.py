@@ -0,0 +1,36 @@
+from django.http import JsonResponse
+from llm_server.config import settings as server_settings
+from llm_web import metrics, readiness
+
+
+def metrics_view(request):
+    """프로세스 메트릭 + (모델 서버 모드면) 모델 서버의 배치/큐 메트릭."""
+    data = {"process": metrics.snapshot()}
+    if server_settings.server_url:
+        from llm_server.client import server_get
+        try:
+            data["model_server"] = server_get("/v1/stats")
+        except Exception as e:
+            data["model_server"] = {"error": str(e)}
+    return JsonResponse(data, json_dumps_params={"ensure_ascii": False})
+
+
+def readyz_view(request):
+    """
+    로드밸런서용 준비 상태. 워밍업(LLM_WARMUP)을 켠 경우 LLM_SERVER_MODELS의 모든 모델이
+    워밍업을 마쳐야 200, 모델 서버 모드면 서버 /health에 해당 모델이 떠 있어야 200.
+    """
+    required = [n.strip() for n in server_settings.server_models.split(",") if n.strip()]
+    ready = readiness.is_ready(required) if server_settings.warmup else True
+    data = {"warmup": server_settings.warmup, "models": readiness.snapshot()}
+    if server_settings.server_url:
+        from llm_server.client import server_get
+        try:
+            health = server_get("/health")
+            ready = ready and set(required) <= set(health.get("models", []))
+            data["model_server"] = health
+        except Exception as e:
+            ready = False
+            data["model_server"] = {"error": str(e)}
+    data["ready"] = ready
+    return JsonResponse(data, status=200 if ready else 503, json_dumps_params={"ensure_ascii": False})
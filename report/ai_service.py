@@ -1,37 +1,57 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
 from django.conf import settings
-import torch, os
+from llm_server.config import settings as server_settings
+from llm_web import readiness
+import os
+import threading
 
 MODEL_PATH = os.path.join(settings.BASE_DIR, "mistral-7b-merged")
 
-# 전역 변수 초기화만 함
-tokenizer = None
-model = None
-hf_pipeline = None
+# 전역 변수 초기화만 함 (로컬 GenerationEngine 또는 모델 서버 RemoteEngine)
+engine = None
+_init_lock = threading.Lock()
+
+def load_report_engine():
+    """Mistral 리포트 모델을 현재 프로세스에 올린다 (모델 서버 또는 로컬 모드)."""
+    import torch
+    from llm_server.engine import load_engine
+    print("🚀 Loading model (this may take a while)...")
+    return load_engine(
+        "report",
+        MODEL_PATH,
+        server_settings.report_device,
+        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+        trust_remote_code=True,
+        draft_model_id=server_settings.report_draft_model or None,
+        max_new_tokens=server_settings.report_max_new_tokens,
+        do_sample=server_settings.report_temperature > 0,
+        temperature=server_settings.report_temperature,
+    )
 
 def load_model():
-    global tokenizer, model, hf_pipeline
-    if hf_pipeline is None:
-        print("🚀 Loading model (this may take a while)...")
-        tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH, trust_remote_code=True)
-        model = AutoModelForCausalLM.from_pretrained(
-            MODEL_PATH,
-            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-            device_map={"": "cuda:1"},     
-            trust_remote_code=True
-        )
-        hf_pipeline = pipeline(
-            "text-generation",
-            model=model,
-            tokenizer=tokenizer,
-            max_new_tokens=1024,
-            do_sample=True,
-            temperature=0.7
-        )
-    return hf_pipeline
+    global engine
+    if engine is not None:
+        return engine
+    # 싱글플라이트: 동시에 들어온 첫 요청들 중 하나만 모델을 올린다
+    with _init_lock:
+        if engine is None:
+            with readiness.track_load("report"):
+                if server_settings.server_url:
+                    from llm_server.client import RemoteEngine
+                    engine = RemoteEngine("report")
+                else:
+                    from llm_server.batching import with_batching
+                    engine = with_batching(load_report_engine(), server_settings.batch_max_size, server_settings.batch_max_wait_ms)
+    return engine
 
-def generate_report(prompt: str) -> str:
-    pipe = load_model()
-    outputs = pipe(prompt)
-    return outputs[0]["generated_text"]
+def warmup_families():
+    """실제 리포트 프롬프트 형식으로 짧은 더미 생성."""
+    from .views import build_report_prompt
+    prompt = build_report_prompt("워밍업", "2025-01-01", *([0] * 7), *([""] * 7))
+    return {"report": lambda: load_model().complete([prompt], max_new_tokens=8)}
 
+def generate_report(prompt: str) -> str:
+    eng = load_model()
+    # 리포트 프롬프트는 chat template 없는 원문이라 접두부 KV 캐시를 쓰지 않는다
+    # (특수 토큰 경계가 없어 접두부/접미부를 따로 토큰화하면 전체 토큰화와 달라질 수 있음)
+    # text-generation pipeline과 동일하게 프롬프트 + 생성문을 돌려준다
+    return prompt + eng.complete([prompt], profile="report")[0]
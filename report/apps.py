@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ReportConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "report"
+
+    def ready(self):
+        from llm_server.config import settings as server_settings
+        from llm_web import readiness
+        if server_settings.warmup and readiness.should_warm_up():
+            from .ai_service import load_model, warmup_families
+            readiness.start_warmup("report", load_model, warmup_families)
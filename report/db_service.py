@@ -1,20 +1,21 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from llm_web import protectee_db
 
 
-engine = create_engine("sqlite:///./db/protectee.db")
-
 query_template = text("""
 WITH
 params AS (
     SELECT :name AS name, :date AS date
 ),
+-- 하루 창은 LIKE 'date%' 대신 반열린 구간으로 (event(protectee_id, timestamp) 인덱스를 탄다)
 -- 최대 스트레스 1건 선택
 max_stress_data AS (
     SELECT e2.protectee_id, e2.stress AS max_stress, e2.timestamp AS max_stress_time
     FROM event e2
     JOIN users u2 ON e2.protectee_id = u2.id
-    JOIN params p ON u2.name = p.name
-        AND e2.timestamp LIKE p.date || '%'
+    WHERE u2.name = :name
+        AND e2.timestamp >= :date AND e2.timestamp < date(:date, '+1 day')
     ORDER BY e2.stress DESC, e2.timestamp ASC
     LIMIT 1
 ),
@@ -23,7 +24,7 @@ user_events AS (
     SELECT e.*
     FROM event e
     JOIN max_stress_data msd ON e.protectee_id = msd.protectee_id
-    WHERE e.timestamp LIKE (SELECT date || '%' FROM params)
+    WHERE e.timestamp >= :date AND e.timestamp < date(:date, '+1 day')
     ORDER BY e.timestamp
 ),
 -- watch 상태 변화 계산 (1->0, 0->1)
@@ -117,7 +118,14 @@ LIMIT 10;
 """)
 
 def get_daily_data(name: str, date: str):
-     with engine.connect() as conn:
-        result = conn.execute(query_template, {"name": name, "date": date})
-        row = result.fetchone()
-        return row 
+     # 챗 에이전트/자동완성과 같은 읽기 전용 풀 (llm_web.protectee_db)
+     # watch_transitions 자기 조인이 하루 이벤트 수의 제곱으로 커질 수 있어 실행 한도를 건다 → protectee_db.QueryBudgetExceeded
+     with protectee_db.query_budget(max_ms=protectee_db.settings.report_max_ms) as budget:
+        try:
+            with protectee_db.engine().connect() as conn:
+                result = conn.execute(query_template, {"name": name, "date": date})
+                return result.fetchone()
+        except OperationalError as e:
+            if budget.exceeded:
+                raise protectee_db.QueryBudgetExceeded(budget) from e
+            raise
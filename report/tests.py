@@ -1,4 +1,37 @@
-from django.test import TestCase
+import threading
+import time
+from unittest import mock
+from django.test import SimpleTestCase
+from report import ai_service
 
-# Create your tests here.
-# test_report.py
+
+class LoadModelSingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.patches = [
+            mock.patch.object(ai_service, "engine", None),
+            mock.patch.object(ai_service.server_settings, "server_url", ""),
+            mock.patch.object(ai_service.server_settings, "batch_max_size", 1),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_concurrent_first_requests_load_once(self):
+        loaded = object()
+
+        def slow_load():
+            time.sleep(0.1)
+            return loaded
+
+        results = []
+        with mock.patch.object(ai_service, "load_report_engine", side_effect=slow_load) as load:
+            threads = [threading.Thread(target=lambda: results.append(ai_service.load_model())) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(timeout=5)
+        load.assert_called_once()
+        self.assertEqual(results, [loaded] * 4)
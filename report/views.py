@@ -2,10 +2,10 @@ from django.shortcuts import render
 print("✅ report/views.py loaded")
 from .db_service import get_daily_data
 from .ai_service import generate_report
-import re, os, sqlite3
+import re
 from django.http import JsonResponse
+from llm_web import protectee_db
 from .models import User
-from django.conf import settings
 
 def build_report_prompt(
     person, date,threat_count, imu_count, hrv_count, stress_count,
@@ -104,7 +104,11 @@ def report(request):
     date = request.GET.get("period")
 
     if name and date:
-        t_result = get_daily_data(name, date)
+        try:
+            t_result = get_daily_data(name, date)
+        except protectee_db.QueryBudgetExceeded:
+            t_result = None
+            report_text = "데이터 조회가 실행 한도를 넘어 중단되었습니다. 잠시 후 다시 시도해 주세요."
         if t_result:
             llm_input = {
                 "person": t_result[0],
@@ -140,14 +144,7 @@ def autocomplete_name(request):
     if not query:
         return JsonResponse([], safe=False)
 
-    db_path = os.path.join(settings.BASE_DIR, "db", "protectee.db")
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # users 테이블에서 이름 검색
-    cursor.execute("SELECT name FROM users WHERE name LIKE ? ORDER BY name LIMIT 10", (f"%{query}%",))
-    rows = cursor.fetchall()
+    # users 테이블에서 이름 검색 (키 입력마다 새 연결을 열지 않고 공유 읽기 전용 풀 사용)
+    rows = protectee_db.fetchall("SELECT name FROM users WHERE name LIKE ? ORDER BY name LIMIT 10", (f"%{query}%",))
     names = [row[0] for row in rows]
-
-    conn.close()
     return JsonResponse(names, safe=False)